@@ -0,0 +1,456 @@
+"""Batch throughput benchmark for Hindura Pro
+
+Generates deterministic test media with FFmpeg's lavfi sources (testsrc2 and
+sine), runs representative batches through the converter's own engine at
+several concurrency levels and writes the results to JSON.
+
+    python benchmark.py --out before.json
+    python benchmark.py --out after.json --compare before.json
+
+--startup measures cold start instead: the module's import time (from
+-X importtime) and the time until the window is first drawn, from source or
+from a built executable (--exe).
+
+    python benchmark.py --startup --out startup.json
+    python benchmark.py --startup --exe dist/HinduraPro.exe --compare startup.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import resource  # Largest single FFmpeg process (not on Windows)
+except ImportError:
+    resource = None
+
+from file_converter import ConversionJob, FileConverterApp
+
+# Fixture sources: a moving test pattern with a clock, and a steady tone
+VIDEO_SOURCE = "testsrc2=size=1280x720:rate=30"
+AUDIO_SOURCE = "sine=frequency=440:sample_rate=48000"
+IMAGE_SOURCE = "testsrc2=size=1280x720"
+
+# Batches that cover each conversion type of the app: (name, fixture format, settings)
+DEFAULT_SETTINGS = {
+    'mode': "Standard Conversion",
+    'file_type': "Video",
+    'to_format': "mp4",
+    'resize': "None",
+    'width': "",
+    'height': "",
+    'quality': "Medium",
+    'fps': "10",
+    'gif_scale': "320",
+    'output_dir': "Same as input",
+}
+SCENARIOS = [
+    ("transcode", "mp4", {'to_format': "mkv"}),
+    ("transcode_webm", "mp4", {'to_format': "webm"}),
+    ("compress", "mp4", {'mode': "Compression", 'to_format': "mp4"}),
+    ("resize", "mp4", {'mode': "Resize", 'resize': "854x480 (480p)", 'to_format': "mp4"}),
+    # The 720p fixture already fits and keeps its format: a -c copy remux, bound by I/O rather than the encoder
+    ("remux", "mp4", {'mode': "Resize", 'resize': "1920x1080 (1080p)", 'to_format': "mp4"}),
+    ("gif", "mp4", {'to_format': "gif", 'fps': "10", 'gif_scale': "320"}),
+    ("audio_extract", "mp4", {'to_format': "mp3"}),
+    ("audio_transcode", "wav", {'file_type': "Audio", 'to_format': "mp3"}),
+    ("audio_compress", "flac", {'mode': "Compression", 'file_type': "Audio", 'to_format': "mp3"}),
+    ("image", "png", {'file_type': "Image", 'to_format': "jpg"}),
+    ("image_compress", "jpg", {'mode': "Compression", 'file_type': "Image", 'to_format': "jpg"}),
+]
+
+# Formats FFmpeg can't write (vector images) or only at small sizes
+SKIP_FORMATS = {"svg", "pdf", "txt", "docx", "html"}
+SMALL_IMAGE_FORMATS = {"ico"}
+
+
+def log(message):
+    print(message, flush=True)
+
+
+def ffmpeg_version(app):
+    """First line of `ffmpeg -version`, so results from different builds aren't compared blindly"""
+    try:
+        result = subprocess.run([app.ffmpeg_path, "-version"], capture_output=True, text=True)
+        return result.stdout.splitlines()[0]
+    except Exception:
+        return None
+
+
+def fixture_command(app, file_type, fmt, duration, output):
+    """FFmpeg command that writes one deterministic fixture"""
+    cmd = [app.ffmpeg_path, "-hide_banner", "-loglevel", "error"]
+    if file_type == "Video":
+        cmd += ["-f", "lavfi", "-i", f"{VIDEO_SOURCE}:duration={duration}",
+                "-f", "lavfi", "-i", f"{AUDIO_SOURCE}:duration={duration}"]
+        if fmt == "gif":
+            cmd += ["-map", "0:v", "-vf", "scale=320:-1"]
+        else:
+            cmd += app.get_standard_conversion_params("Video", fmt)
+    elif file_type == "Audio":
+        cmd += ["-f", "lavfi", "-i", f"{AUDIO_SOURCE}:duration={duration}"]
+        cmd += app.get_standard_conversion_params("Audio", fmt)
+    else:
+        size = "256x256" if fmt in SMALL_IMAGE_FORMATS else "1280x720"
+        cmd += ["-f", "lavfi", "-i", IMAGE_SOURCE.replace("1280x720", size), "-frames:v", "1"]
+    # Bit-exact output: the same FFmpeg build always produces the same bytes
+    cmd += ["-fflags", "+bitexact", "-flags:v", "+bitexact", "-flags:a", "+bitexact", "-y", str(output)]
+    return cmd
+
+
+def make_fixtures(app, folder, duration):
+    """Write one fixture per supported format, returns {format: path} and the formats that failed"""
+    folder.mkdir(parents=True, exist_ok=True)
+    fixtures = {}
+    unsupported = []
+    for file_type in ("Video", "Audio", "Image"):
+        for fmt in app.file_types[file_type]:
+            if fmt in SKIP_FORMATS:
+                continue
+            key = f"{file_type.lower()}.{fmt}"
+            output = folder / f"fixture_{file_type.lower()}.{fmt}"
+            if not output.exists():
+                result = subprocess.run(fixture_command(app, file_type, fmt, duration, output),
+                                        capture_output=True, text=True)
+                if result.returncode != 0:
+                    unsupported.append(key)
+                    if output.exists():
+                        output.unlink()
+                    continue
+            fixtures[key] = output
+    return fixtures, unsupported
+
+
+def run_job(app, input_path, settings, slot):
+    """Convert one file the way the app does: probe, build, encode, finalize. Returns timings"""
+    started = time.perf_counter()
+    job = ConversionJob(str(input_path))
+    job.start_run(slot)
+    media = app.probe_media(str(input_path))
+    job.run.duration = media['duration']
+    conversion_type, suffix = app.get_conversion_type(settings)
+    output_file = input_path.parent / f"{input_path.stem}{suffix}.{settings['to_format']}"
+    temp_output_file = input_path.parent / f"{input_path.stem}{suffix}.tmp.{settings['to_format']}"
+    cmd = app.build_command(input_path, conversion_type, settings, job.run.duration, media=media)
+    cmd += app.governor.threads_option()
+    cmd += ["-y", str(temp_output_file)]
+
+    encode_started = time.perf_counter()
+    return_code, error = app.run_ffmpeg(job, cmd, slot)
+    encode_time = time.perf_counter() - encode_started
+    if return_code == 0:
+        app.finalize_output(temp_output_file, output_file)
+    else:
+        app._remove_temp_file(temp_output_file)
+    wall_time = time.perf_counter() - started
+    return {
+        "ok": return_code == 0,
+        "error": error if return_code != 0 else None,
+        "wall": wall_time,
+        "encode": encode_time,
+        "media_seconds": job.run.duration or 0,
+        "input_bytes": os.path.getsize(input_path),
+        "output_bytes": os.path.getsize(output_file) if return_code == 0 else 0,
+    }
+
+
+def children_rss():
+    """Summed resident memory of this process's running children in bytes (None without /proc)"""
+    me = str(os.getpid())
+    total = 0
+    try:
+        entries = os.listdir("/proc")
+        page_size = os.sysconf("SC_PAGE_SIZE")
+    except (OSError, AttributeError, ValueError):
+        return None  # Windows, or no procfs
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                stat = f.read()
+            # "pid (comm) state ppid ...": comm may contain spaces, so split after its closing parenthesis
+            if stat[stat.rindex(")") + 2:].split()[1] != me:
+                continue
+            with open(f"/proc/{entry}/statm") as f:
+                total += int(f.read().split()[1]) * page_size
+        except (OSError, ValueError, IndexError):
+            continue  # Exited while we looked
+    return total
+
+
+class MemorySampler:
+    """Peak of the summed RSS of the FFmpeg processes running at once, sampled in a background thread"""
+
+    interval = 0.1
+
+    def __init__(self):
+        self.peak = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            rss = children_rss()
+            if rss is None:
+                return
+            self.peak = max(self.peak or 0, rss)
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def run_batch(fixture, settings, files, concurrency):
+    """Run one batch of copies of a fixture and measure it (called in a fresh process)"""
+    app = FileConverterApp.headless()
+    app.governor.max_jobs = concurrency
+    app.governor.priority = "Normal"  # Measure the encoders, not the scheduler
+    app.governor.cpu_sets = []
+
+    with tempfile.TemporaryDirectory(prefix="hindura_bench_") as folder:
+        inputs = []
+        for index in range(files):
+            path = Path(folder) / f"input{index:03d}{Path(fixture).suffix}"
+            shutil.copyfile(fixture, path)
+            inputs.append(path)
+
+        started = time.perf_counter()
+        with MemorySampler() as memory, ThreadPoolExecutor(max_workers=concurrency) as pool:
+            jobs = [pool.submit(run_job, app, path, settings, index % concurrency)
+                    for index, path in enumerate(inputs)]
+            results = [job.result() for job in jobs]
+        wall_time = time.perf_counter() - started
+
+    done = [r for r in results if r["ok"]]
+    largest_rss_mb = None
+    if resource is not None:
+        # The biggest single child reaped so far; this process only runs one batch, so it's this batch's
+        largest = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+        # KiB on Linux, bytes on macOS
+        largest_rss_mb = round(largest / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+    input_bytes = sum(r["input_bytes"] for r in done)
+    media_seconds = sum(r["media_seconds"] for r in done)
+    return {
+        "files": files,
+        "failed": len(results) - len(done),
+        "errors": sorted({r["error"] for r in results if r["error"]})[:3],
+        "wall_s": round(wall_time, 3),
+        "files_per_s": round(len(done) / wall_time, 3) if wall_time else None,
+        "mb_per_s": round(input_bytes / wall_time / 1e6, 3) if wall_time else None,
+        "realtime_factor": round(media_seconds / wall_time, 2) if media_seconds and wall_time else None,
+        # All FFmpeg processes running at once (sampled, Linux only), and the largest single one
+        "peak_batch_rss_mb": round(memory.peak / (1024 * 1024), 1) if memory.peak is not None else None,
+        "largest_ffmpeg_rss_mb": largest_rss_mb,
+        # Time each job spends outside FFmpeg: probing, command building, finalizing
+        "overhead_ms": round(sum(r["wall"] - r["encode"] for r in results) / len(results) * 1000, 1),
+        "output_bytes": sum(r["output_bytes"] for r in done),
+    }
+
+
+def run_batch_in_subprocess(fixture, settings, files, concurrency):
+    """Each batch gets its own process so the largest FFmpeg RSS (ru_maxrss) is the batch's own"""
+    spec = json.dumps({"fixture": str(fixture), "settings": settings, "files": files, "concurrency": concurrency})
+    result = subprocess.run([sys.executable, os.path.abspath(__file__), "--batch", spec],
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        return {"files": files, "failed": files, "errors": result.stderr.strip().splitlines()[-1:]}
+    return json.loads(result.stdout)
+
+
+def compare(results, baseline, threshold):
+    """Print the change in files/s against a baseline run, returns True if nothing regressed"""
+    previous = {(r["scenario"], r["concurrency"]): r for r in baseline["results"]}
+    if baseline["meta"].get("ffmpeg") != results["meta"].get("ffmpeg"):
+        log(f"Note: different FFmpeg builds ({baseline['meta'].get('ffmpeg')})")
+    ok = True
+    log(f"\n{'scenario':<18}{'jobs':>5}{'before':>10}{'after':>10}{'change':>9}")
+    for r in results["results"]:
+        before = previous.get((r["scenario"], r["concurrency"]))
+        if not before or not before.get("files_per_s") or r.get("files_per_s") is None:
+            continue
+        change = (r["files_per_s"] - before["files_per_s"]) / before["files_per_s"]
+        flag = ""
+        if change < -threshold:
+            flag = "  REGRESSION"
+            ok = False
+        log(f"{r['scenario']:<18}{r['concurrency']:>5}{before['files_per_s']:>10.3f}"
+            f"{r['files_per_s']:>10.3f}{change:>+9.1%}{flag}")
+    return ok
+
+
+def import_profile(top=10):
+    """Import time of file_converter in a fresh interpreter (-X importtime), with its slowest imports"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import file_converter"],
+                            capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    rows = []
+    for line in result.stderr.splitlines():
+        # "import time:  self [us] | cumulative | imported package", nested packages are indented
+        parts = line.removeprefix("import time:").split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        rows.append((parts[2].strip(), int(parts[0]) / 1000, int(parts[1]) / 1000))
+    total = next((cumulative for name, _, cumulative in rows if name == "file_converter"), None)
+    slowest = sorted(rows, key=lambda row: row[2], reverse=True)
+    return {
+        "import_ms": round(total, 1) if total is not None else None,
+        "slowest_imports": [{"module": name, "self_ms": round(own, 1), "cumulative_ms": round(cumulative, 1)}
+                            for name, own, cumulative in slowest if name != "file_converter"][:top],
+    }
+
+
+def measure_startup(command, runs):
+    """Seconds from launching the app until its window is drawn, one value per run
+
+    The app is started with --startup-probe, which writes the time once the
+    window is up and quits; a onefile build's unpacking counts as well.
+    """
+    times = []
+    with tempfile.TemporaryDirectory(prefix="hindura-startup-") as folder:
+        marker = Path(folder) / "ready"
+        for _ in range(runs):
+            if marker.exists():
+                marker.unlink()
+            started = time.time()
+            subprocess.run(command + ["--startup-probe", str(marker)], timeout=120)
+            if not marker.exists():
+                sys.exit(f"{' '.join(command)} did not open its window")
+            times.append(float(marker.read_text()) - started)
+    return times
+
+
+def run_startup(args):
+    """--startup: measure cold start and write/compare the results"""
+    command = [args.exe] if args.exe else [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                                         "file_converter.py")]
+    times = sorted(measure_startup(command, args.runs))
+    results = {
+        "meta": {
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "command": command,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "runs": args.runs,
+        },
+        "startup": dict(import_profile(), window_ms={
+            "min": round(times[0] * 1000, 1),
+            "median": round(times[len(times) // 2] * 1000, 1),
+            "max": round(times[-1] * 1000, 1),
+        }),
+    }
+    startup = results["startup"]
+    log(f"Import: {startup['import_ms']} ms; window drawn after {startup['window_ms']['median']} ms "
+        f"(median of {args.runs}, min {startup['window_ms']['min']}, max {startup['window_ms']['max']})")
+    for row in startup["slowest_imports"][:5]:
+        log(f"  {row['module']:<30}{row['cumulative_ms']:>8.1f} ms")
+
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=2)
+    log(f"Results written to {args.out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            before = json.load(f).get("startup")
+        if not before:
+            sys.exit(f"{args.compare} has no startup results")
+        change = (startup["window_ms"]["median"] - before["window_ms"]["median"]) / before["window_ms"]["median"]
+        log(f"Window drawn: {before['window_ms']['median']} -> {startup['window_ms']['median']} ms ({change:+.1%})")
+        if change > args.threshold:
+            log("REGRESSION")
+            sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hindura Pro batch throughput benchmark")
+    parser.add_argument("--out", default="benchmark_results.json", help="where to write the results")
+    parser.add_argument("--fixtures", help="folder for the generated test media (default: a temp folder, kept between runs)")
+    parser.add_argument("--duration", type=float, default=5, help="length of the video/audio fixtures in seconds")
+    parser.add_argument("--files", type=int, default=8, help="files per batch")
+    parser.add_argument("--concurrency", default="1,2,4", help="comma-separated parallel job counts")
+    parser.add_argument("--scenarios", help="comma-separated subset of: " + ", ".join(s[0] for s in SCENARIOS))
+    parser.add_argument("--compare", metavar="BASELINE", help="earlier results to compare files/s against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="slowdown that counts as a regression (default 0.10)")
+    parser.add_argument("--startup", action="store_true", help="measure cold start instead of batch throughput")
+    parser.add_argument("--exe", help="with --startup, the built executable to start (default: file_converter.py)")
+    parser.add_argument("--runs", type=int, default=5, help="with --startup, launches to measure (default 5)")
+    parser.add_argument("--batch", help=argparse.SUPPRESS)  # Internal: run one batch, print JSON
+    args = parser.parse_args()
+
+    if args.startup:
+        run_startup(args)
+        return
+
+    if args.batch:
+        spec = json.loads(args.batch)
+        print(json.dumps(run_batch(spec["fixture"], spec["settings"], spec["files"], spec["concurrency"])))
+        return
+
+    app = FileConverterApp.headless()
+    if not app.ffmpeg_path:
+        sys.exit("FFmpeg not found")
+
+    fixture_folder = Path(args.fixtures or Path(tempfile.gettempdir()) / f"hindura_fixtures_{args.duration:g}s")
+    log(f"Generating fixtures in {fixture_folder}...")
+    fixtures, unsupported = make_fixtures(app, fixture_folder, args.duration)
+    if unsupported:
+        log(f"This FFmpeg build can't write: {', '.join(unsupported)}")
+
+    wanted = set(args.scenarios.split(",")) if args.scenarios else None
+    levels = [int(level) for level in args.concurrency.split(",")]
+    results = {
+        "meta": {
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "ffmpeg": ffmpeg_version(app),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "fixture_duration_s": args.duration,
+            "files_per_batch": args.files,
+            "unsupported_formats": unsupported,
+        },
+        "results": [],
+    }
+
+    for name, source_format, overrides in SCENARIOS:
+        if wanted and name not in wanted:
+            continue
+        settings = dict(DEFAULT_SETTINGS, **overrides)
+        fixture = fixtures.get(f"{settings['file_type'].lower()}.{source_format}")
+        if fixture is None:
+            log(f"Skipping {name}: no {source_format} fixture")
+            continue
+        for concurrency in levels:
+            result = run_batch_in_subprocess(fixture, settings, args.files, concurrency)
+            result.update({"scenario": name, "concurrency": concurrency,
+                           "source": source_format, "target": settings['to_format']})
+            results["results"].append(result)
+            log(f"{name:<18} x{concurrency}: {result.get('files_per_s')} files/s, "
+                f"{result.get('realtime_factor')}x realtime, {result.get('failed')} failed")
+
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=2)
+    log(f"Results written to {args.out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if not compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
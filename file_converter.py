@@ -1,17 +1,2251 @@
-import customtkinter as ctk
-from tkinter import filedialog, messagebox
-import subprocess
 import os
+import sys
+import shutil
 import threading
 import re
+import heapq
+import itertools
+import signal
+import time
+import tempfile
+import atexit
+import queue
+import codecs
+import math
+from array import array
+from enum import Enum
+from collections import deque
+from contextlib import closing, nullcontext
 from pathlib import Path
 from datetime import datetime
-import winsound  # For completion sound notification
+try:
+    import fcntl  # Reflinks for the output cache
+except ImportError:
+    fcntl = None  # Not on POSIX
 import json  # For saving window settings
 
-# Set appearance mode and color theme
-ctk.set_appearance_mode("dark")  # Modes: "System", "Dark", "Light"
-ctk.set_default_color_theme("blue")  # Themes: "blue", "green", "dark-blue"
+# Imported on first use to keep start-up fast: the GUI toolkit only when the
+# window opens (see load_gui), asyncio with the engine's event loop. Modules
+# only the farm, cache, watch folder or analysis code needs (subprocess,
+# sqlite3, hashlib, concurrent.futures...) are imported where they're used
+ctk = filedialog = messagebox = None
+asyncio = None
+
+
+def load_gui():
+    """Import customtkinter and the Tk dialogs, returns False if customtkinter isn't installed"""
+    global ctk, filedialog, messagebox
+    try:
+        import customtkinter
+        from tkinter import filedialog as file_dialogs, messagebox as message_boxes
+    except ImportError:
+        return False
+    ctk, filedialog, messagebox = customtkinter, file_dialogs, message_boxes
+    # Set appearance mode and color theme
+    ctk.set_appearance_mode("dark")  # Modes: "System", "Dark", "Light"
+    ctk.set_default_color_theme("blue")  # Themes: "blue", "green", "dark-blue"
+    return True
+
+
+class JobStatus(str, Enum):
+    """Where a job is in its life; members compare equal to (and print as) their plain strings"""
+    QUEUED = "queued"
+    HELD = "held"
+    RUNNING = "running"
+    PAUSED = "paused"
+    DONE = "done"
+    FAILED = "failed"
+    SKIPPED = "skipped"
+    CANCELLED = "cancelled"
+
+    __str__ = str.__str__
+    __format__ = str.__format__
+    __hash__ = str.__hash__
+
+
+FINAL_STATUSES = (JobStatus.DONE, JobStatus.FAILED, JobStatus.SKIPPED, JobStatus.CANCELLED)
+
+
+class JobKind(str, Enum):
+    """What a job does (the conversion type, or a plain stream copy)"""
+    STANDARD = "standard"
+    RESIZE = "resize"
+    RESIZE_STANDARD = "resize_standard"
+    COMPRESS = "compress"
+    AUDIO_EXTRACT = "audio_extract"
+    GIF = "gif"
+    THUMBNAILS = "thumbnails"
+    COPY = "copy"
+
+    __str__ = str.__str__
+    __format__ = str.__format__
+    __hash__ = str.__hash__
+
+
+class ConversionJob:
+    """One file in the conversion queue
+
+    Slotted and kept small: a 100k-file batch keeps one of these per file.
+    Everything that only matters while the file converts lives on its
+    JobRun, which exists from when the job starts until its result is recorded.
+    """
+    __slots__ = ("id", "index", "path", "priority", "status", "trim_start", "trim_end",
+                 "solo", "queued_at", "queue_seq", "run")
+    _next_id = itertools.count(1)
+
+    def __init__(self, path, priority=0, index=None, queued_at=None):
+        self.id = next(ConversionJob._next_id)
+        self.index = index  # Position in the batch (row in the BatchSummary columns)
+        self.path = path
+        self.priority = priority  # Higher runs first
+        self.status = JobStatus.QUEUED
+        self.trim_start = None  # Seconds into the input to start at (None = beginning)
+        self.trim_end = None  # Seconds into the input to stop at (None = end)
+        self.solo = False  # Must run on its own (its grouped run failed)
+        self.queued_at = time.monotonic() if queued_at is None else queued_at  # A batch shares one timestamp
+        self.queue_seq = None  # Sequence number of its live JobQueue entry
+        self.run = None  # JobRun while the job is running
+
+    def start_run(self, slot=0):
+        """Begin a run of this job, returns its JobRun"""
+        self.run = JobRun(slot)
+        self.run.queue_wait = time.monotonic() - self.queued_at
+        return self.run
+
+
+class JobRun:
+    """State of one attempt at converting a job: the process, paths, progress and timings"""
+    __slots__ = ("process", "temp_output_file", "output_file", "launched", "cancel_requested",
+                 "slot", "estimated_size", "farm_id", "progress_fraction", "kind", "duration",
+                 "failure", "duration_seen", "media_time", "last_advance", "group",
+                 "queue_wait", "probe_time", "spawn_latency", "encode_time")
+
+    def __init__(self, slot=0):
+        self.process = None
+        self.temp_output_file = None
+        self.output_file = None
+        self.launched = False  # FFmpeg thread started (the process may not exist yet)
+        self.cancel_requested = False
+        self.slot = slot  # Parallel job slot (for CPU pinning)
+        self.estimated_size = 0  # Expected output bytes, reserved on disk while running
+        self.farm_id = None  # Row in the render farm queue when run remotely
+        self.progress_fraction = None  # Latest progress when run without the window
+        self.kind = None  # JobKind, for speed calibration
+        self.duration = None  # Seconds, once probed
+        self.failure = None  # "timeout" or "stalled" when the watchdog stopped FFmpeg
+        self.duration_seen = False  # FFmpeg has opened the input
+        self.media_time = None  # Last output position FFmpeg reported (seconds)
+        self.last_advance = None  # When FFmpeg last showed signs of life (monotonic)
+        self.group = None  # Jobs sharing this job's FFmpeg run (see FileConverterApp._start_group_conversion)
+
+        # Timings for the metrics (seconds, None if the step didn't happen)
+        self.queue_wait = None
+        self.probe_time = None
+        self.spawn_latency = None  # Process start until FFmpeg's first output
+        self.encode_time = None
+
+    def _suspend_process(self, pause):
+        """Suspend or resume the FFmpeg process, returns True on success"""
+        if self.process is None or self.process.poll() is not None:
+            return False
+        try:
+            if os.name == 'nt':
+                import ctypes
+                # No SIGSTOP on Windows: suspend/resume every thread of the process through ntdll
+                handle = ctypes.windll.kernel32.OpenProcess(0x0800, False, self.process.pid)  # PROCESS_SUSPEND_RESUME
+                if not handle:
+                    return False
+                try:
+                    if pause:
+                        return ctypes.windll.ntdll.NtSuspendProcess(handle) == 0
+                    return ctypes.windll.ntdll.NtResumeProcess(handle) == 0
+                finally:
+                    ctypes.windll.kernel32.CloseHandle(handle)
+            os.kill(self.process.pid, signal.SIGSTOP if pause else signal.SIGCONT)
+            return True
+        except Exception:
+            return False
+
+    def pause_process(self):
+        """Freeze the running FFmpeg process; it keeps its progress"""
+        return self._suspend_process(True)
+
+    def resume_process(self):
+        """Continue a paused FFmpeg process"""
+        return self._suspend_process(False)
+
+    def kill_process(self):
+        """Stop the FFmpeg process for good (blocks for up to 5 seconds)"""
+        if self.process is None or self.process.poll() is not None:
+            return
+        self.resume_process()  # A stopped process can't act on terminate
+        try:
+            self.process.terminate()
+            self.process.wait(timeout=5)
+        except Exception:
+            try:
+                self.process.kill()
+                self.process.wait(timeout=5)
+            except Exception:
+                pass
+
+
+class JobQueue:
+    """Priority queue of conversion jobs
+
+    Higher priority runs first; within a priority, jobs run in the order they
+    were added (or shortest first, by the cost function). Held jobs stay in the
+    queue but are skipped until released. A heap entry is live while its
+    sequence number matches the job's queue_seq; reordered or removed entries
+    are dropped when they reach the top of the heap.
+    """
+
+    def __init__(self, cost=None):
+        self.cost = cost  # Job -> run time estimate, for shortest-first ordering
+        self._heap = []  # (-priority, cost, sequence, job)
+        self._live = 0  # Live entries in the heap
+        self._held = {}  # job id -> job, in hold order
+        self._counter = itertools.count()
+
+    def __len__(self):
+        return self._live + len(self._held)
+
+    @staticmethod
+    def _is_live(entry):
+        return entry[-1].queue_seq == entry[2]
+
+    def push(self, job):
+        """Add a job, or re-add it after its priority changed"""
+        self._invalidate(job)
+        self._held.pop(job.id, None)
+        key = self.cost(job) if self.cost else 0
+        job.queue_seq = next(self._counter)
+        heapq.heappush(self._heap, (-job.priority, key, job.queue_seq, job))
+        self._live += 1
+        job.status = JobStatus.QUEUED
+
+    def peek(self):
+        """The job pop() would return, without taking it"""
+        while self._heap and not self._is_live(self._heap[0]):
+            heapq.heappop(self._heap)
+        return self._heap[0][-1] if self._heap else None
+
+    def pop(self):
+        """Take the next runnable job (None if only held jobs are left)"""
+        while self._heap:
+            entry = heapq.heappop(self._heap)
+            if self._is_live(entry):
+                job = entry[-1]
+                job.queue_seq = None
+                self._live -= 1
+                return job
+        return None
+
+    def _invalidate(self, job):
+        if job.queue_seq is not None:
+            job.queue_seq = None
+            self._live -= 1
+            # Rebuild once dead entries dominate so the heap doesn't grow without bound
+            if len(self._heap) > 2 * self._live + 64:
+                self._heap = [entry for entry in self._heap if self._is_live(entry)]
+                heapq.heapify(self._heap)
+
+    def remove(self, job):
+        """Take a job out of the queue, held or not"""
+        self._invalidate(job)
+        self._held.pop(job.id, None)
+
+    def hold(self, job):
+        """Keep a queued job from starting until it is released"""
+        if job.queue_seq is not None:
+            self._invalidate(job)
+            self._held[job.id] = job
+            job.status = JobStatus.HELD
+
+    def release(self, job):
+        """Let a held job run again"""
+        if self._held.pop(job.id, None) is not None:
+            self.push(job)
+
+    def move_to_front(self, job):
+        """Run a job before everything else that is waiting"""
+        job.priority = max(itertools.chain((j.priority for j in self._waiting()), [0])) + 1
+        if job.queue_seq is not None:
+            self.push(job)
+
+    def move_to_back(self, job):
+        """Run a job after everything else that is waiting"""
+        job.priority = min(itertools.chain((j.priority for j in self._waiting()), [0])) - 1
+        if job.queue_seq is not None:
+            self.push(job)
+
+    def held_count(self):
+        return len(self._held)
+
+    def _waiting(self):
+        """Waiting and held jobs, in no particular order"""
+        return itertools.chain((entry[-1] for entry in self._heap if self._is_live(entry)), self._held.values())
+
+    def jobs(self, limit=None):
+        """Waiting jobs in run order, followed by held jobs (only the first `limit` if given)"""
+        if limit is None:
+            live = sorted(entry for entry in self._heap if self._is_live(entry))
+            return [entry[-1] for entry in live] + list(self._held.values())
+        # Walk the heap from the root instead of sorting it all: a child never runs before its parent
+        found = []
+        frontier = [(self._heap[0], 0)] if self._heap else []
+        while frontier and len(found) < limit:
+            entry, position = heapq.heappop(frontier)
+            if self._is_live(entry):
+                found.append(entry[-1])
+            for child in (2 * position + 1, 2 * position + 2):
+                if child < len(self._heap):
+                    heapq.heappush(frontier, (self._heap[child], child))
+        return found + list(itertools.islice(self._held.values(), limit - len(found)))
+
+    def clear(self):
+        """Remove every waiting and held job, returning them"""
+        removed = self.jobs()
+        for job in removed:
+            job.queue_seq = None
+        self._heap = []
+        self._live = 0
+        self._held = {}
+        return removed
+
+
+class BatchSummary:
+    """Results of a batch, kept as counters and compact columns
+
+    Updated as each job finishes, so the end-of-batch summary is ready at once
+    no matter how many files ran. Only the first few failure messages are kept.
+    """
+    shown_failures = 5  # Failure messages kept for the summary dialog
+    recent_size = 50  # Finished jobs remembered for the job list
+    _codes = {status: code for code, status in enumerate(JobStatus)}
+
+    def __init__(self, total=0):
+        self.total = total
+        self.status = array('b', [-1]) * total  # Per job: index into JobStatus, -1 while unfinished
+        self.output_bytes = array('q', [0]) * total
+        self.input_bytes = array('q', [-1]) * total  # Per job: input size once read, -1 before
+        self.counts = dict.fromkeys(JobStatus, 0)
+        self.total_output_bytes = 0
+        self.failures = []  # (job index, message) for the first few failures
+        self.failed = array('l')  # Indexes of failed jobs, for Retry Failed
+        self.recent = deque(maxlen=self.recent_size)  # Latest finished jobs, newest last
+
+    def record(self, job, error_text=None, output_bytes=0):
+        """Count a job that reached its final status"""
+        index = job.index
+        if index is None or index >= self.total or self.status[index] != -1:
+            return  # Not part of this batch, or already counted
+        status = JobStatus(job.status)
+        self.status[index] = self._codes[status]
+        self.counts[status] += 1
+        self.recent.append(job)
+        if status == JobStatus.DONE:
+            self.output_bytes[index] = output_bytes
+            self.total_output_bytes += output_bytes
+        elif status == JobStatus.FAILED:
+            self.failed.append(index)
+            if len(self.failures) < self.shown_failures:
+                self.failures.append((index, self.last_error(error_text)))
+
+    def input_size(self, job):
+        """A job's input size in bytes, read from disk on first use (0 if unreadable)"""
+        index = job.index
+        if index is not None and index < self.total and self.input_bytes[index] >= 0:
+            return self.input_bytes[index]
+        try:
+            size = os.path.getsize(job.path)
+        except OSError:
+            size = 0
+        if index is not None and index < self.total:
+            self.input_bytes[index] = size
+        return size
+
+    @staticmethod
+    def last_error(error_text):
+        """The last non-empty line of FFmpeg's output (or of an error message)"""
+        lines = [line.strip() for line in (error_text or "").strip().split('\n')[-5:] if line.strip()]
+        return lines[-1] if lines else "Unknown error"
+
+    def finished(self):
+        return sum(self.counts.values())
+
+
+class ProgressAggregator:
+    """Thread-safe store of job progress that the UI polls at a fixed rate
+
+    The engine calls update() each time FFmpeg reports progress;
+    the Tk thread reads a snapshot a few times a second, so the number of
+    widget updates doesn't grow with the number of jobs.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._progress = {}  # job id -> 0..1
+        self._version = 0  # Bumped on every change so the UI can skip idle polls
+
+    def update(self, job_id, fraction):
+        with self._lock:
+            self._progress[job_id] = fraction
+            self._version += 1
+
+    def remove(self, job_id):
+        with self._lock:
+            if self._progress.pop(job_id, None) is not None:
+                self._version += 1
+
+    def clear(self):
+        with self._lock:
+            self._progress = {}
+            self._version += 1
+
+    def snapshot(self):
+        """Return (version, {job id: fraction})"""
+        with self._lock:
+            return self._version, dict(self._progress)
+
+
+class MetricsRegistry:
+    """Thread-safe counters and histograms, rendered in the Prometheus text format
+
+    Filled in as jobs finish; served at /metrics by serve() and summarized in
+    the GUI's stats panel.
+    """
+
+    time_buckets = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+    speed_buckets = (0.1, 0.25, 0.5, 1, 2, 5, 10, 25, 50, 100)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help = {}
+        self._counters = {}  # name -> {labels: value}
+        self._histograms = {}  # name -> {labels: [bucket counts..., sum, count]}
+        self._buckets = {}
+
+    def counter(self, name, help_text):
+        self._help[name] = help_text
+        self._counters.setdefault(name, {})
+
+    def histogram(self, name, help_text, buckets=None):
+        self._help[name] = help_text
+        self._buckets[name] = buckets or self.time_buckets
+        self._histograms.setdefault(name, {})
+
+    def inc(self, name, value=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters[name]
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = tuple(sorted(labels.items()))
+        buckets = self._buckets[name]
+        with self._lock:
+            series = self._histograms[name].setdefault(key, [0] * len(buckets) + [0.0, 0])
+            for index, bound in enumerate(buckets):
+                if value <= bound:
+                    series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def totals(self):
+        """Counter totals and histogram (sum, count) per name, all label values combined"""
+        with self._lock:
+            counters = {name: {labels: value for labels, value in series.items()}
+                        for name, series in self._counters.items()}
+            histograms = {}
+            for name, series in self._histograms.items():
+                histograms[name] = (sum(s[-2] for s in series.values()), sum(s[-1] for s in series.values()))
+        return counters, histograms
+
+    @staticmethod
+    def _labels(key, extra=()):
+        pairs = list(key) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            for name, series in self._counters.items():
+                lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} counter")
+                for key, value in series.items():
+                    lines.append(f"{name}{self._labels(key)} {value}")
+            for name, series in self._histograms.items():
+                lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                buckets = self._buckets[name]
+                for key, values in series.items():
+                    for bound, count in zip(buckets, values):
+                        lines.append(f"{name}_bucket{self._labels(key, [('le', bound)])} {count}")
+                    lines.append(f"{name}_bucket{self._labels(key, [('le', '+Inf')])} {values[-1]}")
+                    lines.append(f"{name}_sum{self._labels(key)} {values[-2]}")
+                    lines.append(f"{name}_count{self._labels(key)} {values[-1]}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port, host="127.0.0.1"):
+        """Serve /metrics over HTTP from a background thread, returns the server"""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Scrapes every few seconds would flood the console
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+class Profiler:
+    """Opt-in timing of the converter's own work, exported as Chrome trace events
+
+    Off by default: span() hands back a shared no-op context manager and
+    record() returns straight away, so the hooks cost next to nothing. When
+    on, each span becomes a complete ("X") event on the thread that ran it, and
+    FFmpeg runs go on one track per job slot so gaps between jobs stand out.
+    Open the exported file in chrome://tracing or ui.perfetto.dev.
+    """
+
+    max_events = 1000000  # Stop recording rather than grow without bound
+
+    def __init__(self):
+        self.enabled = False
+        self.path = None
+        self._events = []
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+        self._tracks = {}  # tid -> name
+
+    def start(self, path):
+        """Start recording; the trace is written to path by export()"""
+        self.path = str(path)
+        self.enabled = True
+        atexit.register(self.export)
+
+    def now(self):
+        return time.perf_counter() if self.enabled else 0
+
+    def record(self, name, started, track=None, **args):
+        """Add a span that began at started (from now()) and ends now"""
+        if not self.enabled:
+            return
+        ended = time.perf_counter()
+        if track is None:
+            tid = threading.get_ident()
+            self._tracks.setdefault(tid, threading.current_thread().name)
+        else:
+            tid = 1000 + track  # Job slots get their own rows below the threads
+            self._tracks.setdefault(tid, f"Job slot {track + 1}")
+        event = {"name": name, "ph": "X", "pid": os.getpid(), "tid": tid,
+                 "ts": round((started - self._origin) * 1e6, 1),
+                 "dur": round((ended - started) * 1e6, 1)}
+        if args:
+            event["args"] = args
+        with self._lock:
+            if len(self._events) < self.max_events:
+                self._events.append(event)
+
+    def span(self, name, **args):
+        """Context manager timing a block"""
+        if not self.enabled:
+            return nullcontext()
+        return self._Span(self, name, args)
+
+    class _Span:
+        def __init__(self, profiler, name, args):
+            self.profiler = profiler
+            self.name = name
+            self.args = args
+
+        def __enter__(self):
+            self.started = time.perf_counter()
+            return self
+
+        def __exit__(self, *exc_info):
+            self.profiler.record(self.name, self.started, **self.args)
+            return False
+
+    def export(self):
+        """Write the trace collected so far (keeps recording)"""
+        if not self.enabled:
+            return
+        with self._lock:
+            events = list(self._events)
+            tracks = dict(self._tracks)
+        pid = os.getpid()
+        metadata = [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+                    for tid, name in tracks.items()]
+        try:
+            with open(self.path, "w") as f:
+                json.dump({"traceEvents": metadata + events, "displayTimeUnit": "ms"}, f)
+        except OSError:
+            pass
+
+
+class ResourceGovernor:
+    """Decides how many FFmpeg jobs may run at once and how each one is started
+
+    Parallel jobs share the CPU through a -threads cap instead of each using
+    every core, run at a lower OS priority (CPU and, on Linux, I/O), can be
+    pinned to CPU sets, and new jobs are held back while the machine is busy
+    (load average per CPU, not counting this batch's own jobs) or short on
+    memory.
+    """
+    priorities = {"Normal": 0, "Below normal": 10, "Idle": 19}  # POSIX nice values
+    windows_priority_classes = {"Normal": 0x20, "Below normal": 0x4000, "Idle": 0x40}
+
+    def __init__(self, config):
+        self.max_jobs = max(1, int(config.get('parallel_jobs', 1)))
+        self.priority = config.get('process_priority', "Below normal")
+        self.cpu_sets = config.get('cpu_sets') or []  # e.g. [[0, 1, 2, 3], [4, 5, 6, 7]], one per job slot
+        self.max_load_per_cpu = config.get('max_load_per_cpu', 1.0)  # None to ignore load
+        self.min_free_memory = int(config.get('min_free_memory_mb', 512)) * 1024 * 1024
+        self.threads_override = config.get('threads_per_job')
+        self.retry_ms = 5000  # How often to re-check while holding jobs back
+        self.cpu_count = os.cpu_count() or 1
+        self.tools = {}
+        if os.name != 'nt':
+            self.tools = {name: shutil.which(name) for name in ("nice", "ionice", "taskset")}
+
+    def threads_per_job(self):
+        """FFmpeg threads per job so parallel jobs together use each core once"""
+        if self.threads_override:
+            return int(self.threads_override)
+        return max(1, self.cpu_count // self.max_jobs)
+
+    def threads_option(self):
+        """-threads argument for a job (empty when running one job at a time)"""
+        if self.max_jobs == 1 and not self.threads_override:
+            return []  # Let FFmpeg pick, as before
+        return ["-threads", str(self.threads_per_job())]
+
+    def load_per_cpu(self):
+        """1-minute load average per CPU (None where there is no load average, e.g. Windows)"""
+        try:
+            return os.getloadavg()[0] / self.cpu_count
+        except (AttributeError, OSError):
+            return None
+
+    def free_memory(self):
+        """Available physical memory in bytes (None if unknown)"""
+        if os.name == 'nt':
+            import ctypes
+            class MEMORYSTATUSEX(ctypes.Structure):
+                _fields_ = [("dwLength", ctypes.c_ulong), ("dwMemoryLoad", ctypes.c_ulong),
+                            ("ullTotalPhys", ctypes.c_ulonglong), ("ullAvailPhys", ctypes.c_ulonglong),
+                            ("ullTotalPageFile", ctypes.c_ulonglong), ("ullAvailPageFile", ctypes.c_ulonglong),
+                            ("ullTotalVirtual", ctypes.c_ulonglong), ("ullAvailVirtual", ctypes.c_ulonglong),
+                            ("ullAvailExtendedVirtual", ctypes.c_ulonglong)]
+            status = MEMORYSTATUSEX()
+            status.dwLength = ctypes.sizeof(status)
+            try:
+                if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+                    return status.ullAvailPhys
+            except Exception:
+                pass
+            return None
+        try:
+            with open('/proc/meminfo') as f:
+                for line in f:
+                    if line.startswith('MemAvailable:'):
+                        return int(line.split()[1]) * 1024
+        except (OSError, ValueError):
+            pass
+        return None
+
+    def admit(self, running_count):
+        """Return (allowed, reason) for starting another job now"""
+        if running_count >= self.max_jobs:
+            return False, None
+        if running_count == 0:
+            return True, None  # Always keep one job going so the batch can't stall
+        load = self.load_per_cpu()
+        if self.max_load_per_cpu is not None and load is not None:
+            # The load average counts our own FFmpeg threads too: only other work should hold jobs back
+            own = min(running_count * self.threads_per_job(), self.cpu_count) / self.cpu_count
+            other = max(0.0, load - own)
+            if other > self.max_load_per_cpu:
+                return False, f"system load {other:.2f} per CPU besides this batch"
+        memory = self.free_memory()
+        if memory is not None and memory < self.min_free_memory:
+            return False, f"only {memory // (1024 * 1024)} MB memory free"
+        return True, None
+
+    def cpus_for_slot(self, slot):
+        """CPU set for a job slot (None when jobs aren't pinned)"""
+        if not self.cpu_sets:
+            return None
+        return self.cpu_sets[slot % len(self.cpu_sets)]
+
+    def creationflags(self):
+        """Windows priority class for new FFmpeg processes"""
+        if os.name != 'nt':
+            return 0
+        return self.windows_priority_classes.get(self.priority, 0)
+
+    def wrap_command(self, cmd, slot=0):
+        """Prefix cmd with taskset/nice/ionice on POSIX (they exec FFmpeg, so the pid stays the same)"""
+        prefix = []
+        cpus = self.cpus_for_slot(slot)
+        if cpus and self.tools.get("taskset"):
+            prefix += [self.tools["taskset"], "-c", ",".join(str(cpu) for cpu in cpus)]
+        nice = self.priorities.get(self.priority, 0)
+        if nice and self.tools.get("nice"):
+            prefix += [self.tools["nice"], "-n", str(nice)]
+        if nice and self.tools.get("ionice"):
+            prefix += [self.tools["ionice"], "-c", "3"] if self.priority == "Idle" else [self.tools["ionice"], "-c", "2", "-n", "7"]
+        return prefix + cmd
+
+    def apply(self, process, slot=0):
+        """Pin a started process to its CPU set on Windows (POSIX does it in wrap_command)"""
+        cpus = self.cpus_for_slot(slot)
+        if os.name != 'nt' or not cpus:
+            return
+        try:
+            import ctypes
+            mask = sum(1 << cpu for cpu in cpus)
+            handle = ctypes.windll.kernel32.OpenProcess(0x0200, False, process.pid)  # PROCESS_SET_INFORMATION
+            if handle:
+                ctypes.windll.kernel32.SetProcessAffinityMask(handle, ctypes.c_size_t(mask))
+                ctypes.windll.kernel32.CloseHandle(handle)
+        except Exception:
+            pass
+
+
+class AsyncProcess:
+    """Popen-style handle for a process started by the AsyncEngine
+
+    ConversionJob pauses, resumes and stops processes through pid, poll(),
+    terminate(), kill() and wait(timeout); this maps those onto the asyncio
+    process so they keep working from any thread other than the engine's.
+    """
+
+    def __init__(self, process, loop):
+        self._process = process
+        self._loop = loop
+        self.pid = process.pid
+
+    @property
+    def returncode(self):
+        return self._process.returncode
+
+    def poll(self):
+        return self._process.returncode
+
+    def _signal(self, method):
+        def send():
+            try:
+                method()
+            except ProcessLookupError:
+                pass  # Already exited
+        self._loop.call_soon_threadsafe(send)
+
+    def terminate(self):
+        self._signal(self._process.terminate)
+
+    def kill(self):
+        self._signal(self._process.kill)
+
+    def wait(self, timeout=None):
+        import subprocess
+        from concurrent.futures import TimeoutError as FutureTimeout
+        future = asyncio.run_coroutine_threadsafe(self._process.wait(), self._loop)
+        try:
+            return future.result(timeout)
+        except FutureTimeout:
+            raise subprocess.TimeoutExpired("ffmpeg", timeout)
+
+
+class AsyncEngine:
+    """Runs FFmpeg processes as coroutines on one asyncio event loop in a background thread
+
+    Instead of one thread blocked on each process's stderr, stderr is read in
+    chunks as it arrives and only the newest progress value in each chunk is
+    parsed. submit() works from any thread and returns a concurrent Future;
+    the window receives results through the events queue, which it drains on
+    its progress timer.
+
+    Instead of files, a job can read its input from a source and write its
+    output to a sink through FFmpeg's stdin/stdout ("pipe:0"/"pipe:1" in the
+    command). A source is a binary file-like object (readinto or read) or an
+    iterable of bytes; a sink is a binary file-like object or a callable
+    taking each chunk. Input is copied through one reused buffer.
+    """
+
+    read_size = 64 * 1024
+    pipe_size = 1024 * 1024
+    watchdog_interval = 1  # Seconds between stall/budget checks
+    time_pattern = re.compile(r'time=(\d{2}):(\d{2}):(\d{2})\.(\d{2})')
+    duration_pattern = re.compile(r'Duration: (\d{2}):(\d{2}):(\d{2})\.(\d{2})')
+    line_break = re.compile(r'[\r\n]+')  # FFmpeg ends progress lines with \r
+
+    def __init__(self, app):
+        self.app = app
+        self.events = queue.Queue()  # ("complete", job, (return code, stderr)) or ("error", job, message)
+        self.loop = None
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self):
+        """Start the event loop thread on first use (and import asyncio for the whole module)"""
+        global asyncio
+        with self._lock:
+            if self.loop is None:
+                import asyncio
+                loop = asyncio.new_event_loop()  # The default loop on Windows (proactor) supports subprocesses
+                threading.Thread(target=loop.run_forever, name="ffmpeg-engine", daemon=True).start()
+                self.loop = loop
+        return self.loop
+
+    def submit(self, job, cmd, slot=0, timeout=None, on_progress=None, use_cache=False, notify=False,
+               source=None, sink=None):
+        """Run FFmpeg for a job, returns a Future of (return code, stderr text)
+
+        A watchdog stops the run if it stalls or exceeds its time budget (see
+        FileConverterApp.job_time_budget; timeout overrides the budget).
+        notify=True also posts the result to the events queue for the Tk thread.
+        source/sink stream the input/output through stdin/stdout (see above).
+        """
+        loop = self._ensure_loop()
+        future = asyncio.run_coroutine_threadsafe(
+            self._run(job, cmd, slot, timeout, on_progress, use_cache, source, sink), loop)
+        if notify:
+            future.add_done_callback(lambda done: self._notify(job, done))
+        return future
+
+    def _notify(self, job, future):
+        try:
+            self.events.put(("complete", job, future.result()))
+        except Exception as e:
+            self.events.put(("error", job, str(e)))
+
+    @staticmethod
+    def _seconds(match):
+        hours, minutes, seconds, centiseconds = map(int, match.groups())
+        return hours * 3600 + minutes * 60 + seconds + centiseconds / 100
+
+    async def _run(self, job, cmd, slot, timeout, on_progress, use_cache, source=None, sink=None):
+        import subprocess
+        app = self.app
+        loop = asyncio.get_running_loop()
+        if use_cache and await loop.run_in_executor(None, app.restore_from_cache, job, cmd):
+            # Identical input and settings converted before: reuse that output
+            if on_progress:
+                on_progress(1.0)
+            return 0, ""
+
+        governor = app.governor
+        spawned = time.monotonic()
+        run_started = app.profiler.now()
+        # stdout is only read when streaming to a sink; stderr carries the progress
+        process = await asyncio.create_subprocess_exec(
+            *governor.wrap_command(cmd, slot),
+            stdin=asyncio.subprocess.PIPE if source is not None else asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE if sink is not None else asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE,
+            creationflags=(subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0) | governor.creationflags()
+        )
+        job.run.process = AsyncProcess(process, loop)
+        governor.apply(job.run.process, slot)
+        app.profiler.record("spawn", run_started, job=job.id)
+
+        lines = []
+        job.run.last_advance = spawned
+        read_task = asyncio.ensure_future(self._read(job, process, spawned, on_progress, lines))
+        pumps = []
+        if source is not None:
+            pumps.append(asyncio.ensure_future(self._feed(job, process, source)))
+        if sink is not None:
+            pumps.append(asyncio.ensure_future(self._drain(process, sink)))
+        try:
+            if job.run.cancel_requested:
+                await self._stop(job, process)  # Cancelled while we were spawning
+            problem = await self._watch(job, read_task, spawned, timeout)
+            if problem:
+                job.run.failure, message = problem
+                app.log_error(f"Watchdog: {message} ({job.path})")
+                await self._stop(job, process)
+                lines.append(f"{message}, FFmpeg stopped\n")
+            await read_task
+            for pump in pumps:
+                try:
+                    await pump
+                except Exception as e:
+                    # A failing sink or source fails the job, even if FFmpeg itself was fine
+                    job.run.failure = job.run.failure or "stream"
+                    lines.append(f"Stream error: {e}\n")
+        finally:
+            # Never leave an FFmpeg process behind
+            for task in [read_task] + pumps:
+                if not task.done():
+                    task.cancel()
+            if process.returncode is None:
+                await self._stop(job, process)
+
+        job.run.encode_time = time.monotonic() - spawned
+        app.profiler.record("ffmpeg", run_started, track=slot, job=job.id, file=os.path.basename(job.path))
+        return_code = process.returncode if not job.run.failure else -1
+        if use_cache and return_code == 0 and not job.run.cancel_requested:
+            await loop.run_in_executor(None, app.save_to_cache, job, cmd)
+        return return_code, "".join(lines)
+
+    async def _feed(self, job, process, source):
+        """Copy the source into FFmpeg's stdin, one reused buffer at a time"""
+        loop = asyncio.get_running_loop()
+        stdin = process.stdin
+        try:
+            if hasattr(source, "readinto") or hasattr(source, "read"):
+                buffer = bytearray(self.pipe_size)
+                view = memoryview(buffer)
+                read = source.readinto if hasattr(source, "readinto") else None
+                while True:
+                    if read:
+                        count = await loop.run_in_executor(None, read, buffer)
+                        chunk = view[:count] if count else None
+                    else:
+                        chunk = await loop.run_in_executor(None, source.read, self.pipe_size)
+                    if not chunk:
+                        break
+                    stdin.write(chunk)
+                    await stdin.drain()  # Before the buffer is reused
+                    job.run.last_advance = time.monotonic()  # Still receiving input: not a hang
+            else:
+                chunks = iter(source)
+                while True:
+                    chunk = await loop.run_in_executor(None, next, chunks, None)
+                    if chunk is None:
+                        break
+                    stdin.write(chunk)
+                    await stdin.drain()
+                    job.run.last_advance = time.monotonic()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # FFmpeg exited early; its return code and stderr say why
+        except Exception:
+            self._abandon(process)  # Don't let FFmpeg finish a truncated input as if it were whole
+            raise
+        finally:
+            stdin.close()
+
+    async def _drain(self, process, sink):
+        """Hand FFmpeg's stdout to the sink as it is produced"""
+        loop = asyncio.get_running_loop()
+        write = sink.write if hasattr(sink, "write") else sink
+        try:
+            while True:
+                chunk = await process.stdout.read(self.pipe_size)
+                if not chunk:
+                    break
+                await loop.run_in_executor(None, write, chunk)
+            if hasattr(sink, "flush"):
+                await loop.run_in_executor(None, sink.flush)
+        except Exception:
+            self._abandon(process)  # Nobody reads stdout any more, FFmpeg would block on it
+            raise
+
+    @staticmethod
+    def _abandon(process):
+        if process.returncode is None:
+            try:
+                process.kill()
+            except ProcessLookupError:
+                pass
+
+    async def _watch(self, job, read_task, spawned, timeout):
+        """Wait for FFmpeg to finish; returns (failure class, message) if it has to be stopped
+
+        Stalled: no sign of progress for stall_timeout seconds. Until FFmpeg
+        reports a position (opening the input, a GIF palette pass), any new
+        output on stderr counts: its stats line keeps coming with time=N/A.
+        After that only an advancing position does. Time spent paused doesn't count.
+        """
+        app = self.app
+        started = spawned
+        last_check = time.monotonic()
+        while True:
+            done, _ = await asyncio.wait({read_task}, timeout=self.watchdog_interval)
+            if done or job.run.cancel_requested:
+                return None
+            now = time.monotonic()
+            if job.status == JobStatus.PAUSED:
+                # Move the clocks forward so a pause doesn't look like a hang
+                started += now - last_check
+                job.run.last_advance += now - last_check
+                last_check = now
+                continue
+            last_check = now
+
+            limit = timeout or app.job_time_budget(job.run.duration)
+            if limit and now - started > limit:
+                return "timeout", f"Timed out after {limit:g}s"
+            if app.stall_timeout and now - job.run.last_advance > app.stall_timeout:
+                return "stalled", f"Stalled: no progress for {app.stall_timeout:g}s"
+
+    async def _read(self, job, process, spawned, on_progress, lines):
+        """Collect stderr to EOF (so FFmpeg never blocks on a full pipe) and track progress"""
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        job.run.duration_seen = False
+        partial = ""
+        while True:
+            chunk = await process.stderr.read(self.read_size)
+            if not chunk:
+                break
+            if job.run.spawn_latency is None:
+                job.run.spawn_latency = time.monotonic() - spawned
+            text = partial + decoder.decode(chunk)
+            parts = self.line_break.split(text)
+            partial = parts.pop()
+            lines.extend(part + "\n" for part in parts)
+            if job.run.media_time is None:
+                # No position yet: FFmpeg writing anything at all means it isn't hung
+                job.run.last_advance = time.monotonic()
+
+            if not job.run.duration_seen and "Duration:" in text:
+                # Input opened
+                job.run.duration_seen = True
+                duration_match = self.duration_pattern.search(text)
+                if job.run.duration is None and duration_match:
+                    # The probe failed: measure against the trimmed range, not the whole input
+                    job.run.duration = self.app.trimmed_duration(self._seconds(duration_match),
+                                                                 (job.trim_start, job.trim_end))
+            # Only the newest progress value in the chunk matters
+            index = text.rfind("time=")
+            time_match = self.time_pattern.match(text, index) if index >= 0 else None
+            if time_match:
+                media_time = self._seconds(time_match)
+                if job.run.media_time is None or media_time > job.run.media_time:
+                    job.run.media_time = media_time
+                    job.run.last_advance = time.monotonic()
+                if job.run.duration:
+                    job.run.progress_fraction = min(media_time / job.run.duration, 1.0)
+                    if on_progress:
+                        on_progress(job.run.progress_fraction)
+        if partial:
+            lines.append(partial + "\n")
+        await process.wait()
+
+    async def _stop(self, job, process):
+        """Terminate, then kill if FFmpeg doesn't exit within 5 seconds"""
+        job.run.resume_process()  # A paused process can't act on terminate
+        try:
+            process.terminate()
+            await asyncio.wait_for(process.wait(), 5)
+        except ProcessLookupError:
+            pass
+        except asyncio.TimeoutError:
+            try:
+                process.kill()
+            except ProcessLookupError:
+                pass
+            await process.wait()
+
+
+class FarmQueue:
+    """Shared render farm job queue stored in an SQLite file
+
+    The GUI submits FFmpeg argument lists; workers on other machines claim
+    them with a time-limited lease that they renew with heartbeats. Jobs whose
+    lease runs out (dead or disconnected worker) go back to the queue for
+    another worker, up to max_attempts times.
+    """
+
+    def __init__(self, path, lease_seconds=60, max_attempts=3):
+        self.path = str(path)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        with closing(self._connect()) as conn:
+            conn.execute("""CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                args TEXT NOT NULL,
+                input TEXT NOT NULL,
+                output TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'queued',
+                worker TEXT,
+                lease_expires REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                progress REAL,
+                return_code INTEGER,
+                error TEXT,
+                created REAL,
+                finished REAL)""")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id)")
+
+    def _connect(self):
+        import sqlite3
+        # One short-lived connection per call, so any thread can use the queue
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def submit(self, args, input_path, output_path):
+        """Queue FFmpeg arguments (without the binary and output file), returns the job id"""
+        with closing(self._connect()) as conn:
+            cursor = conn.execute("INSERT INTO jobs (args, input, output, created) VALUES (?, ?, ?, ?)",
+                                  (json.dumps(args), str(input_path), str(output_path), time.time()))
+            return cursor.lastrowid
+
+    def _requeue_expired(self, conn, now):
+        # Give up on jobs that keep losing their worker, re-dispatch the rest
+        conn.execute("UPDATE jobs SET status = 'failed', error = 'Worker lost too many times', finished = ? "
+                     "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                     (now, now, self.max_attempts))
+        conn.execute("UPDATE jobs SET status = 'queued', worker = NULL, progress = NULL "
+                     "WHERE status = 'leased' AND lease_expires < ?", (now,))
+
+    def requeue_expired(self):
+        """Put jobs from dead workers back in the queue"""
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._requeue_expired(conn, time.time())
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def claim(self, worker_id):
+        """Lease the oldest queued job to a worker (None if the queue is empty)"""
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._requeue_expired(conn, now)
+                row = conn.execute("SELECT * FROM jobs WHERE status = 'queued' ORDER BY id LIMIT 1").fetchone()
+                if row is not None:
+                    conn.execute("UPDATE jobs SET status = 'leased', worker = ?, lease_expires = ?, "
+                                 "attempts = attempts + 1, progress = NULL WHERE id = ?",
+                                 (worker_id, now + self.lease_seconds, row["id"]))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        job = dict(row)
+        job["args"] = json.loads(job["args"])
+        return job
+
+    def heartbeat(self, job_id, worker_id, progress=None):
+        """Renew a lease; False means the worker no longer owns the job (expired or cancelled)"""
+        with closing(self._connect()) as conn:
+            cursor = conn.execute("UPDATE jobs SET lease_expires = ?, progress = ? "
+                                  "WHERE id = ? AND worker = ? AND status = 'leased'",
+                                  (time.time() + self.lease_seconds, progress, job_id, worker_id))
+            return cursor.rowcount == 1
+
+    def complete(self, job_id, worker_id, return_code, error=None):
+        """Record a worker's result (ignored if the lease was lost in the meantime)"""
+        status = "done" if return_code == 0 else "failed"
+        with closing(self._connect()) as conn:
+            cursor = conn.execute("UPDATE jobs SET status = ?, return_code = ?, error = ?, progress = ?, finished = ? "
+                                  "WHERE id = ? AND worker = ? AND status = 'leased'",
+                                  (status, return_code, error, 1.0 if return_code == 0 else None,
+                                   time.time(), job_id, worker_id))
+            return cursor.rowcount == 1
+
+    def cancel(self, job_id):
+        """Cancel a queued or running job (the worker notices on its next heartbeat)"""
+        with closing(self._connect()) as conn:
+            conn.execute("UPDATE jobs SET status = 'cancelled', finished = ? "
+                         "WHERE id = ? AND status IN ('queued', 'leased')", (time.time(), job_id))
+
+    def get_jobs(self, job_ids):
+        """Current rows for the given job ids, as {id: row}"""
+        if not job_ids:
+            return {}
+        with closing(self._connect()) as conn:
+            placeholders = ",".join("?" * len(job_ids))
+            rows = conn.execute(f"SELECT id, status, progress, return_code, error FROM jobs WHERE id IN ({placeholders})",
+                                list(job_ids)).fetchall()
+        return {row["id"]: dict(row) for row in rows}
+
+
+class FarmWorker:
+    """Render farm worker: claims jobs from a FarmQueue and runs them with FFmpeg
+
+    Each job is encoded into the local scratch folder and finalized into the
+    shared output path with the same temp-then-rename step as the GUI.
+    """
+
+    def __init__(self, app, queue, worker_id=None):
+        import socket
+        self.app = app  # Headless FileConverterApp: FFmpeg path, governor, finalize_output
+        self.queue = queue
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.scratch_folder = Path(app.config.get('scratch_dir') or tempfile.gettempdir())
+        self.path_map = app.config.get('farm_path_map', {})  # e.g. {"Z:\\Media": "/mnt/media"}
+        self.poll_seconds = 2
+        self.heartbeat_seconds = max(1, queue.lease_seconds / 4)
+        self.stopping = False
+
+    def map_path(self, value):
+        """Translate a coordinator path to this machine (farm_path_map prefixes)"""
+        for prefix, local in self.path_map.items():
+            if value.startswith(prefix):
+                value = local + value[len(prefix):]
+                if os.sep == '/':
+                    value = value.replace('\\', '/')
+                break
+        return value
+
+    def run(self):
+        """Work until interrupted, one claim loop per parallel slot"""
+        self.app.log_error(f"Farm worker {self.worker_id} serving {self.queue.path}")
+        print(f"Worker {self.worker_id} serving {self.queue.path} with {self.app.governor.max_jobs} slot(s)")
+        threads = [threading.Thread(target=self._slot_loop, args=(slot,), daemon=True)
+                   for slot in range(self.app.governor.max_jobs)]
+        for thread in threads:
+            thread.start()
+        try:
+            while any(thread.is_alive() for thread in threads):
+                time.sleep(1)
+        except KeyboardInterrupt:
+            # Running jobs are killed on exit; their leases expire and other workers pick them up
+            self.stopping = True
+        self.app.save_speed_factors()
+
+    def _slot_loop(self, slot):
+        import sqlite3
+        while not self.stopping:
+            try:
+                row = self.queue.claim(self.worker_id)
+            except sqlite3.Error as e:
+                self.app.log_error(f"Farm queue error: {e}")
+                row = None
+            if row is None:
+                time.sleep(self.poll_seconds)
+                continue
+            try:
+                self._run_job(row, slot)
+            except Exception as e:
+                self.app.log_error(f"Farm job {row['id']} crashed: {e}")
+                try:
+                    self.queue.complete(row["id"], self.worker_id, -1, f"Exception: {e}")
+                except sqlite3.Error:
+                    pass
+            self.app.save_speed_factors(max_age=self.app.speed_save_seconds)
+
+    @staticmethod
+    def trim_from_args(args):
+        """(start, end) seconds from the -ss/-t input options get_trim_options wrote, (None, None) if untrimmed"""
+        start = end = None
+        for option, value in zip(args, args[1:]):
+            if option == "-i":
+                break
+            if option == "-ss":
+                start = float(value)
+            elif option == "-t":
+                end = (start or 0) + float(value)
+        return start, end
+
+    def _run_job(self, row, slot):
+        output_file = Path(self.map_path(row["output"]))
+        args = [self.map_path(arg) for arg in row["args"]]
+        self.scratch_folder.mkdir(parents=True, exist_ok=True)
+        temp_output_file = self.scratch_folder / f"{output_file.stem}.{os.urandom(4).hex()}.tmp{output_file.suffix}"
+
+        governor = self.app.governor
+        cmd = [self.app.ffmpeg_path] + args + governor.threads_option() + ["-y", str(temp_output_file)]
+        self.app.log_error(f"Farm job {row['id']}: {' '.join(cmd)}")
+
+        job = ConversionJob(self.map_path(row["input"]))
+        job.trim_start, job.trim_end = self.trim_from_args(args)  # So progress runs to the end of the range
+        job.start_run(slot)
+        job.run.output_file = output_file
+        job.run.queue_wait = max(0, time.time() - (row["created"] or time.time()))
+
+        # Renew the lease in the background; stop FFmpeg if the job was cancelled or re-dispatched
+        done = threading.Event()
+        lease_lost = threading.Event()
+
+        def heartbeat():
+            import sqlite3
+            while not done.wait(self.heartbeat_seconds):
+                try:
+                    if not self.queue.heartbeat(row["id"], self.worker_id, job.run.progress_fraction):
+                        lease_lost.set()
+                        job.run.cancel_requested = True
+                        job.run.kill_process()
+                        return
+                except sqlite3.Error:
+                    pass  # Try again next beat; the lease only expires after several misses
+
+        heartbeat_thread = threading.Thread(target=heartbeat, daemon=True)
+        heartbeat_thread.start()
+        try:
+            return_code, error = self.app.run_ffmpeg(job, cmd, slot)
+        finally:
+            done.set()
+            heartbeat_thread.join()
+        # Only finalize while we still own the job, so a re-dispatched copy can't be overwritten twice
+        if lease_lost.is_set() or not self.queue.heartbeat(row["id"], self.worker_id, job.run.progress_fraction):
+            self.app._remove_temp_file(temp_output_file)
+            self.app.log_error(f"Farm job {row['id']}: lease lost, result discarded")
+            job.status = JobStatus.CANCELLED
+            self.app.record_job_metrics(job)
+            return
+
+        if return_code == 0:
+            try:
+                self.app.finalize_output(temp_output_file, output_file)
+                self.queue.complete(row["id"], self.worker_id, 0)
+                job.status = JobStatus.DONE
+            except Exception as e:
+                self.app._remove_temp_file(temp_output_file)
+                error = f"Finalize Error: {e}"
+                self.queue.complete(row["id"], self.worker_id, -1, error)
+                job.status = JobStatus.FAILED
+            self.app.record_job_metrics(job, error)
+            return
+
+        self.app._remove_temp_file(temp_output_file)
+        self.queue.complete(row["id"], self.worker_id, return_code, error)
+        job.status = JobStatus.FAILED
+        self.app.record_job_metrics(job, error)
+
+
+class FolderWatcher:
+    """Report new files in a folder once they have stopped growing
+
+    On Linux inotify wakes the watcher as soon as something changes; elsewhere
+    (or if inotify isn't available) the folder is scanned every few seconds.
+    A file is ready once its size and modification time have stayed the same
+    for the settle interval, so files still being copied in are left alone.
+    """
+
+    IN_MODIFY = 0x002
+    IN_ATTRIB = 0x004
+    IN_CLOSE_WRITE = 0x008
+    IN_MOVED_TO = 0x080
+    IN_CREATE = 0x100
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+
+    def __init__(self, folder, extensions, settle_seconds=5, poll_seconds=2, ignore=None):
+        self.folder = Path(folder)
+        self.extensions = {ext.lower() for ext in extensions}
+        self.settle_seconds = settle_seconds
+        self.poll_seconds = poll_seconds
+        self.ignore = ignore  # Optional name filter, e.g. our own outputs
+        self.rescan_seconds = 60  # Safety rescan even when inotify is quiet
+        self.pending = {}  # path -> (size, mtime, unchanged since)
+        self.reported = {}  # path -> (size, mtime) when it was handed on
+        self.stopping = False
+        self._inotify_fd = self._open_inotify()
+
+    def _open_inotify(self):
+        """Watch the folder with inotify, None if not on Linux or it fails"""
+        if not sys.platform.startswith("linux"):
+            return None
+        try:
+            import ctypes
+            libc = ctypes.CDLL(None, use_errno=True)
+            fd = libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+            if fd < 0:
+                return None
+            mask = self.IN_MODIFY | self.IN_ATTRIB | self.IN_CLOSE_WRITE | self.IN_MOVED_TO | self.IN_CREATE
+            if libc.inotify_add_watch(fd, os.fsencode(str(self.folder)), mask) < 0:
+                os.close(fd)
+                return None
+            return fd
+        except (OSError, AttributeError):
+            return None
+
+    def _wait(self, timeout):
+        """Sleep until the folder changes (inotify) or the timeout passes"""
+        import select
+        if self._inotify_fd is None:
+            time.sleep(timeout)
+            return
+        readable, _, _ = select.select([self._inotify_fd], [], [], timeout)
+        if readable:
+            # Events only mean "look again", the scan below works out what changed
+            try:
+                while os.read(self._inotify_fd, 65536):
+                    pass
+            except BlockingIOError:
+                pass
+
+    def scan(self):
+        """Look at the folder once, returns the files that just became ready"""
+        now = time.time()
+        seen = set()
+        ready = []
+        try:
+            entries = list(os.scandir(self.folder))
+        except OSError:
+            return ready
+        for entry in entries:
+            name = entry.name
+            # Skip hidden files and half-written temp files (ours and other tools')
+            if name.startswith('.') or '.tmp.' in name or name.endswith(('.part', '.tmp', '.crdownload')):
+                continue
+            if Path(name).suffix[1:].lower() not in self.extensions:
+                continue
+            if self.ignore and self.ignore(name):
+                continue
+            try:
+                if not entry.is_file():
+                    continue
+                stat = entry.stat()
+            except OSError:
+                continue
+            path = entry.path
+            seen.add(path)
+            signature = (stat.st_size, stat.st_mtime)
+            if self.reported.get(path) == signature:
+                continue  # Already handed on and unchanged since
+            previous = self.pending.get(path)
+            if previous is None or previous[:2] != signature:
+                self.pending[path] = signature + (now,)
+            elif now - previous[2] >= self.settle_seconds and stat.st_size > 0:
+                del self.pending[path]
+                self.reported[path] = signature
+                ready.append(path)
+
+        # Forget files that were moved away or deleted
+        for path in list(self.pending):
+            if path not in seen:
+                del self.pending[path]
+        for path in list(self.reported):
+            if path not in seen:
+                del self.reported[path]
+        return ready
+
+    def run(self, on_ready):
+        """Watch until stop() is called, handing each ready file to on_ready (which may block)"""
+        while not self.stopping:
+            for path in self.scan():
+                on_ready(path)  # Blocks while the converter is busy, so nothing piles up in memory
+            if self.pending:
+                timeout = min(self.poll_seconds, self.settle_seconds)
+            elif self._inotify_fd is not None:
+                timeout = self.rescan_seconds
+            else:
+                timeout = self.poll_seconds
+            self._wait(timeout)
+
+    def stop(self):
+        self.stopping = True
+        if self._inotify_fd is not None:
+            try:
+                os.close(self._inotify_fd)
+            except OSError:
+                pass
+            self._inotify_fd = None
+
+
+class WatchDaemon:
+    """Convert files dropped into a hot folder with the options of a saved preset
+
+    The watcher feeds a small bounded queue; one thread per parallel slot
+    converts from it. When every slot is busy the queue fills up and the
+    watcher waits, so a flood of new files doesn't start a flood of encodes.
+    """
+
+    def __init__(self, app, folder, settings, settle_seconds=5):
+        self.app = app  # Headless FileConverterApp
+        self.settings = dict(settings)
+        if self.settings.get('output_dir', "Same as input") == "Same as input":
+            # Keep outputs out of the hot folder so they aren't picked up again
+            self.settings['output_dir'] = str(Path(folder) / "converted")
+        self.conversion_type, self.suffix = app.get_conversion_type(self.settings)
+        self.trim = app.parse_trim(self.settings)
+        app.open_output_cache()
+        to_format = self.settings['to_format']
+        self.watcher = FolderWatcher(folder, app.file_types.get(self.settings['file_type'], []),
+                                     settle_seconds=settle_seconds,
+                                     ignore=lambda name: name.endswith(f"{self.suffix}.{to_format}"))
+        self.slots = app.governor.max_jobs
+        self.pending = queue.Queue(maxsize=self.slots * 2)
+        self.running_count = 0
+        self.lock = threading.Lock()
+
+    def run(self):
+        """Watch and convert until interrupted"""
+        mode = "inotify" if self.watcher._inotify_fd is not None else f"polling every {self.watcher.poll_seconds}s"
+        print(f"Watching {self.watcher.folder} ({mode}), output to {self.settings['output_dir']}")
+        self.app.log_error(f"Watching {self.watcher.folder} with {self.slots} slot(s)")
+        for slot in range(self.slots):
+            threading.Thread(target=self._slot_loop, args=(slot,), daemon=True).start()
+        try:
+            self.watcher.run(lambda path: self.pending.put(ConversionJob(path)))
+        except KeyboardInterrupt:
+            self.watcher.stop()
+        self.app.save_speed_factors()
+
+    def _slot_loop(self, slot):
+        while True:
+            job = self.pending.get()
+            try:
+                self._convert(job, slot)
+            except Exception as e:
+                self.app.log_error(f"Watch folder: {job.path} crashed: {e}")
+                print(f"❌ {os.path.basename(job.path)}: {e}")
+                job.status = JobStatus.FAILED
+                self.app.record_job_metrics(job, f"Exception: {e}")
+            self.app.save_speed_factors(max_age=self.app.speed_save_seconds)
+
+    def _wait_for_admission(self):
+        """Hold the job back while the machine is busy or low on memory"""
+        governor = self.app.governor
+        while True:
+            with self.lock:
+                allowed, reason = governor.admit(self.running_count)
+                if allowed:
+                    self.running_count += 1
+                    return
+            time.sleep(governor.retry_ms / 1000)
+
+    def _convert(self, job, slot):
+        app = self.app
+        job.start_run(slot)
+        input_path = Path(job.path)
+        to_format = self.settings['to_format']
+        output_folder = app.get_output_folder(input_path, self.settings)
+        output_file = output_folder / f"{input_path.stem}{self.suffix}.{to_format}"
+        if output_file.exists():
+            # Converted on an earlier run; never overwrite without asking
+            print(f"⏭ {input_path.name}: {output_file.name} already exists")
+            job.status = JobStatus.SKIPPED
+            app.record_job_metrics(job)
+            return
+
+        scratch_folder = Path(app.config.get('scratch_dir') or output_folder)
+        scratch_folder.mkdir(parents=True, exist_ok=True)
+        temp_output_file = scratch_folder / f"{input_path.stem}{self.suffix}.{os.urandom(4).hex()}.tmp.{to_format}"
+
+        job.trim_start, job.trim_end = self.trim
+        probe_started = time.monotonic()
+        media = app.probe_media(str(input_path))
+        job.run.duration = app.trimmed_duration(media['duration'], self.trim)
+        job.run.probe_time = time.monotonic() - probe_started
+
+        loudness = None
+        if app.normalizes_audio(self.conversion_type, self.settings):
+            loudness = app.loudness.measure(str(input_path))
+        crf = None
+        codec = app.quality_codec(self.conversion_type, self.settings)
+        if codec:
+            crf = app.quality_search.search(str(input_path), codec, int(self.settings['quality_target']))
+        cmd = app.build_command(input_path, self.conversion_type, self.settings, job.run.duration, loudness, crf,
+                                self.trim, media)
+        job.run.kind = app.job_kind(self.conversion_type, cmd)
+        cmd.extend(app.governor.threads_option())
+        cmd.extend(["-y", str(temp_output_file)])
+
+        # Wait for disk space instead of failing halfway through the encode
+        estimated_size = app.estimate_output_size(cmd, str(input_path), job.run.duration, self.settings['file_type'], to_format)
+        while not app.has_room_for(temp_output_file, output_file, estimated_size):
+            app.log_error(f"Watch folder: waiting for disk space for {input_path.name}")
+            time.sleep(app.disk_retry_ms / 1000)
+
+        job.run.output_file = output_file
+        if app.restore_from_cache(job, cmd):
+            return_code, error = 0, None
+        else:
+            self._wait_for_admission()
+            job.run.queue_wait = time.monotonic() - job.queued_at
+            try:
+                app.log_error(f"Running command: {' '.join(cmd)}")
+                print(f"⏳ {input_path.name}")
+                return_code, error = app.run_ffmpeg(job, cmd, slot)
+            finally:
+                with self.lock:
+                    self.running_count -= 1
+            if return_code == 0:
+                app.save_to_cache(job, cmd)
+
+        if return_code != 0:
+            app._remove_temp_file(temp_output_file)
+            app.log_error(f"Watch folder: {input_path.name} failed ({return_code}): {error}")
+            print(f"❌ {input_path.name}: {error}")
+            job.status = JobStatus.FAILED
+            app.record_job_metrics(job, error)
+            return
+        try:
+            app.finalize_output(temp_output_file, output_file)
+        except Exception as e:
+            app._remove_temp_file(temp_output_file)
+            app.log_error(f"Watch folder: could not finalize {output_file}: {e}")
+            print(f"❌ {input_path.name}: {e}")
+            job.status = JobStatus.FAILED
+            app.record_job_metrics(job, f"Finalize Error: {e}")
+            return
+        print(f"✅ {input_path.name} -> {output_file}")
+        job.status = JobStatus.DONE
+        app.record_job_metrics(job)
+
+
+class OutputCache:
+    """Content-addressed store of finished outputs, so duplicate inputs aren't re-encoded
+
+    An entry's key hashes the input's content, the FFmpeg arguments that shape
+    the output and the FFmpeg version. A cheap partial hash (size, first and
+    last 64 KiB) is checked first; the full streamed hash is only needed when
+    the partial one matches an entry, or to store a new result (it then runs
+    in the background while FFmpeg encodes). New outputs are cloned or copied
+    in, never hardlinked, so the cache owns its data; hits are reflinked,
+    hardlinked or copied into place, and an entry whose size or mtime changed
+    since it was stored is dropped. The least recently used entries are
+    evicted to stay under max_bytes.
+    """
+
+    FICLONE = 0x40049409  # Linux ioctl: copy-on-write clone of a whole file
+    partial_chunk = 64 * 1024
+    read_chunk = 1024 * 1024
+
+    def __init__(self, folder, max_bytes, ffmpeg_version):
+        import sqlite3
+        from concurrent.futures import ThreadPoolExecutor
+        self.folder = Path(folder)
+        self.objects = self.folder / "objects"
+        self.objects.mkdir(parents=True, exist_ok=True)
+        self.index_path = str(self.folder / "index.db")
+        self.max_bytes = max_bytes
+        self.ffmpeg_version = ffmpeg_version or ""
+        self._hasher = ThreadPoolExecutor(max_workers=2, thread_name_prefix="cache-hash")
+        self._pending_hashes = {}  # (path, size, mtime_ns) -> Future
+        self._lock = threading.Lock()
+        with closing(self._connect()) as conn:
+            conn.execute("""CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                prefilter TEXT NOT NULL,
+                file TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL,
+                last_used REAL,
+                mtime_ns INTEGER)""")
+            try:
+                conn.execute("ALTER TABLE entries ADD COLUMN mtime_ns INTEGER")  # Caches from older versions
+            except sqlite3.OperationalError:
+                pass
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_prefilter ON entries (prefilter)")
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)")
+            # Full hashes of inputs we've already read, until the file changes
+            conn.execute("""CREATE TABLE IF NOT EXISTS hashes (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                digest TEXT NOT NULL)""")
+
+    def _connect(self):
+        import sqlite3
+        return sqlite3.connect(self.index_path, timeout=30, isolation_level=None)
+
+    def _digest(self, *parts):
+        import hashlib
+        digest = hashlib.blake2b(digest_size=32)
+        for part in parts:
+            digest.update(part.encode("utf-8") if isinstance(part, str) else part)
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def partial_hash(self, path):
+        """Size plus the first and last 64 KiB: cheap, and tells most different files apart"""
+        size = os.path.getsize(path)
+        with open(path, "rb") as f:
+            head = f.read(self.partial_chunk)
+            tail = b""
+            if size > self.partial_chunk:
+                f.seek(max(self.partial_chunk, size - self.partial_chunk))
+                tail = f.read(self.partial_chunk)
+        return self._digest(str(size), head, tail)
+
+    def full_hash(self, path):
+        """Hash of the whole file, streamed through one reused buffer (remembered until the file changes)"""
+        import hashlib
+        stat = os.stat(path)
+        path = os.path.abspath(path)
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT digest FROM hashes WHERE path = ? AND size = ? AND mtime_ns = ?",
+                               (path, stat.st_size, stat.st_mtime_ns)).fetchone()
+        if row:
+            return row[0]
+
+        digest = hashlib.blake2b(digest_size=32)
+        buffer = bytearray(self.read_chunk)
+        view = memoryview(buffer)
+        with open(path, "rb") as f:
+            while True:
+                count = f.readinto(buffer)
+                if not count:
+                    break
+                digest.update(view[:count])
+        result = digest.hexdigest()
+        with closing(self._connect()) as conn:
+            conn.execute("INSERT OR REPLACE INTO hashes (path, size, mtime_ns, digest) VALUES (?, ?, ?, ?)",
+                         (path, stat.st_size, stat.st_mtime_ns, result))
+        return result
+
+    def _full_hash_future(self, path):
+        """Start (or join) hashing a file in the background"""
+        stat = os.stat(path)
+        token = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            future = self._pending_hashes.get(token)
+            started = future is None
+            if started:
+                future = self._hasher.submit(self.full_hash, path)
+                self._pending_hashes[token] = future
+        if started:
+            # Outside the lock: the callback runs right away if hashing already finished
+            future.add_done_callback(lambda done: self._forget_hash(token))
+        return future
+
+    def _forget_hash(self, token):
+        with self._lock:
+            self._pending_hashes.pop(token, None)
+
+    def _key(self, content_hash, args):
+        return self._digest(content_hash, "\x1f".join(args), self.ffmpeg_version)
+
+    def lookup(self, input_path, args):
+        """Cached output file for this input and arguments, or None"""
+        prefilter = self._key(self.partial_hash(input_path), args)
+        with closing(self._connect()) as conn:
+            candidates = conn.execute("SELECT 1 FROM entries WHERE prefilter = ? LIMIT 1", (prefilter,)).fetchone()
+        future = self._full_hash_future(input_path)
+        if not candidates:
+            return None  # Definitely new; the full hash keeps running for store()
+
+        key = self._key(future.result(), args)
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT file, size, mtime_ns FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            cached_file = self.folder / row[0]
+            try:
+                stat = os.stat(cached_file)
+                if stat.st_size != row[1] or (row[2] is not None and stat.st_mtime_ns != row[2]):
+                    raise OSError("changed")
+            except OSError:
+                # Deleted or modified behind our back: forget it
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                return None
+            conn.execute("UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key))
+        return cached_file
+
+    def _clone(self, source, target):
+        """Copy-on-write clone (Btrfs, XFS, APFS-style filesystems), True on success"""
+        if fcntl is None or not sys.platform.startswith("linux"):
+            return False
+        try:
+            with open(source, "rb") as src, open(target, "wb") as dst:
+                fcntl.ioctl(dst.fileno(), self.FICLONE, src.fileno())
+            return True
+        except OSError:
+            try:
+                os.remove(target)
+            except OSError:
+                pass
+            return False
+
+    def materialize(self, cached_file, target):
+        """Deliver a cache hit to target: reflink, else hardlink, else copy"""
+        target = Path(target)
+        if target.exists():
+            target.unlink()
+        if self._clone(cached_file, target):
+            return "reflink"
+        try:
+            os.link(cached_file, target)
+            return "hardlink"
+        except OSError:
+            shutil.copyfile(cached_file, target)
+            return "copy"
+
+    def store(self, input_path, args, output_file):
+        """Add a finished output to the cache, then evict old entries to stay under the size limit"""
+        content_hash = self._full_hash_future(input_path).result()
+        key = self._key(content_hash, args)
+        prefilter = self._key(self.partial_hash(input_path), args)
+        relative = Path("objects") / key[:2] / f"{key}{Path(output_file).suffix}"
+        cached_file = self.folder / relative
+        cached_file.parent.mkdir(parents=True, exist_ok=True)
+
+        # Write under a temporary name so a half-copied file is never indexed. Never
+        # hardlink here: the cache must own its data, or editing the output in place
+        # would quietly change the cached copy too
+        staging = cached_file.with_name(f".{key}.{os.urandom(4).hex()}.part")
+        if not self._clone(output_file, staging):
+            shutil.copyfile(output_file, staging)
+        os.replace(staging, cached_file)
+        stat = os.stat(cached_file)
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute("INSERT OR REPLACE INTO entries (key, prefilter, file, size, created, last_used, mtime_ns) "
+                         "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                         (key, prefilter, relative.as_posix(), stat.st_size, now, now, stat.st_mtime_ns))
+        self.evict()
+
+    def evict(self):
+        """Drop least recently used entries until the cache fits in max_bytes"""
+        with closing(self._connect()) as conn:
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            for key, file, size in conn.execute("SELECT key, file, size FROM entries ORDER BY last_used").fetchall():
+                if total <= self.max_bytes:
+                    break
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                try:
+                    os.remove(self.folder / file)
+                except OSError:
+                    pass
+                total -= size
+
+
+class LoudnessAnalyzer:
+    """EBU R128 loudness measurements for two-pass loudnorm, cached per source file
+
+    The measuring pass (a decode of the audio only) runs in a small thread
+    pool, so the files further down a batch are analysed while earlier ones
+    encode. Results are stored under a hash of the file's content and the
+    target, so a file is only measured once however often it is converted or
+    renamed. A cheap fingerprint (size, first and last 64 KiB) finds the
+    candidates; the full hash confirms a match, since files that differ only
+    in the middle share a fingerprint.
+    """
+
+    target = "I=-16:TP=-1.5:LRA=11"  # Podcast/streaming loudness: -16 LUFS, -1.5 dBTP
+    fingerprint_chunk = 64 * 1024
+    read_chunk = 1024 * 1024
+    json_pattern = re.compile(r'\{[^{}]*"input_i"[^{}]*\}')
+    rate_pattern = re.compile(r'Audio: .*?(\d+) Hz')
+
+    def __init__(self, app, path, workers=2):
+        self.app = app
+        self.path = str(path)
+        self.workers = workers
+        self._pool = None  # Started with the first measurement
+        self._futures = {}  # Absolute path -> Future of the measurement (or None)
+        self._lock = threading.Lock()
+        self._table_ready = False
+
+    def _connect(self):
+        import sqlite3
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        if not self._table_ready:
+            conn.execute("""CREATE TABLE IF NOT EXISTS loudness (
+                content_hash TEXT NOT NULL,
+                target TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                data TEXT NOT NULL,
+                PRIMARY KEY (content_hash, target))""")
+            conn.execute("CREATE INDEX IF NOT EXISTS loudness_fingerprint ON loudness (fingerprint, target)")
+            self._table_ready = True
+        return conn
+
+    def fingerprint(self, path):
+        import hashlib
+        size = os.path.getsize(path)
+        digest = hashlib.blake2b(str(size).encode("utf-8"), digest_size=20)
+        with open(path, "rb") as f:
+            digest.update(f.read(self.fingerprint_chunk))
+            if size > self.fingerprint_chunk:
+                f.seek(max(self.fingerprint_chunk, size - self.fingerprint_chunk))
+                digest.update(f.read(self.fingerprint_chunk))
+        return digest.hexdigest()
+
+    def content_hash(self, path):
+        """Hash of the whole file, streamed through one reused buffer"""
+        import hashlib
+        digest = hashlib.blake2b(digest_size=32)
+        buffer = bytearray(self.read_chunk)
+        view = memoryview(buffer)
+        with open(path, "rb") as f:
+            while True:
+                count = f.readinto(buffer)
+                if not count:
+                    break
+                digest.update(view[:count])
+        return digest.hexdigest()
+
+    def prefetch(self, paths):
+        """Queue analysis of files in the order they will be converted"""
+        for path in paths:
+            self.measure_async(path)
+
+    def measure_async(self, path):
+        """Future of a file's measurement; starts the analysis unless it's already running or done"""
+        key = os.path.abspath(path)
+        with self._lock:
+            future = self._futures.get(key)
+            if future is None or future.cancelled():
+                if self._pool is None:
+                    from concurrent.futures import ThreadPoolExecutor
+                    self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="loudnorm")
+                future = self._pool.submit(self.measure, path)
+                self._futures[key] = future
+        return future
+
+    def forget(self, path):
+        """Drop a finished measurement once it is used: the next batch checks the file's content again"""
+        with self._lock:
+            self._futures.pop(os.path.abspath(path), None)
+
+    def cancel_pending(self):
+        """Forget the batch's analyses: cancel those that haven't started (the batch ended or was cancelled)"""
+        with self._lock:
+            for future in self._futures.values():
+                future.cancel()
+            self._futures.clear()
+
+    def measure(self, path):
+        """loudnorm's measured values for a file (dict), or None if it has no usable audio"""
+        import sqlite3
+        import subprocess
+        try:
+            fingerprint = self.fingerprint(path)
+            with closing(self._connect()) as conn:
+                rows = conn.execute("SELECT content_hash, data FROM loudness WHERE fingerprint = ? AND target = ?",
+                                    (fingerprint, self.target)).fetchall()
+            content_hash = None
+            if rows:
+                # Same size, start and end: only the whole content tells whether it's the same file
+                content_hash = self.content_hash(path)
+                for stored_hash, data in rows:
+                    if stored_hash == content_hash:
+                        return json.loads(data)
+
+            cmd = [self.app.ffmpeg_path, "-hide_banner", "-nostats", "-i", path, "-vn", "-sn", "-dn",
+                   "-af", f"loudnorm={self.target}:print_format=json", "-f", "null", "-"]
+            creationflags = (subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0) | self.app.governor.creationflags()
+            result = subprocess.run(cmd, capture_output=True, text=True, errors="replace",
+                                    creationflags=creationflags)
+            match = self.json_pattern.search(result.stderr)
+            if result.returncode != 0 or not match:
+                self.app.log_error(f"Loudness analysis failed for {path}: {result.stderr.strip()[-300:]}")
+                return None
+            measurement = json.loads(match.group(0))
+            rate_match = self.rate_pattern.search(result.stderr)
+            measurement["sample_rate"] = int(rate_match.group(1)) if rate_match else 48000
+            content_hash = content_hash or self.content_hash(path)
+        except (OSError, sqlite3.Error, ValueError) as e:
+            self.app.log_error(f"Loudness analysis failed for {path}: {e}")
+            return None
+
+        if not self._is_finite(measurement.get("input_i")):
+            return None  # Silent: nothing to normalize
+        try:
+            with closing(self._connect()) as conn:
+                conn.execute("INSERT OR REPLACE INTO loudness (content_hash, target, fingerprint, data) VALUES (?, ?, ?, ?)",
+                             (content_hash, self.target, fingerprint, json.dumps(measurement)))
+        except sqlite3.Error as e:
+            self.app.log_error(f"Could not save loudness measurement: {e}")
+        return measurement
+
+    def _is_finite(self, value):
+        try:
+            return abs(float(value)) != float("inf")
+        except (TypeError, ValueError):
+            return False
+
+    def params(self, measurement, to_format):
+        """Second pass: apply the measured values as one linear gain, back at the source sample rate"""
+        loudnorm = (f"loudnorm={self.target}:measured_I={measurement['input_i']}"
+                    f":measured_TP={measurement['input_tp']}:measured_LRA={measurement['input_lra']}"
+                    f":measured_thresh={measurement['input_thresh']}:offset={measurement['target_offset']}"
+                    f":linear=true")
+        # loudnorm works at 192 kHz; Opus (opus, webm) only takes 48 kHz
+        sample_rate = 48000 if to_format in ["opus", "webm"] else measurement["sample_rate"]
+        return ["-af", loudnorm, "-ar", str(sample_rate)]
+
+
+class QualitySearch:
+    """Finds the cheapest CRF that still meets a quality target, from short sample encodes
+
+    A few segments spread over the file are encoded at every candidate CRF in
+    parallel and compared with the source: VMAF if FFmpeg was built with
+    libvmaf, SSIM otherwise. The full encode then uses the CRF with the
+    smallest samples whose worst segment still meets the target. Samples use
+    the same encoder settings as the full encode; their length and count set
+    the cost of the search.
+    """
+
+    sample_seconds = 4
+    sample_count = 3
+    candidates = {
+        "libx264": [18, 20, 22, 24, 26, 28, 30, 32],
+        "libvpx-vp9": [24, 28, 32, 36, 40, 44],
+    }
+    ssim_targets = {95: 0.990, 93: 0.985, 90: 0.975}  # Rough SSIM equivalents of the VMAF targets
+    vmaf_pattern = re.compile(r'VMAF score: ([\d.]+)')
+    ssim_pattern = re.compile(r'SSIM .*All:([\d.]+)')
+
+    def __init__(self, app, workers=None):
+        self.app = app
+        self.workers = workers or max(2, (os.cpu_count() or 2) // 2)
+        self._searches = self._samples = None  # Started with the first search (see _start_pools)
+        self._futures = {}  # (path, codec, target) -> Future of the CRF (or None)
+        self._lock = threading.Lock()
+        self._vmaf = None
+
+    def has_vmaf(self):
+        """Whether this FFmpeg build has the libvmaf filter (checked once)"""
+        import subprocess
+        if self._vmaf is None:
+            try:
+                result = subprocess.run([self.app.ffmpeg_path, "-hide_banner", "-filters"],
+                                        capture_output=True, text=True, errors="replace",
+                                        creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0)
+                self._vmaf = " libvmaf " in result.stdout
+            except OSError:
+                self._vmaf = False
+        return self._vmaf
+
+    def search_async(self, path, codec, target):
+        """Future of the CRF for a file; starts the search unless it's already running or done"""
+        key = (os.path.abspath(path), codec, target)
+        self._start_pools()
+        with self._lock:
+            future = self._futures.get(key)
+            if future is None or future.cancelled():
+                future = self._searches.submit(self.search, path, codec, target)
+                self._futures[key] = future
+        return future
+
+    def _start_pools(self):
+        with self._lock:
+            if self._searches is None:
+                from concurrent.futures import ThreadPoolExecutor
+                self._searches = ThreadPoolExecutor(max_workers=2, thread_name_prefix="crf-search")
+                self._samples = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="crf-sample")
+
+    def forget(self, path, codec, target):
+        """Drop a finished search once its CRF is used (a later batch may see a changed file)"""
+        with self._lock:
+            self._futures.pop((os.path.abspath(path), codec, target), None)
+
+    def cancel_pending(self):
+        """Forget the batch's searches: cancel those that haven't started (the batch ended or was cancelled)"""
+        with self._lock:
+            for future in self._futures.values():
+                future.cancel()
+            self._futures.clear()
+
+    def search(self, path, codec, target):
+        """Highest-compression CRF whose samples reach the target, or None if nothing could be measured"""
+        candidates = self.candidates.get(codec)
+        if not candidates:
+            return None
+        use_vmaf = self.has_vmaf()
+        threshold = target if use_vmaf else self.ssim_targets.get(target, 0.985)
+
+        duration = self.app.get_media_duration(path)
+        if duration and duration > self.sample_seconds * self.sample_count * 2:
+            length = self.sample_seconds
+            starts = [duration * (i + 1) / (self.sample_count + 1) - length / 2 for i in range(self.sample_count)]
+        else:
+            # Short (or unknown) clip: one sample from the start
+            length = min(duration or 10, 10)
+            starts = [0]
+
+        self._start_pools()  # search() is also called directly (watch folder)
+        with tempfile.TemporaryDirectory(prefix="hindura-crf-") as folder:
+            samples = {(crf, start): self._samples.submit(self._sample, path, codec, crf, start, length,
+                                                          folder, use_vmaf)
+                       for crf in candidates for start in starts}
+            results = {key: future.result() for key, future in samples.items()}
+
+        passing = []
+        for crf in candidates:
+            measured = [results[(crf, start)] for start in starts]
+            if any(result is None for result in measured):
+                continue
+            if min(score for score, size in measured) >= threshold:
+                passing.append((sum(size for score, size in measured), crf))
+        if not any(results.values()):
+            self.app.log_error(f"Quality search failed for {path}")
+            return None
+        if not passing:
+            best = min(candidates)  # Nothing reaches the target: best quality on offer
+        else:
+            best = min(passing)[1]
+        self.app.log_error(f"Quality search: {os.path.basename(path)} -> {codec} CRF {best} "
+                           f"({'VMAF' if use_vmaf else 'SSIM'} target {threshold})")
+        return best
+
+    def _sample(self, path, codec, crf, start, length, folder, use_vmaf):
+        """Encode one segment at a CRF; returns (quality score, bytes) or None"""
+        import subprocess
+        creationflags = subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
+        sample_file = os.path.join(folder, f"{crf}_{start:.0f}.mkv")
+        segment = ["-ss", f"{start:.3f}", "-t", f"{length:.3f}", "-i", path]
+        encode = [self.app.ffmpeg_path, "-hide_banner", "-nostats"] + segment + [
+            "-an", "-sn", "-c:v", codec, "-crf", str(crf), "-threads", "2"]
+        if codec == "libvpx-vp9":
+            encode += ["-b:v", "0"]  # Constant quality, as in get_compression_params
+        # No faster preset or deadline than the full encode (the encoder defaults): at the same CRF
+        # they give a different quality, VP9's realtime mode especially, and the CRF would miss the target
+        encode += ["-y", sample_file]
+        # Distorted first, reference second; both start at zero so frames line up
+        compare_filter = "libvmaf" if use_vmaf else "ssim"
+        compare = [self.app.ffmpeg_path, "-hide_banner", "-nostats", "-i", sample_file] + segment + [
+            "-lavfi", f"[0:v]setpts=PTS-STARTPTS[d];[1:v]setpts=PTS-STARTPTS[r];[d][r]{compare_filter}",
+            "-f", "null", "-"]
+        try:
+            result = subprocess.run(encode, capture_output=True, text=True, errors="replace",
+                                    creationflags=creationflags)
+            if result.returncode != 0:
+                return None
+            size = os.path.getsize(sample_file)
+            result = subprocess.run(compare, capture_output=True, text=True, errors="replace",
+                                    creationflags=creationflags)
+        except OSError:
+            return None
+        match = (self.vmaf_pattern if use_vmaf else self.ssim_pattern).search(result.stderr)
+        if result.returncode != 0 or not match:
+            return None
+        return float(match.group(1)), size
+
+
+class BatchPlanner:
+    """Dry run of a batch: what each file would become, the FFmpeg command, and the cost
+
+    Inputs are probed in parallel and nothing is written. CPU time comes from
+    speed factors measured on earlier runs (see FileConverterApp.record_speed:
+    media seconds per CPU-second for each kind of job and output format);
+    kinds that haven't been measured yet use conservative defaults. Output
+    sizes use the same estimate as the disk space check.
+    """
+
+    default_speeds = {
+        "copy": 100.0,
+        "audio_extract": 20.0,
+        "gif": 1.0,
+        "thumbnails": 50.0,
+        "compress": 0.3,
+        "resize": 0.5,
+        "resize_standard": 0.5,
+        "standard": 0.4,
+        "loudness": 100.0,  # Measuring pass
+    }
+    default_file_seconds = 0.5  # Images and files without a duration, per file
+
+    def __init__(self, app, settings, workers=None):
+        self.app = app
+        self.settings = settings
+        self.workers = workers or min(32, (os.cpu_count() or 1) * 2)
+        self.conversion_type, self.suffix = app.get_conversion_type(settings)
+        self.trim = app.parse_trim(settings)
+
+    def plan(self, paths):
+        """One entry per input, in order (probes run in parallel)"""
+        from concurrent.futures import ThreadPoolExecutor
+        paths = [str(path) for path in paths]
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="plan-probe") as pool:
+            media = list(pool.map(self.app.probe_media, paths))
+        return [self._plan_file(path, info) for path, info in zip(paths, media)]
+
+    def speed(self, kind, to_format):
+        """Calibrated media seconds per CPU-second, or the default for the kind"""
+        factors = self.app.config.get('speed_factors', {})
+        for key in (f"{kind}/{to_format}", kind):
+            if factors.get(key, {}).get('speed'):
+                return factors[key]['speed']
+        return self.default_speeds.get(kind, self.default_speeds["standard"])
+
+    def file_seconds(self, kind, to_format):
+        factors = self.app.config.get('speed_factors', {})
+        for key in (f"{kind}/{to_format}", kind):
+            if factors.get(key, {}).get('file_seconds'):
+                return factors[key]['file_seconds']
+        return self.default_file_seconds
+
+    def _plan_file(self, path, media):
+        app = self.app
+        settings = self.settings
+        to_format = settings['to_format']
+        input_path = Path(path)
+        output_dir = settings.get('output_dir', "Same as input")
+        output_folder = input_path.parent if output_dir == "Same as input" else Path(output_dir)
+        output_file = output_folder / f"{input_path.stem}{self.suffix}.{to_format}"
+        entry = {'path': path, 'output': str(output_file), 'kind': self.conversion_type, 'argv': None,
+                 'duration': None, 'cpu_seconds': 0.0, 'output_bytes': 0, 'problem': None, 'note': None}
+
+        if not os.path.isfile(path):
+            entry['problem'] = "input missing"
+            return entry
+        if media['duration'] is None and media['width'] is None:
+            entry['problem'] = "FFmpeg can't read it"
+            return entry
+        duration = app.trimmed_duration(media['duration'], self.trim)
+        entry['duration'] = duration
+        try:
+            cmd = app.build_command(path, self.conversion_type, settings, duration, trim=self.trim, media=media)
+        except ValueError as e:
+            entry['problem'] = str(e)
+            return entry
+        cmd += app.governor.threads_option() + ["-y", str(output_file)]
+        entry['argv'] = cmd
+        kind = app.job_kind(self.conversion_type, cmd)
+        entry['kind'] = kind
+
+        notes = []
+        if duration:
+            cpu_seconds = duration / self.speed(kind, to_format)
+        else:
+            cpu_seconds = self.file_seconds(kind, to_format)
+        if app.normalizes_audio(self.conversion_type, settings):
+            notes.append("loudness measured first")
+            cpu_seconds += (media['duration'] or 0) / self.speed("loudness", "")
+        codec = app.quality_codec(self.conversion_type, settings)
+        if codec:
+            notes.append("CRF picked by sample encodes")
+            samples = len(QualitySearch.candidates[codec]) * QualitySearch.sample_count * QualitySearch.sample_seconds
+            cpu_seconds += samples / self.speed("compress", to_format)
+        if output_file.exists():
+            notes.append("output exists")
+        entry['cpu_seconds'] = cpu_seconds
+        entry['output_bytes'] = app.estimate_output_size(cmd, path, duration, settings['file_type'], to_format)
+        entry['note'] = ", ".join(notes) or None
+        return entry
+
+    def totals(self, entries):
+        """Summary of a plan: counts by kind, CPU-seconds, bytes and problems"""
+        kinds = {}
+        for entry in entries:
+            if not entry['problem']:
+                kinds[entry['kind']] = kinds.get(entry['kind'], 0) + 1
+        cpu_seconds = sum(entry['cpu_seconds'] for entry in entries)
+        return {
+            'files': len(entries),
+            'kinds': kinds,
+            'problems': sum(1 for entry in entries if entry['problem']),
+            'cpu_seconds': cpu_seconds,
+            'output_bytes': sum(entry['output_bytes'] for entry in entries),
+            'wall_seconds': cpu_seconds / self.app.governor.cpu_count,  # On this machine, all cores busy
+        }
+
+    def shards(self, entries, count):
+        """Split the runnable files into count groups of about equal CPU time (largest first)"""
+        shards = [(0.0, index, []) for index in range(max(1, count))]
+        heapq.heapify(shards)
+        for entry in sorted((e for e in entries if not e['problem']), key=lambda e: -e['cpu_seconds']):
+            total, index, files = heapq.heappop(shards)
+            files.append(entry)
+            heapq.heappush(shards, (total + entry['cpu_seconds'], index, files))
+        return [files for total, index, files in sorted(shards, key=lambda shard: shard[1])]
+
 
 class FileConverterApp:
     def __init__(self, root):
@@ -20,6 +2254,43 @@ class FileConverterApp:
         self.root.geometry("800x800")
         self.root.resizable(True, True)
 
+        # Looking for FFmpeg runs it (up to a few times), so the window doesn't wait for it
+        self._init_engine(find_ffmpeg=False)
+        self.ffmpeg_search = threading.Thread(target=self._search_ffmpeg, name="find-ffmpeg", daemon=True)
+        self.ffmpeg_search.start()
+
+        self.input_files = {}  # Selected paths in the order they were added (dict: fast duplicate checks)
+        self.input_file = None # Keep for compatibility, will be "current file"
+        self.summary = BatchSummary()  # Results of the current/last batch (failed jobs for retry)
+        self.job_queue = JobQueue()
+        self.batch_jobs = []  # Every job in the current/last batch
+        self.max_list_rows = 200  # File/job rows drawn at once; the rest are summarized in one line
+        self.running_jobs = []
+        self._admit_retry_pending = False
+        self.load_window_geometry()
+
+        # Progress written by the engine, drawn by the UI at a fixed rate
+        self.progress_tracker = ProgressAggregator()
+        self.progress_poll_ms = 100  # 10 redraws per second at most
+        self._progress_poll_id = None
+        self._last_progress_state = None
+        self._shown_progress = {}  # Last values pushed to each widget
+
+        self.create_widgets()
+        
+        # Save window position on close
+        self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
+    
+    @classmethod
+    def headless(cls):
+        """Create the converter without a window (render farm worker, command line tools)"""
+        app = cls.__new__(cls)
+        app.root = None
+        app._init_engine()
+        return app
+
+    def _init_engine(self, find_ffmpeg=True):
+        """Set up everything that doesn't need a window: formats, FFmpeg, settings"""
         # File types and their supported formats
         self.file_types = {
             "Video": ["mp4", "avi", "mkv", "mov", "wmv", "flv", "webm", "m4v", "mpg", "mpeg", "gif"],
@@ -32,7 +2303,8 @@ class FileConverterApp:
         self.main_modes = [
             "Standard Conversion",
             "Resize",
-            "Compression"
+            "Compression",
+            "Thumbnails"
         ]
 
         # Conversion sub-options for visual media
@@ -42,20 +2314,115 @@ class FileConverterApp:
         self.resize_options = ["None", "1920x1080 (1080p)", "1280x720 (720p)",
                                "854x480 (480p)", "640x360 (360p)", "Custom"]
 
-        self.input_files = []
-        self.input_file = None # Keep for compatibility, will be "current file"
-        self.failed_files_paths = []  # Store paths for retry functionality
-        self.ffmpeg_path = self.find_ffmpeg()
-        
+        # Thumbnail output formats and frame counts (more than one frame is tiled into a sheet)
+        self.thumbnail_formats = ["jpg", "png", "webp"]
+        self.thumbnail_counts = ["1", "4", "6", "9", "12", "16", "20"]
+
+        self.ffmpeg_path = self.find_ffmpeg() if find_ffmpeg else None
+        self.ffmpeg_search = None  # Background search started with the window
+
         # Config file for saving window settings
         self.config_file = Path(os.path.dirname(os.path.abspath(__file__))) / "hindura_config.json"
-        self.load_window_geometry()
+        self.config = self.load_config()
+
+        # Disk space: keep this much free on the output drive before starting a job
+        self.disk_headroom_bytes = int(self.config.get('disk_headroom_mb', 500)) * 1024 * 1024
+        self.disk_retry_ms = 5000  # How often to re-check while the queue is paused
+        self.finalize_chunk_size = 8 * 1024 * 1024  # Copy size when the scratch dir is on another drive
+        self.thumbnail_window = 30  # Seconds of keyframes read around each thumbnail point
+        self.thumbnail_candidates = 5  # Keyframes the thumbnail filter chooses between
+
+        # How many jobs run at once, at what priority and on which CPUs
+        self.governor = ResourceGovernor(self.config)
+
+        # FFmpeg runs as coroutines on one background event loop
+        self.engine = AsyncEngine(self)
+        # Watchdog: stop hung FFmpeg runs so the batch keeps going
+        timeout_minutes = self.config.get('job_timeout_minutes')
+        self.job_timeout = float(timeout_minutes) * 60 if timeout_minutes else None  # Fixed limit, overrides the budget
+        self.stall_timeout = float(self.config.get('stall_timeout_seconds', 120))  # 0 turns stall detection off
+        self.time_budget_base = float(self.config.get('time_budget_base_seconds', 300))
+        self.time_budget_factor = float(self.config.get('time_budget_factor', 10))  # Wall seconds per media second
+
+        # Opt-in tracing of our own overhead (--profile)
+        self.profiler = Profiler()
+
+        # Per-job timings and outcomes, for the stats panel and /metrics
+        self.metrics = MetricsRegistry()
+        self.metrics.counter("hindura_jobs_total", "Finished jobs by outcome")
+        self.metrics.counter("hindura_job_failures_total", "Failed jobs by failure class")
+        self.metrics.counter("hindura_input_bytes_total", "Bytes read by successful jobs")
+        self.metrics.counter("hindura_output_bytes_total", "Bytes written by successful jobs")
+        self.metrics.histogram("hindura_job_queue_wait_seconds", "Time from queueing to start")
+        self.metrics.histogram("hindura_job_probe_seconds", "Time spent probing the input duration")
+        self.metrics.histogram("hindura_job_spawn_seconds", "Time from starting FFmpeg to its first output")
+        self.metrics.histogram("hindura_job_encode_seconds", "FFmpeg wall time")
+        self.metrics.histogram("hindura_job_realtime_speed", "Media seconds encoded per wall second",
+                               MetricsRegistry.speed_buckets)
+
+        # Reuse finished outputs for byte-identical inputs (off unless a cache folder is set)
+        self.output_cache = None
+        self.cache_max_bytes = int(float(self.config.get('cache_max_gb', 20)) * 1024 ** 3)
+        self._ffmpeg_version = None
+        self.metrics.counter("hindura_cache_lookups_total", "Output cache lookups by result")
+
+        # Two-pass EBU R128 normalization: measurements are cached next to the config file
+        self.loudness = LoudnessAnalyzer(self, self.config_file.parent / "hindura_loudness.db",
+                                         workers=int(self.config.get('loudness_workers', 2)))
+        self.analysis_poll_ms = 250
+
+        # Compression "Target quality": CRF picked per file from sample encodes
+        self.quality_search = QualitySearch(self)
+
+        self._speed_lock = threading.Lock()  # Speed factors are updated from worker threads too
+        self._speeds_changed = False  # In memory only: written at the end of a batch (see save_speed_factors)
+        self._speeds_saved_at = time.monotonic()
+        self.speed_save_seconds = 300  # How often the watch daemon and farm workers write them
+        self._config_lock = threading.Lock()
+
+        # Render farm: dispatch jobs to worker machines through a shared queue file
+        self.farm = None
+        self.use_farm = False
+        self.farm_max_outstanding = int(self.config.get('farm_max_outstanding', 64))
+        self.farm_poll_ms = 2000
+        self._farm_poll_id = None
+
+        # Small images and audio snippets: spawning FFmpeg costs more than encoding them,
+        # so runs of them share one FFmpeg process (group_size 1 turns this off)
+        self.group_size = int(self.config.get('group_size', 16))
+        self.group_max_bytes = int(float(self.config.get('group_max_file_kb', 1024)) * 1024)
+
+    def load_config(self):
+        """Load the saved settings (empty if there is no config file yet)"""
+        try:
+            if self.config_file.exists():
+                with open(self.config_file, 'r') as f:
+                    return json.load(f)
+        except Exception:
+            pass
+        return {}
+
+    def save_config_value(self, key, value):
+        """Save a single setting, keeping the rest of the config file"""
+        self.config[key] = value
+        self._write_config(key, value)
+
+    def _write_config(self, key, value):
+        """Update one key in the config file, replacing it atomically (a crash never leaves it half written)"""
+        with self._config_lock:
+            temp_file = self.config_file.with_name(f"{self.config_file.name}.{os.urandom(4).hex()}.tmp")
+            try:
+                config = {}
+                if self.config_file.exists():
+                    with open(self.config_file, 'r') as f:
+                        config = json.load(f)
+                config[key] = value
+                with open(temp_file, 'w') as f:
+                    json.dump(config, f)
+                os.replace(temp_file, self.config_file)
+            except Exception:
+                self._remove_temp_file(temp_file)
 
-        self.create_widgets()
-        
-        # Save window position on close
-        self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
-    
     def load_window_geometry(self):
         """Load saved window position and size"""
         try:
@@ -73,23 +2440,19 @@ class FileConverterApp:
     def save_window_geometry(self):
         """Save window position and size"""
         try:
-            config = {}
-            if self.config_file.exists():
-                with open(self.config_file, 'r') as f:
-                    config = json.load(f)
-            config['window_geometry'] = self.root.geometry()
-            with open(self.config_file, 'w') as f:
-                json.dump(config, f)
+            self._write_config('window_geometry', self.root.geometry())
         except Exception:
             pass
     
     def on_closing(self):
         """Handle window close event"""
         self.save_window_geometry()
+        self.save_speed_factors()
         self.root.destroy()
     
     def find_ffmpeg(self):
         """Find ffmpeg executable in the current directory or system PATH"""
+        import subprocess
         # Get the directory where the exe/script is located (for portable distribution)
         app_dir = os.path.dirname(os.path.abspath(__file__))
         
@@ -137,6 +2500,9 @@ class FileConverterApp:
                     continue
 
         # Check system PATH
+        found = shutil.which("ffmpeg")
+        if found:
+            return found
         try:
             result = subprocess.run(["where", "ffmpeg"], capture_output=True, text=True)
             if result.returncode == 0:
@@ -146,6 +2512,24 @@ class FileConverterApp:
 
         return None
 
+    def _search_ffmpeg(self):
+        self.ffmpeg_path = self.find_ffmpeg()
+
+    def wait_for_ffmpeg(self):
+        """Let the background FFmpeg search finish (it is usually done long before anyone clicks Convert)"""
+        if self.ffmpeg_search is not None:
+            self.ffmpeg_search.join()
+
+    def _show_ffmpeg_status(self):
+        """Show whether FFmpeg was found once the background search is done"""
+        if self.ffmpeg_search is not None and self.ffmpeg_search.is_alive():
+            self.root.after(50, self._show_ffmpeg_status)
+            return
+        if self.ffmpeg_path:
+            self.ffmpeg_label.configure(text="✅ FFmpeg found", text_color="#28a745")
+        else:
+            self.ffmpeg_label.configure(text="❌ FFmpeg not found", text_color="#dc3545")
+
     def log_error(self, message):
         """Log errors to a file for debugging"""
         try:
@@ -276,6 +2660,114 @@ class FileConverterApp:
                                               fg_color="#6c757d", hover_color="#5a6268")
         self.output_reset_btn.pack(side="left", padx=2)
 
+        # Scratch folder for in-progress encodes (e.g. a local SSD when the output is on a NAS)
+        scratch_frame = ctk.CTkFrame(settings_frame, fg_color="transparent")
+        scratch_frame.pack(fill="x", padx=15, pady=10)
+
+        ctk.CTkLabel(scratch_frame, text="Scratch:", width=80, anchor="w",
+                     font=ctk.CTkFont(size=13)).pack(side="left")
+        self.scratch_var = ctk.StringVar(value=self.config.get('scratch_dir') or "Same as output")
+        self.scratch_entry = ctk.CTkEntry(scratch_frame, textvariable=self.scratch_var,
+                                          state="readonly", width=250)
+        self.scratch_entry.pack(side="left", padx=10)
+
+        self.scratch_browse_btn = ctk.CTkButton(scratch_frame, text="📂",
+                                                command=self.browse_scratch_folder,
+                                                width=40, height=28)
+        self.scratch_browse_btn.pack(side="left", padx=2)
+
+        self.scratch_reset_btn = ctk.CTkButton(scratch_frame, text="↺",
+                                               command=self.reset_scratch_folder,
+                                               width=40, height=28,
+                                               fg_color="#6c757d", hover_color="#5a6268")
+        self.scratch_reset_btn.pack(side="left", padx=2)
+
+        # Output cache: identical input + settings reuse an earlier result instead of re-encoding
+        cache_frame = ctk.CTkFrame(settings_frame, fg_color="transparent")
+        cache_frame.pack(fill="x", padx=15, pady=10)
+
+        ctk.CTkLabel(cache_frame, text="Cache:", width=80, anchor="w",
+                     font=ctk.CTkFont(size=13)).pack(side="left")
+        self.cache_var = ctk.StringVar(value=self.config.get('cache_dir') or "Off")
+        self.cache_entry = ctk.CTkEntry(cache_frame, textvariable=self.cache_var,
+                                        state="readonly", width=250)
+        self.cache_entry.pack(side="left", padx=10)
+
+        self.cache_browse_btn = ctk.CTkButton(cache_frame, text="📂",
+                                              command=self.browse_cache_folder,
+                                              width=40, height=28)
+        self.cache_browse_btn.pack(side="left", padx=2)
+
+        self.cache_reset_btn = ctk.CTkButton(cache_frame, text="↺",
+                                             command=self.reset_cache_folder,
+                                             width=40, height=28,
+                                             fg_color="#6c757d", hover_color="#5a6268")
+        self.cache_reset_btn.pack(side="left", padx=2)
+
+        # Where jobs run: here, or on render farm workers sharing a queue file
+        farm_frame = ctk.CTkFrame(settings_frame, fg_color="transparent")
+        farm_frame.pack(fill="x", padx=15, pady=10)
+
+        ctk.CTkLabel(farm_frame, text="Run on:", width=80, anchor="w",
+                     font=ctk.CTkFont(size=13)).pack(side="left")
+        self.run_on_var = ctk.StringVar(value="This computer")
+        self.run_on_combo = ctk.CTkComboBox(farm_frame, variable=self.run_on_var,
+                                            values=["This computer", "Render farm"], width=150)
+        self.run_on_combo.pack(side="left", padx=10)
+
+        self.farm_db_var = ctk.StringVar(value=self.config.get('farm_db') or "No queue file")
+        self.farm_db_entry = ctk.CTkEntry(farm_frame, textvariable=self.farm_db_var,
+                                          state="readonly", width=200)
+        self.farm_db_entry.pack(side="left", padx=5)
+
+        self.farm_db_btn = ctk.CTkButton(farm_frame, text="📂",
+                                         command=self.browse_farm_queue,
+                                         width=40, height=28)
+        self.farm_db_btn.pack(side="left", padx=2)
+
+        # Queue order
+        order_frame = ctk.CTkFrame(settings_frame, fg_color="transparent")
+        order_frame.pack(fill="x", padx=15, pady=10)
+
+        ctk.CTkLabel(order_frame, text="Order:", width=80, anchor="w",
+                     font=ctk.CTkFont(size=13)).pack(side="left")
+        self.queue_order_var = ctk.StringVar(value="First added")
+        self.queue_order_combo = ctk.CTkComboBox(order_frame, variable=self.queue_order_var,
+                                                 values=["First added", "Shortest first"], width=200)
+        self.queue_order_combo.pack(side="left", padx=10)
+
+        ctk.CTkLabel(order_frame, text="Parallel:", font=ctk.CTkFont(size=12)).pack(side="left", padx=(10, 0))
+        self.parallel_var = ctk.StringVar(value=str(self.governor.max_jobs))
+        self.parallel_combo = ctk.CTkComboBox(order_frame, variable=self.parallel_var,
+                                              values=["1", "2", "3", "4", "6", "8"], width=60,
+                                              command=self.on_governor_change)
+        self.parallel_combo.pack(side="left", padx=5)
+
+        ctk.CTkLabel(order_frame, text="Priority:", font=ctk.CTkFont(size=12)).pack(side="left", padx=(10, 0))
+        self.priority_var = ctk.StringVar(value=self.governor.priority)
+        self.priority_combo = ctk.CTkComboBox(order_frame, variable=self.priority_var,
+                                              values=list(ResourceGovernor.priorities.keys()), width=120,
+                                              command=self.on_governor_change)
+        self.priority_combo.pack(side="left", padx=5)
+
+        # Presets: named snapshots of the conversion options (also used by the watch folder mode)
+        preset_frame = ctk.CTkFrame(settings_frame, fg_color="transparent")
+        preset_frame.pack(fill="x", padx=15, pady=10)
+
+        ctk.CTkLabel(preset_frame, text="Preset:", width=80, anchor="w",
+                     font=ctk.CTkFont(size=13)).pack(side="left")
+        self.preset_var = ctk.StringVar(value="")
+        self.preset_combo = ctk.CTkComboBox(preset_frame, variable=self.preset_var,
+                                            values=list(self.config.get('presets', {})), width=200,
+                                            command=self.on_preset_change)
+        self.preset_combo.pack(side="left", padx=10)
+
+        self.save_preset_btn = ctk.CTkButton(preset_frame, text="💾 Save preset",
+                                             command=self.save_preset,
+                                             width=110, height=28,
+                                             fg_color="#6c757d", hover_color="#5a6268")
+        self.save_preset_btn.pack(side="left", padx=2)
+
         # ===== OPTIONS FRAME =====
         self.options_frame = ctk.CTkFrame(main_container)
         self.options_frame.pack(fill="x", pady=10)
@@ -284,61 +2776,28 @@ class FileConverterApp:
                                      font=ctk.CTkFont(size=14, weight="bold"))
         options_title.pack(anchor="w", padx=15, pady=(10, 5))
 
-        # Resize options container
-        self.resize_frame = ctk.CTkFrame(self.options_frame, fg_color="transparent")
-
-        resize_inner = ctk.CTkFrame(self.resize_frame, fg_color="transparent")
-        resize_inner.pack(fill="x", padx=15, pady=5)
-
-        ctk.CTkLabel(resize_inner, text="Resize:", width=80, anchor="w",
-                     font=ctk.CTkFont(size=13)).pack(side="left")
+        # Option values live in variables from the start; the frames showing them are
+        # built the first time their mode/type needs them (see _option_frame)
         self.resize_var = ctk.StringVar(value="None")
-        self.resize_combo = ctk.CTkComboBox(resize_inner, variable=self.resize_var,
-                                            values=self.resize_options, width=180,
-                                            command=self.on_resize_change)
-        self.resize_combo.pack(side="left", padx=10)
-
-        # Custom resolution entry
-        self.custom_res_frame = ctk.CTkFrame(resize_inner, fg_color="transparent")
-        ctk.CTkLabel(self.custom_res_frame, text="W:", font=ctk.CTkFont(size=12)).pack(side="left")
-        self.width_entry = ctk.CTkEntry(self.custom_res_frame, width=60)
-        self.width_entry.pack(side="left", padx=5)
-        ctk.CTkLabel(self.custom_res_frame, text="H:", font=ctk.CTkFont(size=12)).pack(side="left")
-        self.height_entry = ctk.CTkEntry(self.custom_res_frame, width=60)
-        self.height_entry.pack(side="left", padx=5)
-
-        # GIF options
-        self.gif_options_frame = ctk.CTkFrame(self.options_frame, fg_color="transparent")
-
-        gif_inner = ctk.CTkFrame(self.gif_options_frame, fg_color="transparent")
-        gif_inner.pack(fill="x", padx=15, pady=5)
-
-        ctk.CTkLabel(gif_inner, text="GIF Settings:", width=80, anchor="w",
-                     font=ctk.CTkFont(size=13)).pack(side="left")
-        ctk.CTkLabel(gif_inner, text="FPS:", font=ctk.CTkFont(size=12)).pack(side="left", padx=(10, 0))
+        self.width_var = ctk.StringVar()
+        self.height_var = ctk.StringVar()
         self.fps_var = ctk.StringVar(value="10")
-        self.fps_combo = ctk.CTkComboBox(gif_inner, variable=self.fps_var,
-                                         values=["5", "10", "15", "20", "24", "30"], width=70)
-        self.fps_combo.pack(side="left", padx=5)
-        ctk.CTkLabel(gif_inner, text="Scale:", font=ctk.CTkFont(size=12)).pack(side="left", padx=(10, 0))
         self.gif_scale_var = ctk.StringVar(value="320")
-        self.gif_scale_combo = ctk.CTkComboBox(gif_inner, variable=self.gif_scale_var,
-                                               values=["160", "240", "320", "480", "640"], width=80)
-        self.gif_scale_combo.pack(side="left", padx=5)
-
-        # Compression options
-        self.compress_frame = ctk.CTkFrame(self.options_frame, fg_color="transparent")
-
-        compress_inner = ctk.CTkFrame(self.compress_frame, fg_color="transparent")
-        compress_inner.pack(fill="x", padx=15, pady=5)
-
-        ctk.CTkLabel(compress_inner, text="Quality:", width=80, anchor="w",
-                     font=ctk.CTkFont(size=13)).pack(side="left")
         self.quality_var = ctk.StringVar(value="Medium")
-        self.quality_combo = ctk.CTkComboBox(compress_inner, variable=self.quality_var,
-                                             values=["High (Large file)", "Medium", "Low (Small file)"],
-                                             width=200)
-        self.quality_combo.pack(side="left", padx=10)
+        self.target_var = ctk.StringVar(value="93")
+        self.thumb_count_var = ctk.StringVar(value="9")
+        self.thumb_width_var = ctk.StringVar(value="320")
+        self.trim_accurate_var = ctk.BooleanVar(value=False)
+        self.normalize_var = ctk.BooleanVar(value=False)
+        self._option_builders = {
+            "resize": self._build_resize_frame,
+            "gif": self._build_gif_frame,
+            "compress": self._build_compress_frame,
+            "thumbs": self._build_thumbs_frame,
+            "trim": self._build_trim_frame,
+            "loudnorm": self._build_loudnorm_frame,
+        }
+        self._option_frames = {}  # Name -> frame, once built
 
         # Button frame for Convert and Cancel
         button_frame = ctk.CTkFrame(main_container, fg_color="transparent")
@@ -352,6 +2811,14 @@ class FileConverterApp:
                                     fg_color="#28a745", hover_color="#218838")
         self.convert_btn.pack(side="left", padx=10)
 
+        # Dry run: what the batch would do and cost, without converting
+        self.plan_btn = ctk.CTkButton(button_frame, text="🧮 Plan",
+                                      command=self.plan_batch,
+                                      width=100, height=50,
+                                      font=ctk.CTkFont(size=14, weight="bold"),
+                                      fg_color="#6c757d", hover_color="#5a6268")
+        self.plan_btn.pack(side="left", padx=10)
+
         # Cancel button (hidden by default)
         self.cancel_btn = ctk.CTkButton(button_frame, text="❌ Cancel",
                                         command=self.cancel_conversion,
@@ -360,6 +2827,14 @@ class FileConverterApp:
                                         fg_color="#dc3545", hover_color="#c82333")
         # Cancel button is hidden initially
 
+        # Pause/Resume button for the running job (hidden by default)
+        self.pause_btn = ctk.CTkButton(button_frame, text="⏸ Pause",
+                                       command=self.toggle_pause_all,
+                                       width=120, height=50,
+                                       font=ctk.CTkFont(size=14, weight="bold"),
+                                       fg_color="#6c757d", hover_color="#5a6268")
+        # Pause button is hidden initially
+
         # Retry Failed button (hidden by default, shown after failed conversions)
         self.retry_btn = ctk.CTkButton(button_frame, text="🔄 Retry Failed",
                                        command=self.retry_failed_conversions,
@@ -386,21 +2861,163 @@ class FileConverterApp:
                                          font=ctk.CTkFont(size=13))
         self.status_label.pack(pady=5)
 
+        # Stats panel: where batch time goes (hidden until toggled)
+        self.stats_btn = ctk.CTkButton(main_container, text="📊 Stats",
+                                       command=self.toggle_stats_panel,
+                                       width=90, height=26,
+                                       fg_color="#6c757d", hover_color="#5a6268")
+        self.stats_btn.pack(pady=(0, 5))
+        self.stats_frame = ctk.CTkFrame(main_container)
+        self.stats_label = ctk.CTkLabel(self.stats_frame, text="No finished jobs yet",
+                                        font=ctk.CTkFont(family="Courier", size=12),
+                                        justify="left", anchor="w")
+        self.stats_label.pack(fill="x", padx=15, pady=10)
+        self.stats_visible = False
+
         # Initialize conversion state
-        self.conversion_process = None
         self.is_converting = False
+        self.batch_cancelled = False
 
-        # FFmpeg status
-        ffmpeg_status = "✅ FFmpeg found" if self.ffmpeg_path else "❌ FFmpeg not found"
-        ffmpeg_color = "#28a745" if self.ffmpeg_path else "#dc3545"
-        ffmpeg_label = ctk.CTkLabel(main_container, text=ffmpeg_status,
-                                    font=ctk.CTkFont(size=12),
-                                    text_color=ffmpeg_color)
-        ffmpeg_label.pack(side="bottom", pady=5)
+        # FFmpeg status (filled in when the background search is done)
+        self.ffmpeg_label = ctk.CTkLabel(main_container, text="🔍 Looking for FFmpeg...",
+                                         font=ctk.CTkFont(size=12),
+                                         text_color="#6c757d")
+        self.ffmpeg_label.pack(side="bottom", pady=5)
+        self._show_ffmpeg_status()
 
         # Initialize UI state
         self.on_mode_change(None)
 
+    def _option_frame(self, name):
+        """An option frame, built on first use (most never show in a session)"""
+        frame = self._option_frames.get(name)
+        if frame is None:
+            frame = self._option_frames[name] = self._option_builders[name]()
+        return frame
+
+    def _build_resize_frame(self):
+        # Resize options container
+        frame = ctk.CTkFrame(self.options_frame, fg_color="transparent")
+
+        resize_inner = ctk.CTkFrame(frame, fg_color="transparent")
+        resize_inner.pack(fill="x", padx=15, pady=5)
+
+        ctk.CTkLabel(resize_inner, text="Resize:", width=80, anchor="w",
+                     font=ctk.CTkFont(size=13)).pack(side="left")
+        self.resize_combo = ctk.CTkComboBox(resize_inner, variable=self.resize_var,
+                                            values=self.resize_options, width=180,
+                                            command=self.on_resize_change)
+        self.resize_combo.pack(side="left", padx=10)
+
+        # Custom resolution entry
+        self.custom_res_frame = ctk.CTkFrame(resize_inner, fg_color="transparent")
+        ctk.CTkLabel(self.custom_res_frame, text="W:", font=ctk.CTkFont(size=12)).pack(side="left")
+        self.width_entry = ctk.CTkEntry(self.custom_res_frame, textvariable=self.width_var, width=60)
+        self.width_entry.pack(side="left", padx=5)
+        ctk.CTkLabel(self.custom_res_frame, text="H:", font=ctk.CTkFont(size=12)).pack(side="left")
+        self.height_entry = ctk.CTkEntry(self.custom_res_frame, textvariable=self.height_var, width=60)
+        self.height_entry.pack(side="left", padx=5)
+        return frame
+
+    def _build_gif_frame(self):
+        # GIF options
+        frame = ctk.CTkFrame(self.options_frame, fg_color="transparent")
+
+        gif_inner = ctk.CTkFrame(frame, fg_color="transparent")
+        gif_inner.pack(fill="x", padx=15, pady=5)
+
+        ctk.CTkLabel(gif_inner, text="GIF Settings:", width=80, anchor="w",
+                     font=ctk.CTkFont(size=13)).pack(side="left")
+        ctk.CTkLabel(gif_inner, text="FPS:", font=ctk.CTkFont(size=12)).pack(side="left", padx=(10, 0))
+        self.fps_combo = ctk.CTkComboBox(gif_inner, variable=self.fps_var,
+                                         values=["5", "10", "15", "20", "24", "30"], width=70)
+        self.fps_combo.pack(side="left", padx=5)
+        ctk.CTkLabel(gif_inner, text="Scale:", font=ctk.CTkFont(size=12)).pack(side="left", padx=(10, 0))
+        self.gif_scale_combo = ctk.CTkComboBox(gif_inner, variable=self.gif_scale_var,
+                                               values=["160", "240", "320", "480", "640"], width=80)
+        self.gif_scale_combo.pack(side="left", padx=5)
+        return frame
+
+    def _build_compress_frame(self):
+        # Compression options
+        frame = ctk.CTkFrame(self.options_frame, fg_color="transparent")
+
+        compress_inner = ctk.CTkFrame(frame, fg_color="transparent")
+        compress_inner.pack(fill="x", padx=15, pady=5)
+
+        ctk.CTkLabel(compress_inner, text="Quality:", width=80, anchor="w",
+                     font=ctk.CTkFont(size=13)).pack(side="left")
+        self.quality_combo = ctk.CTkComboBox(compress_inner, variable=self.quality_var,
+                                             values=["High (Large file)", "Medium", "Low (Small file)"],
+                                             width=200, command=self.on_quality_change)
+        self.quality_combo.pack(side="left", padx=10)
+
+        # Target quality (Video only): VMAF score the chosen CRF has to reach
+        self.target_frame = ctk.CTkFrame(compress_inner, fg_color="transparent")
+        ctk.CTkLabel(self.target_frame, text="Target VMAF:", font=ctk.CTkFont(size=12)).pack(side="left")
+        self.target_combo = ctk.CTkComboBox(self.target_frame, variable=self.target_var,
+                                            values=["95", "93", "90"], width=70)
+        self.target_combo.pack(side="left", padx=5)
+        return frame
+
+    def _build_thumbs_frame(self):
+        # Thumbnail options
+        frame = ctk.CTkFrame(self.options_frame, fg_color="transparent")
+
+        thumbs_inner = ctk.CTkFrame(frame, fg_color="transparent")
+        thumbs_inner.pack(fill="x", padx=15, pady=5)
+
+        ctk.CTkLabel(thumbs_inner, text="Frames:", width=80, anchor="w",
+                     font=ctk.CTkFont(size=13)).pack(side="left")
+        self.thumb_count_combo = ctk.CTkComboBox(thumbs_inner, variable=self.thumb_count_var,
+                                                 values=self.thumbnail_counts, width=70)
+        self.thumb_count_combo.pack(side="left", padx=10)
+        ctk.CTkLabel(thumbs_inner, text="Width:", font=ctk.CTkFont(size=12)).pack(side="left", padx=(10, 0))
+        self.thumb_width_combo = ctk.CTkComboBox(thumbs_inner, variable=self.thumb_width_var,
+                                                 values=["160", "240", "320", "480", "640"], width=80)
+        self.thumb_width_combo.pack(side="left", padx=5)
+        ctk.CTkLabel(thumbs_inner, text="(2+ frames make a contact sheet)", text_color="gray",
+                     font=ctk.CTkFont(size=11)).pack(side="left", padx=10)
+        return frame
+
+    def _build_trim_frame(self):
+        # Trim: convert only part of each file
+        frame = ctk.CTkFrame(self.options_frame, fg_color="transparent")
+
+        trim_inner = ctk.CTkFrame(frame, fg_color="transparent")
+        trim_inner.pack(fill="x", padx=15, pady=5)
+
+        ctk.CTkLabel(trim_inner, text="Trim:", width=80, anchor="w",
+                     font=ctk.CTkFont(size=13)).pack(side="left")
+        ctk.CTkLabel(trim_inner, text="From:", font=ctk.CTkFont(size=12)).pack(side="left", padx=(10, 0))
+        self.trim_start_entry = ctk.CTkEntry(trim_inner, width=80, placeholder_text="0:00")
+        self.trim_start_entry.pack(side="left", padx=5)
+        ctk.CTkLabel(trim_inner, text="To:", font=ctk.CTkFont(size=12)).pack(side="left", padx=(10, 0))
+        self.trim_end_entry = ctk.CTkEntry(trim_inner, width=80, placeholder_text="end")
+        self.trim_end_entry.pack(side="left", padx=5)
+        ctk.CTkCheckBox(trim_inner, text="Frame-accurate (slower start)", variable=self.trim_accurate_var,
+                        font=ctk.CTkFont(size=12)).pack(side="left", padx=10)
+        return frame
+
+    def _build_loudnorm_frame(self):
+        # Loudness normalization (audio outputs)
+        frame = ctk.CTkFrame(self.options_frame, fg_color="transparent")
+
+        loudnorm_inner = ctk.CTkFrame(frame, fg_color="transparent")
+        loudnorm_inner.pack(fill="x", padx=15, pady=5)
+
+        ctk.CTkLabel(loudnorm_inner, text="Loudness:", width=80, anchor="w",
+                     font=ctk.CTkFont(size=13)).pack(side="left")
+        ctk.CTkCheckBox(loudnorm_inner, text="Normalize to -16 LUFS (EBU R128, two-pass)",
+                        variable=self.normalize_var, font=ctk.CTkFont(size=12)).pack(side="left", padx=10)
+        return frame
+
+    def _trim_text(self, entry_name):
+        """Text of a trim entry ("" if the trim options were never shown)"""
+        if "trim" not in self._option_frames:
+            return ""
+        return getattr(self, entry_name).get()
+
     def toggle_theme(self):
         """Toggle between dark and light theme"""
         if self.theme_var.get() == "dark":
@@ -412,42 +3029,46 @@ class FileConverterApp:
         filenames = filedialog.askopenfilenames(title="Select files to convert")
         if filenames:
             for f in filenames:
-                if f not in self.input_files:
-                    self.input_files.append(f)
+                self.input_files.setdefault(f)
             
             self.update_file_list_ui()
             
             # Update type/format based on the first file if valid
             if self.input_files:
-                self.input_file = self.input_files[0]
+                self.input_file = next(iter(self.input_files))
                 self._update_format_options(self.input_file)
 
     def clear_files(self):
-        self.input_files = []
+        self.input_files = {}
         self.input_file = None
         self.update_file_list_ui()
 
     def remove_file(self, file_path):
         if file_path in self.input_files:
-            self.input_files.remove(file_path)
+            del self.input_files[file_path]
             self.update_file_list_ui()
             
             if not self.input_files:
                 self.input_file = None
             elif self.input_file == file_path:
-                self.input_file = self.input_files[0]
+                self.input_file = next(iter(self.input_files))
 
     def update_file_list_ui(self):
         # Clear current list
         for widget in self.file_scroll.winfo_children():
             widget.destroy()
 
+        if self.is_converting:
+            with self.profiler.span("job list redraw"):
+                self._update_job_list_ui()
+            return
+
         if not self.input_files:
             self.no_files_label = ctk.CTkLabel(self.file_scroll, text="No files selected", text_color="gray")
             self.no_files_label.pack(pady=20)
             return
 
-        for f in self.input_files:
+        for f in itertools.islice(self.input_files, self.max_list_rows):
             row = ctk.CTkFrame(self.file_scroll, fg_color="transparent")
             row.pack(fill="x", pady=2)
             
@@ -469,6 +3090,165 @@ class FileConverterApp:
                                 fg_color="transparent", text_color="#dc3545", hover_color="#444")
             btn.pack(side="right", padx=5)
 
+        if len(self.input_files) > self.max_list_rows:
+            ctk.CTkLabel(self.file_scroll, text=f"...and {len(self.input_files) - self.max_list_rows} more files",
+                         text_color="gray").pack(pady=5)
+
+    def _update_job_list_ui(self):
+        """Show the batch in run order with per-job controls"""
+        status_icons = {"queued": "⏳", "held": "⏸", "running": "▶", "done": "✅",
+                        "failed": "❌", "skipped": "⏭", "cancelled": "🚫"}
+        # Only a window of the batch gets widgets: running jobs, the next ones up and the latest finished
+        waiting = self.job_queue.jobs(limit=self.max_list_rows)
+        finished = list(reversed(self.summary.recent))
+        shown = self.running_jobs + waiting + finished
+        hidden = len(self.batch_jobs) - len(shown)
+
+        for job in shown:
+            row = ctk.CTkFrame(self.file_scroll, fg_color="transparent")
+            row.pack(fill="x", pady=2)
+
+            display_text = f"{status_icons.get(job.status, '')} {os.path.basename(job.path)} ({self.format_file_size(self.summary.input_size(job))})"
+            lbl = ctk.CTkLabel(row, text=display_text, anchor="w")
+            lbl.pack(side="left", padx=5)
+
+            if job.status in (JobStatus.RUNNING, JobStatus.PAUSED) and job.run.launched:
+                ctk.CTkButton(row, text="❌", width=30, height=20,
+                              command=lambda j=job: self.cancel_running_job(j),
+                              fg_color="transparent", text_color="#dc3545", hover_color="#444").pack(side="right", padx=2)
+                ctk.CTkButton(row, text="▶" if job.status == JobStatus.PAUSED else "⏸", width=30, height=20,
+                              command=lambda j=job: self.toggle_pause_job(j),
+                              fg_color="transparent", hover_color="#444").pack(side="right", padx=2)
+                continue
+
+            if job.status not in (JobStatus.QUEUED, JobStatus.HELD):
+                continue
+
+            # Cancel just this job
+            ctk.CTkButton(row, text="❌", width=30, height=20,
+                          command=lambda j=job: self.cancel_job(j),
+                          fg_color="transparent", text_color="#dc3545", hover_color="#444").pack(side="right", padx=2)
+            # Hold / release
+            ctk.CTkButton(row, text="▶" if job.status == JobStatus.HELD else "⏸", width=30, height=20,
+                          command=lambda j=job: self.toggle_hold_job(j),
+                          fg_color="transparent", hover_color="#444").pack(side="right", padx=2)
+            # Run next
+            ctk.CTkButton(row, text="⏫", width=30, height=20,
+                          command=lambda j=job: self.prioritize_job(j),
+                          fg_color="transparent", hover_color="#444").pack(side="right", padx=2)
+
+        if hidden > 0:
+            counts = self.summary.counts
+            ctk.CTkLabel(self.file_scroll, text=f"...and {hidden} more ({len(self.job_queue)} waiting, "
+                                                f"{counts[JobStatus.DONE]} done, {counts[JobStatus.FAILED]} failed)",
+                         text_color="gray").pack(pady=5)
+
+    def prioritize_job(self, job):
+        """Move a waiting job to the front of the queue"""
+        if job.status == JobStatus.HELD:
+            self.job_queue.release(job)
+        self.job_queue.move_to_front(job)
+        self._on_queue_changed()
+
+    def toggle_hold_job(self, job):
+        """Hold a waiting job, or release a held one"""
+        if job.status == JobStatus.HELD:
+            self.job_queue.release(job)
+        elif job.status == JobStatus.QUEUED:
+            self.job_queue.hold(job)
+        self._on_queue_changed()
+
+    def cancel_job(self, job):
+        """Drop a single waiting job without cancelling the batch"""
+        if job in self.running_jobs:
+            self.cancel_running_job(job)
+            return
+        if job.status not in (JobStatus.QUEUED, JobStatus.HELD):
+            return
+        self.job_queue.remove(job)
+        job.status = JobStatus.CANCELLED
+        self.record_job_metrics(job)
+        self._on_queue_changed()
+
+    def cancel_running_job(self, job):
+        """Stop a running job and move on to the next one"""
+        if job.run.cancel_requested:
+            return
+        job.run.cancel_requested = True
+
+        if not job.run.launched:
+            # Not started yet (e.g. waiting for disk space)
+            members, job.run.group = job.run.group or [job], None
+            for member in members:
+                member.status = JobStatus.CANCELLED
+                if member is not job:
+                    self.finished_count += 1
+                    self.record_job_metrics(member)
+            self._finish_job(job)
+            self.record_job_metrics(job)
+            self.process_next_file()
+            return
+
+        if job.run.farm_id is not None:
+            import sqlite3
+            # The worker stops FFmpeg when its next heartbeat finds the job cancelled
+            try:
+                self.farm.cancel(job.run.farm_id)
+            except sqlite3.Error as e:
+                self.log_error(f"Could not cancel farm job: {e}")
+            self._on_conversion_complete(job, -1, None, job.run.output_file, "")
+            return
+
+        # The engine sees EOF once FFmpeg exits and hands back to _on_conversion_complete
+        self.status_label.configure(text=f"⏹ Cancelling {os.path.basename(job.path)}...", text_color="#ffc107")
+        threading.Thread(target=job.run.kill_process, daemon=True).start()
+
+    def toggle_pause_job(self, job):
+        """Pause or resume a running FFmpeg process"""
+        if job.run.cancel_requested:
+            return
+
+        if job.status == JobStatus.RUNNING and job.run.pause_process():
+            job.status = JobStatus.PAUSED
+            self.status_label.configure(text=f"⏸ Paused: {os.path.basename(job.path)}", text_color="#ffc107")
+        elif job.status == JobStatus.PAUSED and job.run.resume_process():
+            job.status = JobStatus.RUNNING
+            self.status_label.configure(text=f"⏳ Converting {os.path.basename(job.path)}...", text_color="#3498db")
+        else:
+            return
+
+        self._update_pause_button()
+        self.update_file_list_ui()
+
+    def toggle_pause_all(self):
+        """Pause every running job, or resume them all if they are paused"""
+        if any(job.status == JobStatus.RUNNING for job in self.running_jobs):
+            for job in self.running_jobs:
+                if job.status == JobStatus.RUNNING and not job.run.cancel_requested and job.run.pause_process():
+                    job.status = JobStatus.PAUSED
+            self.status_label.configure(text="⏸ Paused", text_color="#ffc107")
+        else:
+            for job in self.running_jobs:
+                if job.status == JobStatus.PAUSED and job.run.resume_process():
+                    job.status = JobStatus.RUNNING
+            self.status_label.configure(text="⏳ Converting...", text_color="#3498db")
+
+        self._update_pause_button()
+        self.update_file_list_ui()
+
+    def _update_pause_button(self):
+        """Show Resume while every running job is paused"""
+        paused = [job for job in self.running_jobs if job.status == JobStatus.PAUSED]
+        all_paused = paused and len(paused) == len(self.running_jobs)
+        self.pause_btn.configure(text="▶ Resume" if all_paused else "⏸ Pause")
+
+    def _on_queue_changed(self):
+        """Refresh the list and fill any free slots (e.g. after releasing a held job)"""
+        if self.is_converting:
+            self.process_next_file()
+        else:
+            self.update_file_list_ui()
+
     def format_file_size(self, size_bytes):
         """Format file size in human-readable units"""
         for unit in ['B', 'KB', 'MB', 'GB']:
@@ -497,6 +3277,119 @@ class FileConverterApp:
         """Reset output folder to same as input"""
         self.output_var.set("Same as input")
 
+    def browse_scratch_folder(self):
+        """Browse for the folder used for in-progress encodes"""
+        folder = filedialog.askdirectory(title="Select scratch folder for temporary files")
+        if folder:
+            self.scratch_var.set(folder)
+            self.save_config_value('scratch_dir', folder)
+
+    def reset_scratch_folder(self):
+        """Write temporary files next to the output again"""
+        self.scratch_var.set("Same as output")
+        self.save_config_value('scratch_dir', None)
+
+    def browse_cache_folder(self):
+        """Choose where finished outputs are kept for reuse"""
+        folder = filedialog.askdirectory(title="Select output cache folder")
+        if folder:
+            self.cache_var.set(folder)
+            self.save_config_value('cache_dir', folder)
+
+    def reset_cache_folder(self):
+        """Turn the output cache off (the folder is left as it is)"""
+        self.cache_var.set("Off")
+        self.save_config_value('cache_dir', None)
+
+    def browse_farm_queue(self):
+        """Pick the shared queue file that render farm workers serve"""
+        path = filedialog.asksaveasfilename(title="Select render farm queue file",
+                                            defaultextension=".db", confirmoverwrite=False,
+                                            filetypes=[("Queue file", "*.db"), ("All files", "*.*")])
+        if path:
+            self.farm_db_var.set(path)
+            self.save_config_value('farm_db', path)
+
+    def get_scratch_folder(self, output_folder):
+        """Get the folder for in-progress encodes (falls back to the output folder)"""
+        scratch_setting = self.scratch_var.get()
+        if scratch_setting == "Same as output":
+            return output_folder
+        scratch_folder = Path(scratch_setting)
+        try:
+            scratch_folder.mkdir(parents=True, exist_ok=True)
+            return scratch_folder
+        except Exception as e:
+            self.log_error(f"Could not use scratch folder {scratch_folder}: {e}")
+            return output_folder
+
+    def on_governor_change(self, event=None):
+        """Apply and save the parallel job count and process priority"""
+        try:
+            self.governor.max_jobs = max(1, int(self.parallel_var.get()))
+        except ValueError:
+            self.parallel_var.set(str(self.governor.max_jobs))
+        if self.priority_var.get() in ResourceGovernor.priorities:
+            self.governor.priority = self.priority_var.get()
+        self.save_config_value('parallel_jobs', self.governor.max_jobs)
+        self.save_config_value('process_priority', self.governor.priority)
+
+        # More slots may be free now
+        if self.is_converting:
+            self.process_next_file()
+
+    def save_preset(self):
+        """Save the current options under a name"""
+        if not self.to_var.get():
+            messagebox.showwarning("Warning", "Please select a target format option.")
+            return
+        dialog = ctk.CTkInputDialog(text="Preset name:", title="Save preset")
+        name = dialog.get_input()
+        if not name or not name.strip():
+            return
+        name = name.strip()
+        presets = dict(self.config.get('presets', {}))
+        presets[name] = self.get_settings()
+        self.save_config_value('presets', presets)
+        self.preset_combo.configure(values=list(presets))
+        self.preset_var.set(name)
+        self.status_label.configure(text=f"💾 Saved preset '{name}'", text_color="#28a745")
+
+    def on_preset_change(self, event=None):
+        """Load the options of the chosen preset into the window"""
+        settings = self.config.get('presets', {}).get(self.preset_var.get())
+        if settings:
+            self.apply_settings(settings)
+
+    def apply_settings(self, settings):
+        """Set the option widgets from a settings snapshot (see get_settings)"""
+        self.type_var.set(settings['file_type'])
+        self.mode_var.set(settings['mode'])
+        self.on_type_change(None)  # Also resets the option frames for the mode
+        self.to_var.set(settings['to_format'])
+        self.resize_var.set(settings['resize'])
+        self.quality_var.set(settings['quality'])
+        self.fps_var.set(settings['fps'])
+        self.gif_scale_var.set(settings['gif_scale'])
+        # Presets saved before thumbnails existed don't have these
+        self.thumb_count_var.set(settings.get('thumb_count', "9"))
+        self.thumb_width_var.set(settings.get('thumb_width', "320"))
+        self.normalize_var.set(settings.get('normalize', False))
+        self.target_var.set(settings.get('quality_target', "93"))
+        self.trim_accurate_var.set(settings.get('trim_accurate', False))
+        self.width_var.set(settings['width'])
+        self.height_var.set(settings['height'])
+        trim = (settings.get('trim_start', ""), settings.get('trim_end', ""))
+        if any(trim) or "trim" in self._option_frames:
+            self._option_frame("trim")
+            for entry, value in zip((self.trim_start_entry, self.trim_end_entry), trim):
+                entry.delete(0, "end")
+                entry.insert(0, value)
+        self.output_var.set(settings['output_dir'])
+        self.on_to_change(None)
+        self.on_resize_change(None)
+        self.on_quality_change(None)
+
     def on_type_change(self, event=None):
         selected_type = self.type_var.get()
         if selected_type in self.file_types:
@@ -557,6 +3450,11 @@ class FileConverterApp:
                 self.to_combo.configure(values=formats)
                 if not self.to_var.get() or self.to_var.get() not in formats:
                     self.to_var.set(from_format if from_format else formats[0])
+
+        elif mode == "Thumbnails":
+            self.to_combo.configure(values=self.thumbnail_formats)
+            if self.to_var.get() not in self.thumbnail_formats:
+                self.to_var.set("jpg")
         else:
             # Default: show all formats for the selected type
             if selected_type in self.file_types:
@@ -564,27 +3462,27 @@ class FileConverterApp:
                 self.to_combo.configure(values=formats)
 
     def on_mode_change(self, event=None):
-        """Handle main mode changes (Standard Conversion, Resize, Compression)"""
+        """Handle main mode changes (Standard Conversion, Resize, Compression, Thumbnails)"""
         mode = self.mode_var.get()
         selected_type = self.type_var.get()
 
         # Hide all option frames first
-        self.resize_frame.pack_forget()
-        self.compress_frame.pack_forget()
-        self.gif_options_frame.pack_forget()
-        self.custom_res_frame.pack_forget()
+        for frame in self._option_frames.values():
+            frame.pack_forget()
+        if "resize" in self._option_frames:
+            self.custom_res_frame.pack_forget()
 
         if mode == "Standard Conversion":
             # Show resize option for visual media (Video/Image)
             if selected_type in ["Video", "Image"]:
-                self.resize_frame.pack(fill="x", pady=5)
+                self._option_frame("resize").pack(fill="x", pady=5)
                 self.resize_var.set("None")
             self.update_to_formats()
 
         elif mode == "Resize":
             # Show resize options (for Video and Image only)
             if selected_type in ["Video", "Image"]:
-                self.resize_frame.pack(fill="x", pady=5)
+                self._option_frame("resize").pack(fill="x", pady=5)
                 # Set default resolution
                 if self.resize_var.get() == "None":
                     self.resize_var.set("1280x720 (720p)")
@@ -596,24 +3494,58 @@ class FileConverterApp:
             self.update_to_formats()
 
         elif mode == "Compression":
-            # Show compression options (for all types)
-            self.compress_frame.pack(fill="x", pady=5)
+            # Show compression options (for all types; target quality is for video)
+            qualities = ["High (Large file)", "Medium", "Low (Small file)"]
+            if selected_type == "Video":
+                qualities.append("Target quality")
+            elif self.quality_var.get() == "Target quality":
+                self.quality_var.set("Medium")
+            compress_frame = self._option_frame("compress")
+            self.quality_combo.configure(values=qualities)
+            self.on_quality_change(None)
+            compress_frame.pack(fill="x", pady=5)
+            self.update_to_formats()
+
+        elif mode == "Thumbnails":
+            if selected_type != "Video":
+                messagebox.showinfo("Info", "Thumbnails are only available for Video files")
+                self.mode_var.set("Standard Conversion")
+                self.on_mode_change(None)
+                return
+            self._option_frame("thumbs").pack(fill="x", pady=5)
             self.update_to_formats()
 
+        if selected_type in ["Audio", "Video"]:
+            self._option_frame("trim").pack(fill="x", pady=5)
+        if selected_type in ["Audio", "Video"] and mode != "Thumbnails":
+            self._option_frame("loudnorm").pack(fill="x", pady=5)
+
     def on_to_change(self, event=None):
         """Handle changes to the To format dropdown - show GIF options when gif selected"""
         to_format = self.to_var.get()
         selected_type = self.type_var.get()
 
         # Hide GIF options first
-        self.gif_options_frame.pack_forget()
+        if "gif" in self._option_frames:
+            self._option_frames["gif"].pack_forget()
 
         # Show GIF options if gif is selected and source is Video
         if to_format == "gif" and selected_type == "Video":
-            self.gif_options_frame.pack(fill="x", pady=5)
+            self._option_frame("gif").pack(fill="x", pady=5)
+
+    def on_quality_change(self, event=None):
+        """Show the VMAF target only for Target quality"""
+        if "compress" not in self._option_frames:
+            return
+        if self.quality_var.get() == "Target quality":
+            self.target_frame.pack(side="left", padx=10)
+        else:
+            self.target_frame.pack_forget()
 
     def on_resize_change(self, event=None):
         """Show/hide custom resolution fields"""
+        if "resize" not in self._option_frames:
+            return
         if self.resize_var.get() == "Custom":
             self.custom_res_frame.pack(side="left", padx=10)
         else:
@@ -625,84 +3557,282 @@ class FileConverterApp:
             messagebox.showwarning("Warning", "A conversion is already in progress")
             return
 
+        if not self._check_batch_options():
+            return
+
+        self._start_queue(self.input_files)
+
+    def _check_batch_options(self):
+        """Check there are files, FFmpeg and complete options (shows what's missing)"""
         if not self.input_files:
             messagebox.showerror("Error", "Please select files to convert")
-            return
+            return False
 
+        self.wait_for_ffmpeg()
         if not self.ffmpeg_path:
             messagebox.showerror("Error", "FFmpeg not found. Please extract ffmpeg.zip and restart the application.")
-            return
+            return False
 
         # Validate options
         if not self.to_var.get():
             messagebox.showwarning("Warning", "Please select a target format option.")
-            return
+            return False
             
         # Validate custom resize if applicable
         if self.mode_var.get() == "Resize" and self.resize_var.get() == "Custom":
-            if not self.width_entry.get() or not self.height_entry.get():
+            if not self.width_var.get() or not self.height_var.get():
                  messagebox.showwarning("Warning", "Please enter valid Width and Height for custom resize.")
-                 return
+                 return False
+
+        try:
+            self.parse_trim(self.get_settings())
+        except ValueError as e:
+            messagebox.showwarning("Warning", f"Trim: {e}")
+            return False
+        return True
+
+    def plan_batch(self):
+        """Dry run of the selected files with the current options (probes in the background)"""
+        if not self._check_batch_options():
+            return
+        planner = BatchPlanner(self, self.get_settings())
+        paths = list(self.input_files)
+        from concurrent.futures import ThreadPoolExecutor
+        pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="plan")
+        future = pool.submit(planner.plan, paths)
+        pool.shutdown(wait=False)
+        self.plan_btn.configure(state="disabled")
+        self.status_label.configure(text=f"🧮 Probing {len(paths)} files...", text_color="#3498db")
+        self._wait_for_plan(planner, future)
+
+    def _wait_for_plan(self, planner, future):
+        if not future.done():
+            self.root.after(self.analysis_poll_ms, lambda: self._wait_for_plan(planner, future))
+            return
+        self.plan_btn.configure(state="normal")
+        try:
+            entries = future.result()
+        except Exception as e:
+            self.log_error(f"Planning failed: {e}")
+            self.status_label.configure(text=f"❌ Planning failed: {e}", text_color="#dc3545")
+            return
+        self.status_label.configure(text="🧮 Plan ready", text_color="#28a745")
+        self.show_plan(planner, entries)
+
+    def format_plan(self, planner, entries):
+        """Plan as text: totals first, then one block per file"""
+        import subprocess
+        totals = planner.totals(entries)
+        kinds = ", ".join(f"{count} {kind}" for kind, count in sorted(totals['kinds'].items()))
+        lines = [f"Files:    {totals['files']} ({kinds or 'none runnable'}), {totals['problems']} would fail",
+                 f"CPU:      {totals['cpu_seconds']:.0f} CPU-seconds ({totals['cpu_seconds'] / 3600:.2f} CPU-hours), "
+                 f"~{totals['wall_seconds'] / 3600:.2f} h on this machine ({self.governor.cpu_count} cores)",
+                 f"Output:   ~{self.format_file_size(totals['output_bytes'])}",
+                 ""]
+        for entry in entries:
+            name = os.path.basename(entry['path'])
+            if entry['problem']:
+                lines.append(f"❌ {name}: {entry['problem']}")
+                continue
+            note = f" ({entry['note']})" if entry['note'] else ""
+            lines.append(f"• {name}: {entry['kind']}, {entry['cpu_seconds']:.0f} CPU-s, "
+                         f"~{self.format_file_size(entry['output_bytes'])}{note}")
+            lines.append(f"    {subprocess.list2cmdline(entry['argv'])}")
+        return "\n".join(lines)
+
+    def show_plan(self, planner, entries):
+        """Window with the plan and a button to save it as JSON"""
+        window = ctk.CTkToplevel(self.root)
+        window.title("Batch plan")
+        window.geometry("900x600")
+        text = ctk.CTkTextbox(window, font=ctk.CTkFont(family="Courier", size=12), wrap="none")
+        text.pack(fill="both", expand=True, padx=10, pady=(10, 5))
+        text.insert("1.0", self.format_plan(planner, entries))
+        text.configure(state="disabled")
+
+        def save():
+            path = filedialog.asksaveasfilename(title="Save plan", defaultextension=".json",
+                                                filetypes=[("JSON", "*.json")], parent=window)
+            if path:
+                with open(path, 'w') as f:
+                    json.dump({'totals': planner.totals(entries), 'jobs': entries}, f, indent=2)
+
+        ctk.CTkButton(window, text="💾 Save plan", command=save, width=140,
+                      fg_color="#6c757d", hover_color="#5a6268").pack(pady=(0, 10))
+
+    def _start_queue(self, paths):
+        """Build the job queue for a batch and start processing"""
+        self.settings = self.get_settings()
+        self.use_farm = self.run_on_var.get() == "Render farm"
+        if not self.use_farm:
+            self.open_output_cache()
+        if self.use_farm:
+            import sqlite3
+            farm_db = self.config.get('farm_db')
+            if not farm_db:
+                messagebox.showerror("Error", "Choose a render farm queue file first (📂 next to Run on).")
+                return
+            try:
+                self.farm = FarmQueue(farm_db)
+            except sqlite3.Error as e:
+                messagebox.showerror("Error", f"Could not open the render farm queue:\n{e}")
+                return
 
         # Initialize queue
-        self.conversion_queue = list(self.input_files)
-        self.total_files = len(self.conversion_queue)
-        self.completed_count = 0
-        self.failed_files = []
-        self.failed_files_paths = []  # Track paths for retry
-        
+        shortest_first = self.queue_order_var.get() == "Shortest first"
+        self.job_queue = JobQueue(cost=self.job_cost if shortest_first else None)
+        queued_at = time.monotonic()
+        self.batch_jobs = [ConversionJob(path, index=index, queued_at=queued_at) for index, path in enumerate(paths)]
+        self.summary = BatchSummary(len(self.batch_jobs))  # Before queueing: shortest first reads the sizes
+        trim_start, trim_end = self.parse_trim(self.settings)  # Checked when Convert was pressed
+        for job in self.batch_jobs:
+            job.trim_start, job.trim_end = trim_start, trim_end
+            self.job_queue.push(job)
+        if self.normalizes_audio(self.get_conversion_type(self.settings)[0], self.settings):
+            # Measure loudness ahead of the encodes, in the order the files will run
+            self.loudness.prefetch(job.path for job in self.job_queue.jobs())
+        self.running_jobs = []
+        self.batch_cancelled = False
+        self.total_files = len(self.batch_jobs)
+        self.finished_count = 0
+        self.started_count = 0
+
         # Start UI
         self.is_converting = True
-        self.input_duration = 0
         self.start_conversion_ui()
-        
+
         # Start processing
         self.process_next_file()
 
     def process_next_file(self):
-        """Process the next file in the queue"""
-        if not self.conversion_queue:
-            # All done
-            self.stop_conversion_ui()
-            
-            # Play completion sound
-            try:
-                winsound.MessageBeep(winsound.MB_ICONASTERISK)
-            except:
-                pass  # Ignore if sound fails
-            
-            if self.failed_files:
-                failed_summary = "\n".join(self.failed_files[:5])
-                if len(self.failed_files) > 5:
-                    failed_summary += f"\n...and {len(self.failed_files) - 5} more."
-                
-                # Show retry button if there were failures
-                self.retry_btn.pack(side="left", padx=10)
-                
-                messagebox.showwarning("Batch Complete with Errors", 
-                                      f"Processed {self.total_files} files.\n\n"
-                                      f"✅ Successful: {self.total_files - len(self.failed_files)}\n"
-                                      f"❌ Failed: {len(self.failed_files)}\n\n"
-                                      f"Failures:\n{failed_summary}")
-            else:
-                # Hide retry button on success
-                self.retry_btn.pack_forget()
-                messagebox.showinfo("Success", f"Batch conversion complete!\nSuccessfully processed {self.total_files} files.")
+        """Start queued jobs while there are free slots, and wrap up the batch when all are done"""
+        if not self.is_converting:
             return
 
-        self.current_processing_file = self.conversion_queue.pop(0)
-        self.input_file = self.current_processing_file # Update current file for compatibility
+        schedule_started = self.profiler.now()
+        while not self.batch_cancelled:
+            allowed, reason = self._admit_job()
+            if not allowed:
+                if reason and len(self.job_queue) > self.job_queue.held_count() and not self._admit_retry_pending:
+                    # Machine is busy: hold new jobs back and try again shortly
+                    self.log_error(f"Holding back new jobs: {reason}")
+                    self._admit_retry_pending = True
+                    self.root.after(self.governor.retry_ms, self._retry_admission)
+                break
+
+            job = self.job_queue.pop()
+            if job is None:
+                break
+            self._start_job(job)
+        self.profiler.record("schedule", schedule_started)
+
+        if not self.is_converting:
+            return  # A job aborted the batch while starting
+
+        if self.running_jobs:
+            self.update_file_list_ui()
+            return
+
+        if self.job_queue.held_count() and not self.batch_cancelled:
+            # Only held jobs left: keep the batch open until they are released or cancelled
+            self.status_label.configure(text=f"⏸ {self.job_queue.held_count()} file(s) on hold - resume them or cancel the batch",
+                                        text_color="#ffc107")
+            self.update_file_list_ui()
+            return
+
+        if self.batch_cancelled:
+            self._on_conversion_cancelled()
+            return
+
+        # All done
+        self.loudness.cancel_pending()  # Left over from files cancelled or skipped after their analysis
+        self.quality_search.cancel_pending()
+        self.stop_conversion_ui()
+        self.update_file_list_ui()
+        self.profiler.export()
+        self.save_speed_factors()
         
-        # Update status
-        remaining = len(self.conversion_queue) + 1
-        current_num = self.total_files - remaining + 1
-        self.status_label.configure(text=f"⏳ Converting file {current_num}/{self.total_files}: {os.path.basename(self.input_file)}", text_color="#3498db")
+        # Play completion sound
+        try:
+            if os.name == 'nt':
+                import winsound
+                winsound.MessageBeep(winsound.MB_ICONASTERISK)
+        except:
+            pass  # Ignore if sound fails
         
-        self._start_single_file_conversion(self.input_file)
+        summary = self.summary
+        succeeded = summary.counts[JobStatus.DONE]
+        failed = summary.counts[JobStatus.FAILED]
+        not_run = summary.counts[JobStatus.SKIPPED] + summary.counts[JobStatus.CANCELLED]
+        not_run_line = f"⏭ Skipped: {not_run}\n" if not_run else ""
+
+        if failed:
+            failed_summary = "\n".join(f"{os.path.basename(self.batch_jobs[index].path)}\n({message})"
+                                       for index, message in summary.failures)
+            if failed > len(summary.failures):
+                failed_summary += f"\n...and {failed - len(summary.failures)} more."
+            
+            # Show retry button if there were failures
+            self.retry_btn.pack(side="left", padx=10)
+            
+            messagebox.showwarning("Batch Complete with Errors", 
+                                  f"Processed {self.total_files} files.\n\n"
+                                  f"✅ Successful: {succeeded}\n"
+                                  f"❌ Failed: {failed}\n"
+                                  f"{not_run_line}\n"
+                                  f"Failures:\n{failed_summary}")
+        else:
+            # Hide retry button on success
+            self.retry_btn.pack_forget()
+            messagebox.showinfo("Success", f"Batch conversion complete!\nSuccessfully processed {succeeded} files "
+                                           f"({self.format_file_size(summary.total_output_bytes)} written).\n"
+                                           f"{not_run_line}")
+
+    def _admit_job(self):
+        """Whether another job may start now, and why not if it's held back"""
+        if self.use_farm:
+            # Workers do the throttling; just cap how many jobs sit in the shared queue
+            return len(self.running_jobs) < self.farm_max_outstanding, None
+        return self.governor.admit(len(self.running_jobs))
+
+    def _retry_admission(self):
+        """Try again to start jobs the governor held back"""
+        self._admit_retry_pending = False
+        self.process_next_file()
+
+    def _start_job(self, job):
+        """Give a job a slot and start converting it"""
+        used_slots = {running.run.slot for running in self.running_jobs}
+        job.start_run(next(slot for slot in itertools.count() if slot not in used_slots))
+        job.status = JobStatus.RUNNING
+        self.running_jobs.append(job)
+        self.started_count += 1
+        self.input_file = job.path # Update current file for compatibility
+        self._update_pause_button()
+
+        # Update status
+        self.status_label.configure(text=f"⏳ Converting file {self.started_count}/{self.total_files}: {os.path.basename(self.input_file)}", text_color="#3498db")
+
+        if self._groupable(job):
+            self._start_group_conversion(job)
+        else:
+            self._start_single_file_conversion(job)
+
+    def job_cost(self, job):
+        """Rough run time for shortest-first ordering, guessed from the input size"""
+        return self.summary.input_size(job) / 250000.0  # ~2 Mbit/s
+
+    def _finish_job(self, job):
+        """Free the job's slot and update the overall progress"""
+        if job in self.running_jobs:
+            self.running_jobs.remove(job)
+            self.finished_count += 1
+        self.progress_tracker.remove(job.id)
+        self._update_pause_button()
 
     def retry_failed_conversions(self):
         """Retry only the files that failed in the last batch"""
-        if not self.failed_files_paths:
+        if not self.summary.failed:
             messagebox.showinfo("Info", "No failed files to retry.")
             return
         
@@ -714,148 +3844,496 @@ class FileConverterApp:
         self.retry_btn.pack_forget()
         
         # Set up queue with failed files only
-        self.conversion_queue = list(self.failed_files_paths)
-        self.total_files = len(self.conversion_queue)
-        self.completed_count = 0
-        self.failed_files = []
-        self.failed_files_paths = []
-        
-        # Start UI
-        self.is_converting = True
-        self.input_duration = 0
-        self.start_conversion_ui()
-        
-        # Start processing
-        self.process_next_file()
+        self._start_queue([self.batch_jobs[index].path for index in self.summary.failed])
 
-    def _start_single_file_conversion(self, input_file_path):
+    def _start_single_file_conversion(self, job):
         """Internal method to convert a single file"""
-        mode = self.mode_var.get()
-        from_format = self.from_var.get() # Note: logic currently assumes same from/to for all files if they match extension
-        # If files have different extensions, we might need to auto-detect 'to' format per file or force one.
-        # Current logic in UI sets 'from' based on first file. We'll stick to that simple logic 
-        # but re-verify if the file extension matches the expectations if needed. 
-        # For now, we assume user knows what they are doing converting mixed files to one format.
-        
-        to_format = self.to_var.get()
-        file_type = self.type_var.get()
-        resize_option = self.resize_var.get() if hasattr(self, 'resize_var') else "None"
+        input_file_path = job.path
+        # Options were snapshotted when the batch started, so editing the window doesn't change queued jobs
+        settings = self.settings
+        to_format = settings['to_format']
+        file_type = settings['file_type']
 
         if not to_format:
             # Should have been caught, but safe check
-            self.stop_conversion_ui()
-            messagebox.showerror("Error", "Please select target format")
+            self._abort_batch("Please select target format")
             return
 
+        profiler = self.profiler
+        stage_started = profiler.now()
+
         # Generate output filename
         input_path = Path(input_file_path)
-
-        # Determine conversion type based on mode and "to" format
-        suffix = "_converted"
-        conversion_type = "standard"
-
-        # Check if it's video to audio (video source + audio destination)
-        is_video_to_audio = (file_type == "Video" and to_format in self.file_types["Audio"])
-        is_video_to_gif = (file_type == "Video" and to_format == "gif")
-        has_resize = (resize_option != "None")
-
-        if mode == "Standard Conversion":
-            if is_video_to_audio:
-                suffix = "_audio"
-                conversion_type = "audio_extract"
-            elif is_video_to_gif:
-                suffix = "_gif"
-                conversion_type = "gif"
-            elif has_resize:
-                suffix = "_resized"
-                conversion_type = "resize_standard"
-            else:
-                suffix = "_converted"
-                conversion_type = "standard"
-
-        elif mode == "Resize":
-            suffix = "_resized"
-            conversion_type = "resize"
-
-        elif mode == "Compression":
-            suffix = "_compressed"
-            conversion_type = "compress"
+        conversion_type, suffix = self.get_conversion_type(settings)
+
+        # Two-pass loudness: the measuring pass usually finished while earlier files encoded
+        loudness = None
+        if self.normalizes_audio(conversion_type, settings):
+            measurement = self.loudness.measure_async(input_file_path)
+            if not measurement.done():
+                self._wait_for_analysis(job, measurement, f"🎚 Measuring loudness: {input_path.name}")
+                return
+            loudness = measurement.result()
+            self.loudness.forget(input_file_path)
+
+        # Target quality: the CRF comes from sample encodes of this file
+        crf = None
+        codec = self.quality_codec(conversion_type, settings)
+        if codec:
+            search = self.quality_search.search_async(input_file_path, codec, int(settings['quality_target']))
+            if not search.done():
+                self._wait_for_analysis(job, search, f"🎯 Finding the CRF for {input_path.name}")
+                return
+            crf = search.result()
+            self.quality_search.forget(input_file_path, codec, int(settings['quality_target']))
 
         # Determine output folder
-        output_folder_setting = self.output_var.get()
-        if output_folder_setting == "Same as input":
-            output_folder = input_path.parent
-        else:
-            output_folder = Path(output_folder_setting)
-            # Create folder if it doesn't exist
-            if not output_folder.exists():
-                try:
-                    output_folder.mkdir(parents=True, exist_ok=True)
-                except Exception as e:
-                    self.stop_conversion_ui()
-                    messagebox.showerror("Error", f"Could not create output folder: {e}")
-                    return
+        try:
+            output_folder = self.get_output_folder(input_path, settings)
+        except Exception as e:
+            self._abort_batch(f"Could not create output folder: {e}")
+            return
 
         output_file = output_folder / f"{input_path.stem}{suffix}.{to_format}"
+        claimed = self._claimed_outputs(job)
+        if os.path.normcase(output_file) in claimed:
+            # A same-named file from another folder is already converting to this path: keep both
+            output_file = self.unique_output_path(output_file, claimed)
+        job.run.output_file = output_file  # Reserved while the job waits for disk space or runs
+        profiler.record("output path", stage_started, job=job.id)
 
         # Overwrite protection
+        stage_started = profiler.now()
         if output_file.exists():
             # For batch, maybe we should just skip or auto-rename?
             # Asking for every file is annoying. Let's auto-rename for batch simplicity or ask?
             # Asking might block thread if not careful, but we are on main thread here.
             if not messagebox.askyesno("File Exists", f"The file '{output_file.name}' already exists.\nDo you want to overwrite it?"):
-                # Skip this file
-                self.process_next_file()
+                # Skip this file (the scheduler moves on to the next one)
+                job.status = JobStatus.SKIPPED
+                self._finish_job(job)
+                self.record_job_metrics(job)
                 return
+        profiler.record("overwrite check", stage_started, job=job.id)
+
+        # Get input file duration for progress calculation (thumbnails also seek by it)
+        if file_type == "Image" and conversion_type not in ("resize", "resize_standard"):
+            # Stills have no duration and only resizing needs their size: save an FFmpeg run
+            media = {'duration': None, 'width': None, 'height': None, 'format': input_path.suffix.lower().lstrip(".")}
+        else:
+            probe_started = time.monotonic()
+            with profiler.span("probe", job=job.id):
+                media = self.probe_media(input_file_path)
+                job.run.duration = self.trimmed_duration(media['duration'], (job.trim_start, job.trim_end))
+            job.run.probe_time = time.monotonic() - probe_started
 
         # Atomic write: use .tmp suffix before extension so FFmpeg knows format
-        temp_output_file = output_folder / f"{input_path.stem}{suffix}.tmp.{to_format}"
+        stage_started = profiler.now()
+        # (Unique: parallel jobs for same-named inputs from different folders share a folder)
+        scratch_folder = self.get_scratch_folder(output_folder)
+        temp_output_file = scratch_folder / f"{input_path.stem}{suffix}.{os.urandom(4).hex()}.tmp.{to_format}"
 
         # Build ffmpeg command based on conversion type
-        cmd = [self.ffmpeg_path, "-i", input_file_path]
+        try:
+            cmd = self.build_command(input_file_path, conversion_type, settings, job.run.duration, loudness, crf,
+                                     (job.trim_start, job.trim_end), media)
+        except ValueError as e:
+            self._abort_batch(str(e))
+            return
 
-        if conversion_type == "audio_extract":
-            cmd.extend(self.get_audio_extraction_params(to_format))
-        elif conversion_type == "gif":
-            cmd.extend(self.get_gif_conversion_params())
-        elif conversion_type == "resize" or conversion_type == "resize_standard":
-            cmd.extend(self.get_resize_params(to_format))
-        elif conversion_type == "compress":
-            cmd.extend(self.get_compression_params(to_format))
-        else:
-            # Standard conversion
-            cmd.extend(self.get_standard_conversion_params(file_type, to_format))
+        job.run.kind = self.job_kind(conversion_type, cmd)
+
+        # Share the CPU between parallel jobs (farm workers add their own)
+        if not self.use_farm:
+            cmd.extend(self.governor.threads_option())
 
         # Add output file and overwrite flag (always overwrite the tmp file)
         cmd.extend(["-y", str(temp_output_file)])
+        profiler.record("build command", stage_started, job=job.id)
 
         # Log the command for debugging
+        with profiler.span("log", job=job.id):
+            self.log_error(f"Running command: {' '.join(cmd)}")
+
+        # Pre-flight disk check: pause the queue instead of letting FFmpeg fail on a full disk
+        stage_started = profiler.now()
+        job.run.estimated_size = self.estimate_output_size(cmd, input_file_path, job.run.duration, file_type, to_format)
+        has_room = self._job_has_room(job, temp_output_file, output_file)
+        profiler.record("disk check", stage_started, job=job.id)
+        if not has_room:
+            self._wait_for_disk_space(job, cmd, temp_output_file, output_file)
+            return
+
+        with profiler.span("launch", job=job.id):
+            self._launch_conversion(job, cmd, temp_output_file, output_file)
+
+    def _claimed_outputs(self, job=None):
+        """Output paths taken by the other running jobs, including the files of grouped runs"""
+        claimed = set()
+        for running in self.running_jobs:
+            for other in running.run.group or (running,):
+                if other is not job and other.run.output_file is not None:
+                    claimed.add(os.path.normcase(other.run.output_file))
+        return claimed
+
+    def unique_output_path(self, output_file, claimed):
+        """The first free 'name (2).ext', 'name (3).ext'... next to output_file"""
+        output_file = Path(output_file)
+        for number in itertools.count(2):
+            candidate = output_file.with_name(f"{output_file.stem} ({number}){output_file.suffix}")
+            if os.path.normcase(candidate) not in claimed and not candidate.exists():
+                return candidate
+
+    def _groupable(self, job):
+        """Whether a job may share an FFmpeg run with other small files"""
+        settings = self.settings
+        if self.group_size < 2 or job.solo or self.use_farm or self.output_cache is not None:
+            return False  # (Cached outputs are looked up per command)
+        if settings['file_type'] not in ("Image", "Audio") or self.summary.input_size(job) > self.group_max_bytes:
+            return False
+        conversion_type = self.get_conversion_type(settings)[0]
+        return (conversion_type == "standard" and not self.normalizes_audio(conversion_type, settings)
+                and job.trim_start is None and job.trim_end is None)
+
+    def _start_group_conversion(self, lead):
+        """Convert a run of small files with one FFmpeg process: one input and one output per file
+
+        The next queued files that qualify join the lead job, which owns the
+        process. Nothing is probed: standard image/audio settings don't depend
+        on the input. If the run fails, each file goes back to the queue to run
+        on its own, so the failure is reported against the right file.
+        """
+        members = [lead]
+        while len(members) < self.group_size:
+            job = self.job_queue.peek()
+            if job is None or not self._groupable(job):
+                break
+            self.job_queue.pop()
+            job.start_run()
+            job.status = JobStatus.RUNNING
+            self.started_count += 1
+            members.append(job)
+        if len(members) == 1:
+            self._start_single_file_conversion(lead)
+            return
+
+        settings = self.settings
+        to_format = settings['to_format']
+        conversion_type, suffix = self.get_conversion_type(settings)
+        claimed = self._claimed_outputs(lead)
+        slot = lead.run.slot
+        grouped = []
+        for job in members:
+            input_path = Path(job.path)
+            try:
+                output_folder = self.get_output_folder(input_path, settings)
+            except Exception as e:
+                self._requeue_group_members(members[1:])
+                self._abort_batch(f"Could not create output folder: {e}")
+                return
+            output_file = output_folder / f"{input_path.stem}{suffix}.{to_format}"
+            if os.path.normcase(output_file) in claimed:
+                # Same-named inputs from different folders (in this run or another one): keep both
+                output_file = self.unique_output_path(output_file, claimed)
+            if output_file.exists() and not messagebox.askyesno(
+                    "File Exists", f"The file '{output_file.name}' already exists.\nDo you want to overwrite it?"):
+                job.status = JobStatus.SKIPPED
+                if job is lead:
+                    self._finish_job(lead)
+                else:
+                    self.finished_count += 1
+                self.record_job_metrics(job)
+                continue
+            scratch_folder = self.get_scratch_folder(output_folder)
+            job.run.temp_output_file = scratch_folder / f"{input_path.stem}{suffix}.{os.urandom(4).hex()}.tmp.{to_format}"
+            job.run.output_file = output_file
+            claimed.add(os.path.normcase(output_file))
+            grouped.append(job)
+        if not grouped:
+            return
+
+        head = grouped[0]
+        if head is not lead:
+            # The lead was skipped: the next file takes over its slot
+            head.run.slot = slot
+            self.running_jobs.append(head)
+
+        # One input per file, each mapped to its own output with the same options
+        stream = "a:0" if settings['file_type'] == "Audio" else "v:0"
+        params = self.get_conversion_params(conversion_type, settings) + self.governor.threads_option()
+        cmd = [self.ffmpeg_path, "-y"]
+        for job in grouped:
+            cmd += ["-i", job.path]
+        for index, job in enumerate(grouped):
+            cmd += ["-map", f"{index}:{stream}"] + params + [str(job.run.temp_output_file)]
+            job.run.kind = self.job_kind(conversion_type, params)
+        head.run.group = grouped
         self.log_error(f"Running command: {' '.join(cmd)}")
 
-        # Get input file duration for progress calculation
-        self.input_duration = self.get_media_duration(input_file_path)
+        # Pre-flight disk check for the whole run: the head reserves the space of every file
+        head.run.estimated_size = sum(self.estimate_output_size(params, job.path, None, settings['file_type'], to_format)
+                                  for job in grouped)
+        if not self._job_has_room(head, head.run.temp_output_file, head.run.output_file):
+            self._wait_for_disk_space(head, cmd, head.run.temp_output_file, head.run.output_file)
+            return
+        self._launch_conversion(head, cmd, head.run.temp_output_file, head.run.output_file)
+
+    def _requeue_group_members(self, jobs):
+        """Put jobs taken for a grouped run back in the queue, to run on their own"""
+        for job in jobs:
+            job.solo = True
+            job.run = None  # Its own run starts from scratch
+            self.started_count -= 1
+            self.job_queue.push(job)
+
+    def _on_group_complete(self, head, return_code, stderr_text):
+        """Finalize each file of a grouped run; if the run failed, retry its files one at a time"""
+        members, head.run.group = head.run.group, None
+        head.run.process = None
+        self._finish_job(head)
+        cancelled = head.run.cancel_requested
+        encode_time = (head.run.encode_time or 0) / len(members)
+        retry = []
+        for job in members:
+            job.run.encode_time = encode_time
+            error_text = None
+            if cancelled:
+                job.status = JobStatus.CANCELLED
+                self._remove_temp_file(job.run.temp_output_file)
+            elif return_code == 0 and os.path.exists(job.run.temp_output_file) and os.path.getsize(job.run.temp_output_file):
+                try:
+                    self.finalize_output(job.run.temp_output_file, job.run.output_file)
+                    job.status = JobStatus.DONE
+                except Exception as e:
+                    self.log_error(f"Error finalizing file: {e}")
+                    job.status = JobStatus.FAILED
+                    error_text = f"Finalize Error: {e}"
+                    self._remove_temp_file(job.run.temp_output_file)
+            else:
+                # Can't tell which input broke the run (or whether the outputs are whole)
+                self._remove_temp_file(job.run.temp_output_file)
+                retry.append(job)
+                continue
+            self.record_job_metrics(job, error_text)
+        self.finished_count += len(members) - len(retry) - 1  # _finish_job counted the head
+
+        if retry:
+            self.log_error(f"Grouped run of {len(members)} files failed ({return_code}), "
+                           f"retrying {len(retry)} one at a time: {BatchSummary.last_error(stderr_text)}")
+            self._requeue_group_members(retry)
+        self.process_next_file()
+
+    def _abort_batch(self, message):
+        """Show an error that affects every job and cancel the batch"""
+        messagebox.showerror("Error", message)
+        self.cancel_conversion()
+
+    def _launch_conversion(self, job, cmd, temp_output_file, output_file):
+        """Start FFmpeg for a job in a background thread"""
+        job.run.temp_output_file = temp_output_file
+        job.run.output_file = output_file
+        job.run.launched = True
+        for member in job.run.group or ():
+            member.run.launched = True
+        self.update_file_list_ui()
+
+        if self.use_farm:
+            self._dispatch_to_farm(job, cmd, output_file)
+            return
+
+        # Run FFmpeg on the engine's event loop; the result comes back through its events queue
+        self.engine.submit(job, cmd, job.run.slot,
+                           on_progress=lambda fraction: self.progress_tracker.update(job.id, fraction),
+                           use_cache=True, notify=True)
+
+    def _dispatch_to_farm(self, job, cmd, output_file):
+        """Put a job in the render farm queue instead of running FFmpeg here"""
+        import sqlite3
+        try:
+            # Workers add their own binary, thread count and temp output
+            job.run.farm_id = self.farm.submit(cmd[1:-2], job.path, output_file)
+        except sqlite3.Error as e:
+            self._on_conversion_error(f"Could not queue job on the render farm: {e}", job)
+            return
+        if self._farm_poll_id is None:
+            self._farm_poll_id = self.root.after(self.farm_poll_ms, self._poll_farm)
+
+    def _poll_farm(self):
+        """Pick up progress and results of farm jobs (runs on the Tk thread)"""
+        import sqlite3
+        self._farm_poll_id = None
+        farm_jobs = [job for job in self.running_jobs if job.run.farm_id is not None]
+        if not farm_jobs:
+            return
+        try:
+            self.farm.requeue_expired()
+            rows = self.farm.get_jobs([job.run.farm_id for job in farm_jobs])
+        except sqlite3.Error as e:
+            self.log_error(f"Render farm queue error: {e}")
+            rows = {}
+
+        for job in farm_jobs:
+            row = rows.get(job.run.farm_id)
+            if row is None:
+                continue
+            if row["status"] == "leased" and row["progress"] is not None:
+                self.progress_tracker.update(job.id, row["progress"])
+            elif row["status"] in ("done", "failed", "cancelled"):
+                return_code = row["return_code"] if row["return_code"] is not None else -1
+                if row["status"] == "cancelled":
+                    job.run.cancel_requested = True
+                self._on_conversion_complete(job, return_code, None, job.run.output_file, row["error"] or "")
+
+        if any(job.run.farm_id is not None for job in self.running_jobs):
+            self._farm_poll_id = self.root.after(self.farm_poll_ms, self._poll_farm)
+
+    def get_free_space(self, folder):
+        """Get free bytes on the drive holding folder (None if unknown)"""
+        try:
+            return shutil.disk_usage(folder).free
+        except OSError:
+            return None
+
+    def has_disk_space(self, folder, needed_bytes):
+        """Check that writing needed_bytes to folder still leaves the configured headroom"""
+        free = self.get_free_space(folder)
+        if free is None:
+            return True  # Can't tell, let FFmpeg try
+        return free - needed_bytes >= self.disk_headroom_bytes
+
+    def has_room_for(self, temp_output_file, output_file, estimated_size):
+        """Check the scratch drive (encode) and the output drive (finalize) both have room"""
+        return (self.has_disk_space(Path(temp_output_file).parent, estimated_size) and
+                self.has_disk_space(Path(output_file).parent, estimated_size))
+
+    def _reserved_disk_space(self, job):
+        """Output bytes still expected from the other running jobs"""
+        return sum(other.run.estimated_size for other in self.running_jobs if other is not job and other.run.launched)
+
+    def _job_has_room(self, job, temp_output_file, output_file):
+        """Check there is room for the job's output (every file of a grouped run) and what the other jobs reserved"""
+        estimated_size = job.run.estimated_size + self._reserved_disk_space(job)
+        if job.run.group:
+            return all(self.has_room_for(member.run.temp_output_file, member.run.output_file, estimated_size)
+                       for member in job.run.group)
+        return self.has_room_for(temp_output_file, output_file, estimated_size)
+
+    def _wait_for_disk_space(self, job, cmd, temp_output_file, output_file):
+        """Hold the job until there is room for its output, then start it"""
+        if not self.is_converting or job.run is None:
+            return  # Cancelled while waiting (its result is recorded)
+
+        estimated_size = job.run.estimated_size + self._reserved_disk_space(job)
+        if self._job_has_room(job, temp_output_file, output_file):
+            self._launch_conversion(job, cmd, temp_output_file, output_file)
+            return
+
+        free = min(self.get_free_space(Path(temp_output_file).parent) or 0,
+                   self.get_free_space(Path(output_file).parent) or 0)
+        self.status_label.configure(
+            text=f"⏸ Waiting for disk space: {os.path.basename(output_file)} needs ~{self.format_file_size(estimated_size)}, "
+                 f"{self.format_file_size(free)} free",
+            text_color="#ffc107")
+        self.root.after(self.disk_retry_ms,
+                        lambda: self._wait_for_disk_space(job, cmd, temp_output_file, output_file))
+
+    def _wait_for_analysis(self, job, future, status):
+        """Hold the job until an analysis it needs (loudness, CRF search) is done, then start it"""
+        if not self.is_converting or job.run is None:
+            return  # Cancelled while waiting (its result is recorded)
+
+        if future.done():
+            self._start_single_file_conversion(job)
+            # Not called from the scheduler loop: if the job was skipped (or failed to start), move on
+            self.process_next_file()
+            return
+
+        self.status_label.configure(text=status, text_color="#3498db")
+        self.root.after(self.analysis_poll_ms, lambda: self._wait_for_analysis(job, future, status))
 
-        # We are already in UI mode (batch), so no need to call start_conversion_ui again
-        # But we need to reset progress bar for this file and ensure correct mode
-        if self.input_duration and self.input_duration > 0:
-            self.progress_bar.configure(mode="determinate")
-            self.progress_bar.set(0)
-            self.progress_label.configure(text="0%")
+    def _parse_bitrate(self, value):
+        """Convert an FFmpeg bitrate string like '192k' or '4M' to bits per second"""
+        match = re.match(r'^(\d+(?:\.\d+)?)([kKmM]?)$', str(value).strip())
+        if not match:
+            return None
+        number, unit = match.groups()
+        multiplier = {"": 1, "k": 1000, "m": 1000000}[unit.lower()]
+        return int(float(number) * multiplier)
+
+    def estimate_output_size(self, cmd, input_file_path, duration, file_type, to_format):
+        """Estimate output size in bytes from the probed duration and the command's bitrates/CRF"""
+        try:
+            input_size = os.path.getsize(input_file_path)
+        except OSError:
+            input_size = 0
+
+        def option(name):
+            # Value following an option in the command, or None
+            if name in cmd:
+                index = cmd.index(name)
+                if index + 1 < len(cmd):
+                    return cmd[index + 1]
+            return None
+
+        # Thumbnails are a single small image
+        if option("-frames:v") == "1" and file_type == "Video":
+            return 1024 * 1024
+
+        # Images and files without a duration: scale from the input size
+        if file_type == "Image" or not duration:
+            factor = 4 if to_format in ["bmp", "tiff"] else 2
+            return max(input_size * factor, 1024 * 1024)
+
+        # Video bitrate
+        video_bps = 0
+        video_filter = option("-vf") or ""
+        if "-vn" in cmd or to_format in self.file_types["Audio"]:
+            video_bps = 0
+        elif to_format == "gif":
+            # GIF: roughly half a byte per pixel per frame at the chosen scale
+            gif_match = re.search(r'fps=(\d+),scale=(\d+)', video_filter)
+            fps, width = map(int, gif_match.groups()) if gif_match else (10, 320)
+            return int(width * width * 9 / 16 * 0.5 * fps * duration)
+        elif option("-b:v"):
+            video_bps = self._parse_bitrate(option("-b:v")) or 0
+        elif option("-c:v") == "copy":
+            video_bps = input_size * 8 / duration
         else:
-            self.progress_bar.configure(mode="indeterminate")
-            self.progress_bar.start()
-            self.progress_label.configure(text="Processing...")
-
-        # Run conversion in a separate thread
-        conversion_thread = threading.Thread(
-            target=self._run_conversion_thread,
-            args=(cmd, temp_output_file, output_file),
-            daemon=True
-        )
-        conversion_thread.start()
+            # CRF table: ~2500k at CRF 23 (the libx264 default), doubling every 6 steps down
+            try:
+                crf = float(option("-crf") or 23)
+            except ValueError:
+                crf = 23
+            video_bps = 2500000 * 2 ** ((23 - crf) / 6.0)
+
+        # Audio bitrate
+        audio_codec = option("-c:a")
+        if option("-b:a"):
+            audio_bps = self._parse_bitrate(option("-b:a")) or 0
+        elif audio_codec in ["pcm_s16le", "pcm_s16be"]:
+            audio_bps = 1411200  # 44.1 kHz stereo 16-bit
+        elif audio_codec == "flac":
+            audio_bps = 900000
+        else:
+            audio_bps = 192000
+
+        # 10% margin for container overhead and rate control overshoot
+        return int((video_bps + audio_bps) / 8 * duration * 1.1)
 
     def get_media_duration(self, file_path):
         """Get the duration of a media file in seconds"""
+        return self.probe_media(file_path)['duration']
+
+    def probe_media(self, file_path):
+        """Duration (seconds), video width/height and format (extension) of a file; unknown values are None
+
+        width/height are the size the video is shown at, which is what FFmpeg
+        filters see: turned by the rotation metadata (FFmpeg autorotates) and
+        stretched by a non-square sample aspect ratio ('sar', 1.0 if square).
+        """
+        import subprocess
+        info = {'duration': None, 'width': None, 'height': None, 'sar': 1.0,
+                'format': Path(file_path).suffix.lower().lstrip(".")}
         try:
             cmd = [self.ffmpeg_path, "-i", file_path]
             result = subprocess.run(
@@ -864,194 +4342,771 @@ class FileConverterApp:
                 text=True,
                 creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
             )
-            # FFmpeg outputs duration in stderr
+            # FFmpeg outputs duration and streams in stderr
             duration_match = re.search(r'Duration: (\d{2}):(\d{2}):(\d{2})\.(\d{2})', result.stderr)
             if duration_match:
                 hours, minutes, seconds, centiseconds = map(int, duration_match.groups())
-                return hours * 3600 + minutes * 60 + seconds + centiseconds / 100
+                info['duration'] = hours * 3600 + minutes * 60 + seconds + centiseconds / 100
+            # First video stream, e.g. "Video: h264 (High), yuv420p(tv, bt709), 1920x1080 [SAR 1:1 DAR 16:9]"
+            size_match = re.search(r'Stream #.*?Video: .*?, (\d{2,5})x(\d{2,5})(?: \[SAR (\d+):(\d+))?', result.stderr)
+            if size_match:
+                width, height = int(size_match.group(1)), int(size_match.group(2))
+                if size_match.group(3) and int(size_match.group(3)) and int(size_match.group(4)):
+                    info['sar'] = int(size_match.group(3)) / int(size_match.group(4))
+                    width = max(2, round(width * info['sar']))  # Anamorphic: shown wider or narrower
+                # Rotation of this stream: "displaymatrix: rotation of -90.00 degrees" or "rotate : 90"
+                stream_end = result.stderr.find("Stream #", size_match.end())
+                stream_text = result.stderr[size_match.end():stream_end if stream_end >= 0 else None]
+                rotation_match = re.search(r'rotation of (-?\d+(?:\.\d+)?) degrees|rotate\s*:\s*(-?\d+)', stream_text)
+                if rotation_match and round(float(rotation_match.group(1) or rotation_match.group(2))) % 180 == 90:
+                    width, height = height, width  # Portrait clip stored landscape
+                info['width'], info['height'] = width, height
         except Exception as e:
             self.log_error(f"Could not get duration: {e}")
-        return None
+        return info
 
     def start_conversion_ui(self):
         """Update UI to show conversion in progress"""
         self.convert_btn.configure(state="disabled")
         self.cancel_btn.pack(side="left", padx=10)
+        self.pause_btn.pack(side="left", padx=10)
         self.progress_frame.pack(pady=5)
 
-        # Use indeterminate mode if we couldn't get duration
-        if self.input_duration and self.input_duration > 0:
-            self.progress_bar.configure(mode="determinate")
-            self.progress_bar.set(0)
-            self.progress_label.configure(text="0%")
-            self.status_label.configure(text="⏳ Converting... (0%)", text_color="#3498db")
-        else:
-            self.progress_bar.configure(mode="indeterminate")
-            self.progress_bar.start()
-            self.progress_label.configure(text="Processing...")
-            self.status_label.configure(text="⏳ Converting...", text_color="#3498db")
+        # Indeterminate until the first job reports progress
+        self.progress_bar.configure(mode="indeterminate")
+        self.progress_bar.start()
+        self.progress_label.configure(text="Processing...")
+        self.status_label.configure(text="⏳ Converting...", text_color="#3498db")
 
-        self.root.update()
+        # Redraw progress at a fixed rate instead of once per FFmpeg progress line
+        self.progress_tracker.clear()
+        self._last_progress_state = None
+        self._shown_progress = {"mode": "indeterminate"}
+        if self._progress_poll_id is None:
+            self._progress_poll_id = self.root.after(self.progress_poll_ms, self._poll_progress)
 
     def stop_conversion_ui(self):
         """Reset UI after conversion completes"""
         self.convert_btn.configure(state="normal")
         self.cancel_btn.pack_forget()
+        self.pause_btn.pack_forget()
         self.progress_bar.stop()  # Stop indeterminate animation if running
         self.progress_frame.pack_forget()
         self.is_converting = False
 
     def cancel_conversion(self):
         """Cancel the ongoing conversion"""
-        # Clear queue so we don't continue
-        self.conversion_queue = []
-        
-        if self.conversion_process and self.is_converting:
-            try:
-                self.conversion_process.terminate()
-                self.conversion_process.wait(timeout=5)
-            except Exception as e:
-                self.log_error(f"Error terminating process: {e}")
-                try:
-                    self.conversion_process.kill()
-                except:
-                    pass
+        if not self.is_converting:
+            return
 
-            self.root.after(0, self._on_conversion_cancelled)
+        # Clear queue so we don't continue
+        self.batch_cancelled = True
+        self.loudness.cancel_pending()
+        self.quality_search.cancel_pending()
+        for job in self.job_queue.clear():
+            job.status = JobStatus.CANCELLED
+            self.record_job_metrics(job)
+
+        if self.running_jobs:
+            # Finishes the batch once the running jobs have been cleaned up
+            for job in list(self.running_jobs):
+                self.cancel_running_job(job)
+        else:
+            # Nothing running (only held jobs were left)
+            self.process_next_file()
 
     def _on_conversion_cancelled(self):
         """Handle UI update after cancellation"""
         self.stop_conversion_ui()
+        self.update_file_list_ui()
+        self.profiler.export()
+        self.save_speed_factors()
         self.status_label.configure(text="⚠️ Conversion cancelled", text_color="#ffc107")
 
-    def _run_conversion_thread(self, cmd, temp_output_file, final_output_file):
-        """Run FFmpeg conversion in a background thread with progress monitoring"""
-        try:
-            # Start the process - Use DEVNULL for stdout to prevent deadlocks (since we don't read it)
-            self.conversion_process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.PIPE,
-                universal_newlines=True,
-                creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
-            )
-
-            stderr_output = []
-
-            # Read stderr line by line (FFmpeg outputs progress to stderr)
-            for line in self.conversion_process.stderr:
-                if not self.is_converting:
-                    break
-
-                stderr_output.append(line)
-
-                # Parse time progress from stderr (format: time=00:01:23.45)
-                if "time=" in line:
-                    try:
-                        time_match = re.search(r'time=(\d{2}):(\d{2}):(\d{2})\.(\d{2})', line)
-                        if time_match and self.input_duration and self.input_duration > 0:
-                            hours, minutes, seconds, centiseconds = map(int, time_match.groups())
-                            current_time = hours * 3600 + minutes * 60 + seconds + centiseconds / 100
-                            progress = min(current_time / self.input_duration, 1.0)
-                            self.root.after(0, lambda p=progress: self._update_progress(p))
-                    except (ValueError, AttributeError):
-                        pass
-
-            # Wait for process to complete
-            self.conversion_process.wait()
-
-            return_code = self.conversion_process.returncode
-            stderr_text = ''.join(stderr_output)
-
-            # Log the output
-            self.log_error(f"Return code: {return_code}")
-            self.log_error(f"STDERR: {stderr_text}")
+    def _handle_engine_events(self):
+        """Pass finished jobs from the engine to the completion handlers (Tk thread)"""
+        while True:
+            try:
+                kind, job, payload = self.engine.events.get_nowait()
+            except queue.Empty:
+                return
+            if kind == "complete":
+                return_code, stderr_text = payload
+                # Log the output
+                self.log_error(f"Return code: {return_code}")
+                self.log_error(f"STDERR: {stderr_text}")
+                self._on_conversion_complete(job, return_code, job.run.temp_output_file, job.run.output_file, stderr_text)
+            else:
+                self.log_error(f"Exception in conversion engine: {payload}")
+                self._on_conversion_error(payload, job)
+
+    def run_ffmpeg(self, job, cmd, slot=0):
+        """Run FFmpeg for a job and wait for it (no window), returns (return code, last error line)
+
+        Progress is kept in job.run.progress_fraction; another thread can stop the
+        run by setting job.run.cancel_requested and calling job.run.kill_process().
+        """
+        return_code, stderr_text = self.engine.submit(job, cmd, slot).result()
+        last_lines = [line.strip() for line in stderr_text.splitlines()[-20:] if line.strip()]
+        return return_code, (last_lines[-1] if last_lines else None)
+
+    # Containers FFmpeg can write to a pipe without seeking back: name -> (muxer, extra options)
+    stream_containers = {
+        "mp4": ("mp4", ["-movflags", "frag_keyframe+empty_moov+default_base_moof"]),
+        "m4a": ("mp4", ["-movflags", "frag_keyframe+empty_moov+default_base_moof"]),
+        "mkv": ("matroska", []),
+        "webm": ("webm", []),
+        "mpg": ("mpeg", []),
+        "mpeg": ("mpeg", []),
+        "mp3": ("mp3", []),
+        "aac": ("adts", []),
+        "flac": ("flac", []),
+        "ogg": ("ogg", []),
+        "opus": ("opus", []),
+        "gif": ("gif", []),
+        # Stills: one image after another on the pipe, so the encoder has to be named
+        "jpg": ("image2pipe", ["-c:v", "mjpeg"]),
+        "png": ("image2pipe", ["-c:v", "png"]),
+        "webp": ("image2pipe", ["-c:v", "libwebp"]),
+        "bmp": ("image2pipe", ["-c:v", "bmp"]),
+        "tiff": ("image2pipe", ["-c:v", "tiff"]),
+    }
+
+    def stream_format(self, settings):
+        """Output format to stream for these options: the chosen one if it can be piped, else mkv/mp3"""
+        to_format = settings['to_format']
+        if to_format in self.stream_containers:
+            return to_format
+        if settings['file_type'] == "Image":
+            # No stand-in for a still: an icon or a vector image isn't what was asked for
+            raise ValueError(f"{to_format.upper()} images can't be streamed, choose JPG, PNG, WebP, BMP, TIFF or GIF")
+        if to_format in self.file_types["Audio"]:
+            return "mp3"
+        return "mkv"  # mov, avi, wmv, flv... need to seek back to finish the file
+
+    def convert_stream(self, source, sink, settings, input_format=None, name="pipe"):
+        """Convert a stream without touching the disk, returns (return code, last error line, output format)
+
+        source and sink are as for AsyncEngine.submit. The output format falls
+        back to a streamable one (see stream_format), so the output can be
+        consumed while it is written, and FFmpeg starts on the first bytes of
+        the input. input_format (an FFmpeg demuxer name) helps when the input
+        can't be recognised from its start. Options that need the whole input
+        up front (thumbnails, loudness normalization, target quality) aren't
+        available; target quality falls back to Medium.
+        """
+        conversion_type, _ = self.get_conversion_type(settings)
+        if conversion_type == "thumbnails":
+            raise ValueError("Thumbnails need a file to seek in, not a stream")
+        to_format = self.stream_format(settings)
+        settings = dict(settings, to_format=to_format, normalize=False)
+
+        cmd = [self.ffmpeg_path] + (["-f", input_format] if input_format else [])
+        cmd += self.build_command("pipe:0", conversion_type, settings, trim=self.parse_trim(settings))[1:]
+        muxer, options = self.stream_containers.get(to_format, ("matroska", []))
+        cmd += self.governor.threads_option() + options + ["-f", muxer, "pipe:1"]
+        self.log_error(f"Running command: {' '.join(cmd)}")
 
-            # Update UI on main thread
-            self.root.after(0, lambda: self._on_conversion_complete(return_code, temp_output_file, final_output_file, stderr_text))
+        job = ConversionJob(name)
+        job.start_run()
+        return_code, stderr_text = self.engine.submit(job, cmd, source=source, sink=sink).result()
+        last_lines = [line.strip() for line in stderr_text.splitlines()[-20:] if line.strip()]
+        job.status = JobStatus.DONE if return_code == 0 else JobStatus.FAILED
+        self.record_job_metrics(job, None if return_code == 0 else stderr_text)
+        return return_code, (last_lines[-1] if last_lines else None), to_format
+
+    def _poll_progress(self):
+        """Handle finished jobs and redraw progress from the aggregator (runs on the Tk thread while converting)"""
+        self._handle_engine_events()
+        if not self.is_converting:
+            self._progress_poll_id = None
+            return
+        with self.profiler.span("progress redraw"):
+            self._refresh_progress()
+        self._progress_poll_id = self.root.after(self.progress_poll_ms, self._poll_progress)
 
-        except Exception as e:
-            self.log_error(f"Exception in conversion thread: {str(e)}")
-            self.root.after(0, lambda: self._on_conversion_error(str(e)))
+    def _refresh_progress(self):
+        """Show batch progress: finished files plus the running files' fractions"""
+        if not self.is_converting or not self.total_files:
+            return
+        version, progress = self.progress_tracker.snapshot()
+        state = (version, self.finished_count)
+        if state == self._last_progress_state:
+            return  # Nothing new since the last redraw
+        self._last_progress_state = state
+
+        reported = [progress[job.id] for job in self.running_jobs if job.id in progress]
+        if not reported and not self.finished_count:
+            return  # Nothing to show yet, keep the indeterminate animation
+
+        fraction = (self.finished_count + sum(reported)) / self.total_files
+        percent = int(fraction * 100)
+        status_text = None
+        if any(job.status == JobStatus.RUNNING for job in self.running_jobs):
+            if len(self.running_jobs) > 1:
+                status_text = f"⏳ Converting {len(self.running_jobs)} files... ({percent}%)"
+            else:
+                status_text = f"⏳ Converting... ({percent}%)"
+        self._show_progress(fraction, percent, status_text)
 
-    def _update_progress(self, progress):
-        """Update progress bar and label (called on main thread)"""
-        if self.is_converting:
+    def _show_progress(self, fraction, percent, status_text):
+        """Push progress to the widgets, touching only the ones whose value changed"""
+        shown = self._shown_progress
+        if shown.get("mode") != "determinate":
             # Switch to determinate mode if we were in indeterminate
             try:
                 self.progress_bar.stop()
                 self.progress_bar.configure(mode="determinate")
             except:
                 pass
-            self.progress_bar.set(progress)
-            percent = int(progress * 100)
+            shown["mode"] = "determinate"
+        bar_value = round(fraction, 3)
+        if shown.get("bar") != bar_value:
+            self.progress_bar.set(bar_value)
+            shown["bar"] = bar_value
+        if shown.get("percent") != percent:
             self.progress_label.configure(text=f"{percent}%")
-            self.status_label.configure(text=f"⏳ Converting... ({percent}%)", text_color="#3498db")
+            shown["percent"] = percent
+        if status_text and shown.get("status") != status_text:
+            self.status_label.configure(text=status_text, text_color="#3498db")
+            shown["status"] = status_text
+
+    def _remove_temp_file(self, temp_output_file):
+        """Delete a leftover temp output, ignoring errors"""
+        if temp_output_file and os.path.exists(temp_output_file):
+            try:
+                os.remove(temp_output_file)
+            except:
+                pass
 
-    def _on_conversion_complete(self, return_code, temp_output_file, output_file, stderr_text):
+    def _on_conversion_complete(self, job, return_code, temp_output_file, output_file, stderr_text):
         """Handle conversion completion"""
-        if return_code == 0:
+        if job.run.group is not None:
+            self._on_group_complete(job, return_code, stderr_text)
+            return
+        completion_started = self.profiler.now()
+        job.run.process = None
+        self._finish_job(job)
+        if job.run.cancel_requested:
+            # Cancelled by the user: not a failure, just clean up
+            job.status = JobStatus.CANCELLED
+            self._remove_temp_file(temp_output_file)
+        elif return_code == 0:
             try:
-                # Success! Rename temp file to final file
-                # If target exists (and we confirmed overwrite), replace it
-                if os.path.exists(output_file):
-                    os.remove(output_file)
-                
-                os.rename(temp_output_file, output_file)
-                self.completed_count += 1
+                # Success! Move temp file into place (replaces the target if we confirmed overwrite)
+                if job.run.farm_id is None:  # Farm workers finalize on their side
+                    with self.profiler.span("finalize", job=job.id):
+                        self.finalize_output(temp_output_file, output_file)
+                job.status = JobStatus.DONE
                 
                 # Check if it was a video-to-audio conversion (audio extract)
                 # Sometimes people want mp3 but select a video format? Standardize logic?
                 # For now just success.
                 
             except Exception as e:
-                self.log_error(f"Error renaming file: {e}")
-                self.failed_files.append(f"{os.path.basename(output_file)} (Rename Error: {str(e)})")
-                self.failed_files_paths.append(self.input_file)  # Track for retry
+                self.log_error(f"Error finalizing file: {e}")
+                job.status = JobStatus.FAILED
+                stderr_text = f"Finalize Error: {e}"
                 
                 # Clean up temp file
-                if os.path.exists(temp_output_file):
-                    try:
-                        os.remove(temp_output_file)
-                    except:
-                        pass
+                self._remove_temp_file(temp_output_file)
         else:
-            # Conversion failed
-            # Extract last error line from stderr if possible
-            error_reason = f"Error: {return_code}"
-            if stderr_text:
-                lines = stderr_text.strip().split('\n')
-                # Find last non-empty line
-                last_lines = [l for l in lines[-5:] if l.strip()]
-                if last_lines:
-                    error_reason += f"\nLast error: {last_lines[-1]}"
-            
-            self.failed_files.append(f"{os.path.basename(output_file)}\n({error_reason})")
-            self.failed_files_paths.append(self.input_file)  # Track for retry
+            # Conversion failed (the summary keeps the last line of stderr as the reason)
+            if not (stderr_text or "").strip():
+                stderr_text = f"Error: {return_code}"
+            job.status = JobStatus.FAILED
             
             # Clean up temp file
-            if os.path.exists(temp_output_file):
+            self._remove_temp_file(temp_output_file)
+
+        self.record_job_metrics(job, stderr_text)
+        self.profiler.record("completion", completion_started, job=job.id)
+
+        # Process next file
+        self.process_next_file()
+
+    def finalize_output(self, temp_output_file, output_file):
+        """Move a finished temp file into place without a moment where the output is missing"""
+        temp_output_file = Path(temp_output_file)
+        output_file = Path(output_file)
+
+        # Same filesystem: a single atomic rename
+        if os.stat(temp_output_file).st_dev == os.stat(output_file.parent).st_dev:
+            os.replace(temp_output_file, output_file)
+            return
+
+        # Different filesystems: copy once into a hidden file next to the target,
+        # flush it to disk, then swap it in atomically
+        partial_file = output_file.parent / f".{output_file.name}.{os.urandom(4).hex()}.part"
+        buffer = bytearray(self.finalize_chunk_size)
+        view = memoryview(buffer)
+        try:
+            with open(temp_output_file, 'rb') as src, open(partial_file, 'wb') as dst:
+                while True:
+                    n = src.readinto(buffer)
+                    if not n:
+                        break
+                    dst.write(view[:n])
+                dst.flush()
+                os.fsync(dst.fileno())
+            os.replace(partial_file, output_file)
+        except Exception:
+            if partial_file.exists():
                 try:
-                    os.remove(temp_output_file)
+                    os.remove(partial_file)
                 except:
                     pass
+            raise
 
-        # Process next file
-        self.process_next_file()
+        # Make the rename durable too (not supported for directories on Windows)
+        if os.name != 'nt':
+            try:
+                dir_fd = os.open(output_file.parent, os.O_RDONLY)
+                try:
+                    os.fsync(dir_fd)
+                finally:
+                    os.close(dir_fd)
+            except OSError:
+                pass
 
-    def _on_conversion_error(self, error_message):
+        os.remove(temp_output_file)
+
+    def _on_conversion_error(self, error_message, job=None):
         """Handle conversion error (called on main thread)"""
         # Log error and continue
         self.log_error(f"Exception error: {error_message}")
-        if self.input_file:
-             self.failed_files.append(f"{os.path.basename(self.input_file)} (Exception: {error_message})")
-             self.failed_files_paths.append(self.input_file)  # Track for retry
-        else:
-             self.failed_files.append(f"Unknown file (Exception: {error_message})")
+        if job and job.run.group is not None:
+            self._on_group_complete(job, -1, f"Exception: {error_message}")
+            return
+        if job:
+            job.run.process = None
+            self._finish_job(job)
+            self._remove_temp_file(job.run.temp_output_file)
+        if job and job.run.cancel_requested:
+            job.status = JobStatus.CANCELLED
+        elif job:
+             job.status = JobStatus.FAILED
+        if job:
+            self.record_job_metrics(job, f"Exception: {error_message}")
              
         # Process next file
         self.root.after(100, self.process_next_file)
 
+    def toggle_stats_panel(self):
+        """Show or hide the job statistics"""
+        self.stats_visible = not self.stats_visible
+        if self.stats_visible:
+            self.stats_frame.pack(fill="x", pady=5, after=self.stats_btn)
+            self._update_stats_panel()
+        else:
+            self.stats_frame.pack_forget()
+
+    def _update_stats_panel(self):
+        """Summarize the metrics of the jobs finished so far"""
+        if not self.stats_visible:
+            return
+        counters, histograms = self.metrics.totals()
+        statuses = {dict(labels).get("status"): value for labels, value in counters["hindura_jobs_total"].items()}
+        if not statuses:
+            self.stats_label.configure(text="No finished jobs yet")
+            return
+
+        def average(name):
+            total, count = histograms[name]
+            return total / count if count else 0
+
+        lines = [f"Jobs:     {statuses.get('done', 0)} done, {statuses.get('failed', 0)} failed, "
+                 f"{statuses.get('cancelled', 0) + statuses.get('skipped', 0)} cancelled/skipped"]
+        failures = counters["hindura_job_failures_total"]
+        if failures:
+            lines.append("Failures: " + ", ".join(f"{dict(labels)['reason']} {value}"
+                                                  for labels, value in sorted(failures.items())))
+        lines.append(f"Average:  wait {average('hindura_job_queue_wait_seconds'):.1f}s, "
+                     f"probe {average('hindura_job_probe_seconds'):.2f}s, "
+                     f"start {average('hindura_job_spawn_seconds'):.2f}s, "
+                     f"encode {average('hindura_job_encode_seconds'):.1f}s")
+        if histograms["hindura_job_realtime_speed"][1]:
+            lines.append(f"Speed:    {average('hindura_job_realtime_speed'):.1f}x realtime")
+        bytes_in = sum(counters["hindura_input_bytes_total"].values())
+        bytes_out = sum(counters["hindura_output_bytes_total"].values())
+        if bytes_in:
+            lines.append(f"Data:     {self.format_file_size(bytes_in)} in, {self.format_file_size(bytes_out)} out")
+        self.stats_label.configure(text="\n".join(lines))
+
+    def get_ffmpeg_version(self):
+        """First line of `ffmpeg -version` (part of the cache key: a new build may encode differently)"""
+        import subprocess
+        if self._ffmpeg_version is None:
+            try:
+                result = subprocess.run([self.ffmpeg_path, "-version"], capture_output=True, text=True,
+                                        creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0)
+                self._ffmpeg_version = result.stdout.splitlines()[0] if result.stdout else ""
+            except Exception:
+                self._ffmpeg_version = ""
+        return self._ffmpeg_version
+
+    def open_output_cache(self):
+        """Open the output cache if a cache folder is configured"""
+        cache_dir = self.config.get('cache_dir')
+        if not cache_dir:
+            self.output_cache = None
+            return
+        if self.output_cache is not None and self.output_cache.folder == Path(cache_dir):
+            return
+        import sqlite3
+        try:
+            self.output_cache = OutputCache(cache_dir, self.cache_max_bytes, self.get_ffmpeg_version())
+        except (OSError, sqlite3.Error) as e:
+            self.log_error(f"Could not open output cache {cache_dir}: {e}")
+            self.output_cache = None
+
+    def _cache_args(self, cmd):
+        """The part of an FFmpeg command that decides the output bytes: no paths, no thread count"""
+        params = cmd[1:-2]  # Between the binary and "-y output"
+        while "-i" in params:
+            index = params.index("-i")
+            params = params[:index] + params[index + 2:]
+        if "-threads" in params:
+            index = params.index("-threads")
+            params = params[:index] + params[index + 2:]
+        return params + [Path(cmd[-1]).suffix.lower()]
+
+    def restore_from_cache(self, job, cmd):
+        """Put a cached output for this job at the command's output path, True on a hit"""
+        if self.output_cache is None:
+            return False
+        import sqlite3
+        try:
+            with self.profiler.span("cache lookup", job=job.id):
+                cached_file = self.output_cache.lookup(job.path, self._cache_args(cmd))
+            if cached_file is not None:
+                method = self.output_cache.materialize(cached_file, cmd[-1])
+                self.log_error(f"Cache hit for {job.path} ({method})")
+                self.metrics.inc("hindura_cache_lookups_total", result="hit")
+                return True
+        except (OSError, sqlite3.Error) as e:
+            self.log_error(f"Output cache lookup failed: {e}")
+        self.metrics.inc("hindura_cache_lookups_total", result="miss")
+        return False
+
+    def save_to_cache(self, job, cmd):
+        """Keep a successful output for later duplicates (errors only cost the cache entry)"""
+        if self.output_cache is None:
+            return
+        import sqlite3
+        try:
+            with self.profiler.span("cache store", job=job.id):
+                self.output_cache.store(job.path, self._cache_args(cmd), cmd[-1])
+        except (OSError, sqlite3.Error) as e:
+            self.log_error(f"Could not add {job.path} to the output cache: {e}")
+
+    def job_time_budget(self, duration):
+        """Longest a job may run: fixed if configured, else from the media duration (None = no limit yet)"""
+        if self.job_timeout:
+            return self.job_timeout
+        if not duration or not self.time_budget_factor:
+            return None
+        return self.time_budget_base + duration * self.time_budget_factor
+
+    def classify_failure(self, error_text, failure=None):
+        """Sort a failure into a broad class from FFmpeg's output (or our own error text)
+
+        The reason the watchdog gave when it stopped FFmpeg wins. Otherwise
+        only the last lines are read: the banner at the top of stderr lists
+        build options and library names that would match anything.
+        """
+        if failure:
+            return failure
+        lines = [line for line in (error_text or "").strip().splitlines() if line.strip()]
+        text = "\n".join(lines[-5:]).lower()
+        if "finalize error" in text:
+            return "finalize"
+        if "exception" in text:
+            return "exception"
+        if "no space left" in text or "disk full" in text:
+            return "disk_full"
+        if "permission denied" in text or "access is denied" in text:
+            return "permission"
+        if "unknown encoder" in text or "encoder not found" in text or "error while opening encoder" in text:
+            return "encoder"
+        if ("invalid data found" in text or "moov atom not found" in text or "no such file" in text
+                or "does not contain any stream" in text):
+            return "bad_input"
+        if "timed out" in text:
+            return "timeout"
+        if "stalled:" in text:
+            return "stalled"
+        if "stream error" in text:
+            return "stream"
+        if "killed" in text or "worker lost" in text:
+            return "killed"
+        return "other"
+
+    def record_job_metrics(self, job, error_text=None):
+        """Add a finished job (any final status) to the metrics, then drop its run"""
+        metrics = self.metrics
+        run = job.run  # None if the job never started (e.g. cancelled while queued)
+        metrics.inc("hindura_jobs_total", status=job.status)
+        if job.status == JobStatus.FAILED:
+            metrics.inc("hindura_job_failures_total", reason=self.classify_failure(error_text, run and run.failure))
+        if run is not None:
+            for name, value in (("hindura_job_queue_wait_seconds", run.queue_wait),
+                                ("hindura_job_probe_seconds", run.probe_time),
+                                ("hindura_job_spawn_seconds", run.spawn_latency),
+                                ("hindura_job_encode_seconds", run.encode_time)):
+                if value is not None:
+                    metrics.observe(name, value)
+        output_bytes = 0
+        if job.status == JobStatus.DONE:
+            try:
+                metrics.inc("hindura_input_bytes_total", os.path.getsize(job.path))
+                if run.output_file:
+                    output_bytes = os.path.getsize(run.output_file)
+                    metrics.inc("hindura_output_bytes_total", output_bytes)
+            except OSError:
+                pass
+            if run.duration and run.encode_time:
+                metrics.observe("hindura_job_realtime_speed", run.duration / run.encode_time)
+            self.record_speed(job)
+        if job.index is not None:
+            self.summary.record(job, error_text, output_bytes)
+        job.run = None  # Only the per-file record outlives the run
+        if self.root is not None:
+            self._update_stats_panel()
+
+    def get_settings(self):
+        """Snapshot the conversion options from the window (also what a preset stores)"""
+        return {
+            'mode': self.mode_var.get(),
+            'file_type': self.type_var.get(),
+            'to_format': self.to_var.get(),
+            'resize': self.resize_var.get(),
+            'width': self.width_var.get(),
+            'height': self.height_var.get(),
+            'quality': self.quality_var.get(),
+            'fps': self.fps_var.get(),
+            'gif_scale': self.gif_scale_var.get(),
+            'thumb_count': self.thumb_count_var.get(),
+            'thumb_width': self.thumb_width_var.get(),
+            'normalize': self.normalize_var.get(),
+            'quality_target': self.target_var.get(),
+            'trim_start': self._trim_text("trim_start_entry"),
+            'trim_end': self._trim_text("trim_end_entry"),
+            'trim_accurate': self.trim_accurate_var.get(),
+            'output_dir': self.output_var.get(),
+        }
+
+    def get_conversion_type(self, settings):
+        """Work out the conversion type and output name suffix for a set of options"""
+        mode = settings['mode']
+        file_type = settings['file_type']
+        to_format = settings['to_format']
+
+        # Check if it's video to audio (video source + audio destination)
+        is_video_to_audio = (file_type == "Video" and to_format in self.file_types["Audio"])
+        is_video_to_gif = (file_type == "Video" and to_format == "gif")
+        has_resize = (settings.get('resize', "None") != "None")
+
+        if mode == "Resize":
+            return "resize", "_resized"
+        elif mode == "Compression":
+            return "compress", "_compressed"
+        elif mode == "Thumbnails":
+            return "thumbnails", "_thumbs"
+        elif is_video_to_audio:
+            return "audio_extract", "_audio"
+        elif is_video_to_gif:
+            return "gif", "_gif"
+        elif has_resize:
+            return "resize_standard", "_resized"
+        return "standard", "_converted"
+
+    def get_output_folder(self, input_path, settings):
+        """Folder for a file's output, created if needed"""
+        output_folder_setting = settings['output_dir']
+        if output_folder_setting == "Same as input":
+            return Path(input_path).parent
+        output_folder = Path(output_folder_setting)
+        output_folder.mkdir(parents=True, exist_ok=True)
+        return output_folder
+
+    def build_command(self, input_path, conversion_type, settings, duration=None, loudness=None, crf=None,
+                      trim=(None, None), media=None):
+        """FFmpeg binary, input(s) and conversion parameters; callers add threads and the output
+
+        loudness is a LoudnessAnalyzer measurement to normalize the audio with,
+        crf the QualitySearch result for Target quality, trim the job's
+        (start, end) in seconds, media the probe_media result for resizing.
+        duration is the trimmed length.
+        """
+        if conversion_type == "thumbnails":
+            return [self.ffmpeg_path] + self.get_thumbnail_params(str(input_path), settings, duration, trim[0] or 0)
+        params = self.get_conversion_params(conversion_type, settings, crf, media)
+        if loudness:
+            if "-c:a" in params and params[params.index("-c:a") + 1] == "copy":
+                # Filtered audio can't be stream copied: let FFmpeg pick the container's encoder
+                index = params.index("-c:a")
+                params = params[:index] + params[index + 2:]
+            params += self.loudness.params(loudness, settings['to_format'])
+        trim_options = self.get_trim_options(trim, settings.get('trim_accurate', False))
+        return [self.ffmpeg_path] + trim_options + ["-i", str(input_path)] + params
+
+    def parse_timecode(self, text):
+        """Seconds from '90', '1:30' or '01:02:03.5' (None if empty); ValueError if it isn't a time"""
+        text = (text or "").strip()
+        if not text:
+            return None
+        parts = text.split(":")
+        if len(parts) > 3 or not re.fullmatch(r'\d+(\.\d+)?', parts[-1]) or not all(p.isdigit() for p in parts[:-1]):
+            raise ValueError(f"Not a time: {text} (use seconds, m:ss or h:mm:ss)")
+        seconds = 0.0
+        for part in parts:
+            seconds = seconds * 60 + float(part)
+        return seconds
+
+    def parse_trim(self, settings):
+        """(start, end) in seconds from the Trim fields; ValueError if they don't make a range"""
+        start = self.parse_timecode(settings.get('trim_start'))
+        end = self.parse_timecode(settings.get('trim_end'))
+        if end is not None and end <= (start or 0):
+            raise ValueError("The trim end has to be after the start")
+        return start or None, end
+
+    def get_trim_options(self, trim, accurate):
+        """Input options that seek to the start and stop after the range, so nothing outside it is decoded
+
+        Fast mode starts at the keyframe before the start point; accurate mode
+        (FFmpeg's default) decodes from there and drops frames up to the exact
+        start.
+        """
+        start, end = trim
+        options = []
+        if start:
+            options.extend(["-ss", f"{start:.3f}"])
+        if end is not None:
+            options.extend(["-t", f"{end - (start or 0):.3f}"])
+        if start and not accurate:
+            options.insert(0, "-noaccurate_seek")
+        return options
+
+    def trimmed_duration(self, duration, trim):
+        """Length of the part of a file that is converted (what progress is measured against)"""
+        start, end = trim
+        if duration is None:
+            return end - (start or 0) if end is not None else None
+        end = duration if end is None else min(end, duration)
+        return max(end - (start or 0), 0)
+
+    def quality_codec(self, conversion_type, settings):
+        """Video encoder to run a target quality search for, or None"""
+        if conversion_type != "compress" or settings['file_type'] != "Video":
+            return None
+        if settings['quality'] != "Target quality":
+            return None
+        return "libvpx-vp9" if settings['to_format'] == "webm" else "libx264"
+
+    def job_kind(self, conversion_type, cmd):
+        """Conversion type, or "copy" when the command only stream copies"""
+        codecs_used = [cmd[index + 1] for index, arg in enumerate(cmd[:-1]) if arg in ("-c", "-c:v", "-c:a")]
+        if codecs_used and all(codec == "copy" for codec in codecs_used):
+            return JobKind.COPY
+        return JobKind(conversion_type)
+
+    def record_speed(self, job):
+        """Update the calibrated speed of this kind of job from a finished run (used by BatchPlanner)
+
+        Only in memory: save_speed_factors writes them once per batch, not after every file.
+        """
+        if not job.run.kind or not job.run.encode_time or not job.run.output_file:
+            return
+        to_format = Path(job.run.output_file).suffix.lstrip(".")
+        threads = self.governor.threads_option()
+        cpu_seconds = job.run.encode_time * (int(threads[1]) if threads else self.governor.cpu_count)
+        with self._speed_lock:
+            factors = dict(self.config.get('speed_factors', {}))
+            for key in (f"{job.run.kind}/{to_format}", job.run.kind):
+                factor = dict(factors.get(key, {}))
+                # Moving average, so the factors follow hardware and FFmpeg changes
+                if job.run.duration:
+                    name, value = 'speed', job.run.duration / cpu_seconds
+                else:
+                    name, value = 'file_seconds', cpu_seconds
+                previous = factor.get(name)
+                factor[name] = value if previous is None else previous * 0.8 + value * 0.2
+                factor['jobs'] = factor.get('jobs', 0) + 1
+                factors[key] = factor
+            self.config['speed_factors'] = factors  # A new dict: a save in progress keeps its snapshot
+            self._speeds_changed = True
+
+    def save_speed_factors(self, max_age=0):
+        """Write the calibrated speeds if they changed and the last write is at least max_age seconds old"""
+        with self._speed_lock:
+            if not self._speeds_changed or time.monotonic() - self._speeds_saved_at < max_age:
+                return
+            factors = self.config.get('speed_factors', {})
+            self._speeds_changed = False
+            self._speeds_saved_at = time.monotonic()
+        self.save_config_value('speed_factors', factors)
+
+    def normalizes_audio(self, conversion_type, settings):
+        """Whether these options ask for loudness normalization and produce audio to apply it to"""
+        return (bool(settings.get('normalize')) and settings['file_type'] in ["Audio", "Video"]
+                and conversion_type not in ["gif", "thumbnails"])
+
+    def get_thumbnail_params(self, input_path, settings, duration, offset=0):
+        """Inputs and filters that pick representative frames, tiled into a sheet if more than one
+
+        Only keyframes are decoded (-skip_frame nokey) and every frame is taken
+        from its own input seeked with -ss, so a long file costs no more than a
+        short one. The thumbnail filter picks the most typical of a few
+        keyframes around each point, which skips fades and flash frames.
+        duration and offset describe the part of the file to pick from.
+        """
+        count = max(int(settings['thumb_count']), 1)
+        width = settings['thumb_width']
+        columns = math.ceil(math.sqrt(count))
+        rows = math.ceil(count / columns)
+
+        params = []
+        if duration:
+            # One seek per frame, at the middle of each equal part of the file
+            window = min(duration / count, self.thumbnail_window)
+            for i in range(count):
+                start = offset + duration * (i + 0.5) / count
+                params.extend(["-skip_frame", "nokey", "-ss", f"{start:.3f}", "-t", f"{window:.3f}",
+                               "-i", input_path])
+            picks = [f"[{i}:v]thumbnail={self.thumbnail_candidates},trim=end_frame=1,"
+                     f"scale={width}:-2,setsar=1[t{i}]" for i in range(count)]
+            if count == 1:
+                graph = picks[0].replace("[t0]", "")
+            else:
+                inputs = "".join(f"[t{i}]" for i in range(count))
+                graph = ";".join(picks) + f";{inputs}concat=n={count}:v=1:a=0,tile={columns}x{rows}"
+        else:
+            # Length unknown, so no seeking: pick from consecutive runs of keyframes instead
+            if offset:
+                params.extend(["-ss", f"{offset:.3f}"])
+            params.extend(["-skip_frame", "nokey", "-i", input_path])
+            graph = f"[0:v]thumbnail={self.thumbnail_candidates},scale={width}:-2,setsar=1"
+            if count > 1:
+                graph += f",tile={columns}x{rows}"
+
+        params.extend(["-filter_complex", graph, "-frames:v", "1", "-an"])
+        return params
+
+    def get_conversion_params(self, conversion_type, settings, crf=None, media=None):
+        """Get the ffmpeg parameters between the input and the output file"""
+        if conversion_type == "audio_extract":
+            return self.get_audio_extraction_params(settings['to_format'])
+        elif conversion_type == "gif":
+            return self.get_gif_conversion_params(settings)
+        elif conversion_type == "resize" or conversion_type == "resize_standard":
+            return self.get_resize_params(settings, media)
+        elif conversion_type == "compress":
+            return self.get_compression_params(settings, crf)
+        # Standard conversion
+        return self.get_standard_conversion_params(settings['file_type'], settings['to_format'])
+
     def get_audio_extraction_params(self, to_format):
         """Get ffmpeg parameters for extracting audio from video"""
         params = []
@@ -1073,10 +5128,10 @@ class FileConverterApp:
 
         return params
 
-    def get_gif_conversion_params(self):
+    def get_gif_conversion_params(self, settings):
         """Get ffmpeg parameters for converting video to GIF"""
-        fps = self.fps_var.get()
-        scale = self.gif_scale_var.get()
+        fps = settings['fps']
+        scale = settings['gif_scale']
 
         params = [
             "-vf", f"fps={fps},scale={scale}:-1:flags=lanczos,split[s0][s1];[s0]palettegen[p];[s1][p]paletteuse",
@@ -1085,28 +5140,63 @@ class FileConverterApp:
 
         return params
 
-    def get_resize_params(self, to_format):
-        """Get ffmpeg parameters for resizing (used in both Standard Conversion and Resize mode)"""
+    def get_resize_params(self, settings, media=None):
+        """Get ffmpeg parameters for resizing (used in both Standard Conversion and Resize mode)
+
+        The chosen resolution is a box to fit into: the aspect ratio is kept,
+        sizes stay even (most encoders need that) and nothing is upscaled.
+        With the source size from probe_media (media) the exact size and a
+        scaler suited to the reduction are chosen, and a file that already
+        fits is converted without scaling, or stream copied when Resize keeps
+        its format.
+        """
         params = []
-        resolution = self.resize_var.get()
-        file_type = self.type_var.get()
+        resolution = settings['resize']
+        file_type = settings['file_type']
+        to_format = settings['to_format']
 
         # Determine resolution
         if resolution == "None":
             # No resize, just do standard conversion
             return self.get_standard_conversion_params(file_type, to_format)
         elif resolution == "Custom":
-            width = self.width_entry.get()
-            height = self.height_entry.get()
-            if width and height:
-                scale_filter = f"scale={width}:{height}"
-            else:
-                messagebox.showerror("Error", "Please enter custom width and height")
-                return []
+            width = settings['width']
+            height = settings['height']
+            if not (width and height):
+                raise ValueError("Please enter custom width and height")
+            try:
+                box_width, box_height = int(width), int(height)
+            except ValueError:
+                raise ValueError("Custom width and height have to be whole numbers")
         else:
             # Extract resolution from string like "1920x1080 (1080p)"
-            res = resolution.split()[0]
-            scale_filter = f"scale={res}"
+            box_width, box_height = map(int, resolution.split()[0].split("x"))
+
+        source_width = media and media.get('width')
+        source_height = media and media.get('height')
+        if not (source_width and source_height):
+            # Size unknown: let FFmpeg fit it, still without upscaling or odd sizes
+            scale_filter = (f"scale=w='min({box_width},iw)':h='min({box_height},ih)'"
+                            f":force_original_aspect_ratio=decrease:force_divisible_by=2")
+        else:
+            factor = min(box_width / source_width, box_height / source_height)
+            if factor >= 1:
+                # Already fits
+                if settings['mode'] == "Resize" and to_format == media.get('format'):
+                    return ["-c:v", "copy", "-c:a", "copy"]
+                return self.get_standard_conversion_params(file_type, to_format)
+            out_width = max(2, round(source_width * factor / 2) * 2)
+            out_height = max(2, round(source_height * factor / 2) * 2)
+            # Big reductions average whole areas (fast, no aliasing); small ones interpolate
+            if factor <= 0.5:
+                scaler = "area"
+            elif factor < 0.9:
+                scaler = "bicubic"
+            else:
+                scaler = "bilinear"
+            scale_filter = f"scale={out_width}:{out_height}:flags={scaler}"
+            if media.get('sar', 1.0) != 1.0:
+                scale_filter += ",setsar=1"  # The size above is in square pixels
 
         params.extend(["-vf", scale_filter])
 
@@ -1115,15 +5205,24 @@ class FileConverterApp:
 
         return params
 
-    def get_compression_params(self, to_format):
-        """Get ffmpeg parameters for compressing media"""
+    def get_compression_params(self, settings, crf=None):
+        """Get ffmpeg parameters for compressing media (crf: Target quality search result)"""
         params = []
-        quality = self.quality_var.get()
-        file_type = self.type_var.get()
+        quality = settings['quality']
+        file_type = settings['file_type']
+        to_format = settings['to_format']
+        if quality == "Target quality" and (file_type != "Video" or crf is None):
+            quality = "Medium"  # Nothing to search for, or the search failed
 
         if file_type == "Video":
             # Video compression
-            if quality == "High (Large file)":
+            if quality == "Target quality":
+                if to_format == "webm":
+                    params.extend(["-c:v", "libvpx-vp9", "-crf", str(crf), "-b:v", "0", "-c:a", "libopus", "-b:a", "96k"])
+                else:
+                    params.extend(["-c:v", "libx264", "-crf", str(crf), "-c:a", "aac", "-b:a", "128k"])
+                return params
+            elif quality == "High (Large file)":
                 crf = "18"
                 bitrate = "5000k"
             elif quality == "Medium":
@@ -1240,8 +5339,137 @@ class FileConverterApp:
 
         return params
 
-if __name__ == "__main__":
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Hindura Pro file converter")
+    parser.add_argument("--farm-worker", metavar="QUEUE_FILE",
+                        help="run as a render farm worker for the shared queue file instead of opening the window")
+    parser.add_argument("--worker-id", help="name shown in the queue (default: host-pid)")
+    parser.add_argument("--jobs", type=int, help="parallel jobs on this worker (default: parallel_jobs from the config)")
+    parser.add_argument("--watch", metavar="FOLDER", help="convert files as they land in FOLDER (needs --preset)")
+    parser.add_argument("--pipe", action="store_true",
+                        help="convert stdin to stdout with --preset, streaming (e.g. in an upload pipeline)")
+    parser.add_argument("--input-format", help="FFmpeg demuxer for --pipe input it can't detect (e.g. mpegts)")
+    parser.add_argument("--plan", nargs="+", metavar="PATH",
+                        help="dry run: show what --preset would do to these files/folders and what it would cost")
+    parser.add_argument("--shards", type=int, default=1,
+                        help="with --plan, split the files into this many groups of equal CPU time")
+    parser.add_argument("--plan-json", metavar="FILE", help="with --plan, also write the full plan as JSON")
+    parser.add_argument("--preset", help="saved preset to use with --watch, --pipe or --plan")
+    parser.add_argument("--settle", type=float, default=5,
+                        help="seconds a file's size must stay the same before it is converted (default: 5)")
+    parser.add_argument("--profile", metavar="TRACE_FILE",
+                        help="record where the converter spends its own time, as Chrome trace JSON")
+    parser.add_argument("--metrics-port", type=int,
+                        help="serve Prometheus metrics at http://localhost:PORT/metrics (worker and watch modes)")
+    parser.add_argument("--startup-probe", help=argparse.SUPPRESS)  # benchmark.py --startup: note when the window is up
+    args = parser.parse_args()
+
+    if args.plan:
+        app = FileConverterApp.headless()
+        if not app.ffmpeg_path:
+            sys.exit("FFmpeg not found")
+        presets = app.config.get('presets', {})
+        if args.preset not in presets:
+            names = ", ".join(presets) or "none saved yet"
+            sys.exit(f"Choose a preset with --preset (saved presets: {names})")
+        settings = presets[args.preset]
+        extensions = set(app.file_types.get(settings['file_type'], []))
+        paths = []
+        for path in args.plan:
+            if os.path.isdir(path):
+                paths.extend(str(file) for file in sorted(Path(path).rglob("*"))
+                             if file.is_file() and file.suffix[1:].lower() in extensions)
+            else:
+                paths.append(path)
+        try:
+            planner = BatchPlanner(app, settings)
+        except ValueError as e:
+            sys.exit(f"Preset {args.preset}: {e}")
+        entries = planner.plan(paths)
+        print(app.format_plan(planner, entries))
+        if args.shards > 1:
+            print()
+            for index, shard in enumerate(planner.shards(entries, args.shards), 1):
+                cpu_seconds = sum(entry['cpu_seconds'] for entry in shard)
+                print(f"Shard {index}: {len(shard)} files, {cpu_seconds / 3600:.2f} CPU-hours")
+        if args.plan_json:
+            plan = {'totals': planner.totals(entries), 'jobs': entries}
+            if args.shards > 1:
+                plan['shards'] = [[entry['path'] for entry in shard] for shard in planner.shards(entries, args.shards)]
+            with open(args.plan_json, 'w') as f:
+                json.dump(plan, f, indent=2)
+        return
+
+    if args.pipe:
+        app = FileConverterApp.headless()
+        if not app.ffmpeg_path:
+            sys.exit("FFmpeg not found")
+        presets = app.config.get('presets', {})
+        if args.preset not in presets:
+            names = ", ".join(presets) or "none saved yet"
+            sys.exit(f"Choose a preset with --preset (saved presets: {names})")
+        try:
+            return_code, error, to_format = app.convert_stream(sys.stdin.buffer, sys.stdout.buffer, presets[args.preset],
+                                                               input_format=args.input_format)
+        except ValueError as e:
+            sys.exit(str(e))
+        if return_code != 0:
+            sys.exit(f"Conversion failed ({return_code}): {error}")
+        print(f"✅ Wrote {to_format} to stdout", file=sys.stderr)
+        return
+
+    if args.watch:
+        app = FileConverterApp.headless()
+        if not app.ffmpeg_path:
+            sys.exit("FFmpeg not found")
+        presets = app.config.get('presets', {})
+        if args.preset not in presets:
+            names = ", ".join(presets) or "none saved yet"
+            sys.exit(f"Choose a preset with --preset (saved presets: {names})")
+        if not os.path.isdir(args.watch):
+            sys.exit(f"Not a folder: {args.watch}")
+        if args.jobs:
+            app.governor.max_jobs = max(1, args.jobs)
+        if args.metrics_port:
+            app.metrics.serve(args.metrics_port)
+        if args.profile:
+            app.profiler.start(args.profile)
+        try:
+            daemon = WatchDaemon(app, args.watch, presets[args.preset], args.settle)
+        except ValueError as e:
+            sys.exit(f"Preset {args.preset}: {e}")
+        daemon.run()
+        return
+
+    if args.farm_worker:
+        app = FileConverterApp.headless()
+        if not app.ffmpeg_path:
+            sys.exit("FFmpeg not found")
+        if args.jobs:
+            app.governor.max_jobs = max(1, args.jobs)
+        if args.metrics_port:
+            app.metrics.serve(args.metrics_port)
+        if args.profile:
+            app.profiler.start(args.profile)
+        FarmWorker(app, FarmQueue(args.farm_worker), args.worker_id).run()
+        return
+
+    if not load_gui():
+        sys.exit("The window needs customtkinter: pip install customtkinter")
     root = ctk.CTk()
     app = FileConverterApp(root)
+    if args.profile:
+        app.profiler.start(args.profile)
+    if args.startup_probe:
+        root.update()  # Draw the window once
+        with open(args.startup_probe, "w") as f:
+            f.write(str(time.time()))
+        root.destroy()
+        return
     root.mainloop()
 
+
+if __name__ == "__main__":
+    main()
+